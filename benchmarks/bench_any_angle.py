@@ -0,0 +1,66 @@
+"""
+Compare any-angle string pulling with the collinear smoothing of main.find_path.
+
+Plans seeded start/target pairs with A* under main.py's shore penalty, then
+reduces every path both ways and reports waypoints, Euclidean length of the
+resulting polyline, the moves and Grid.get_path_cost of the cells a boat
+sails once the waypoints are traced again, and the time the reduction takes.
+
+Run from the repository root:
+    python -m benchmarks.bench_any_angle --sizes 100 250 500
+"""
+import argparse
+import random
+import time
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.pathfinding import any_angle_path, astar, path_length, smooth_path, trace_waypoints
+
+MAIN_SHORE_PENALTY = 15
+
+
+def run(sizes, pairs_per_map, seed):
+    print(f"{'size':>6} {'method':>10} {'waypoints':>10} {'length':>9} {'moves':>8} {'cost':>8} {'ms':>8}")
+    for size in sizes:
+        land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+        grid = Grid.from_landmass(land)
+        penalty = grid.shore_costs(MAIN_SHORE_PENALTY)
+        rng = random.Random(seed)
+        component = grid.components.largest()
+        paths = []
+        for _ in range(pairs_per_map):
+            start = grid.find_random_location(rng, component)
+            target = grid.find_random_location(rng, component)
+            paths.append(astar(grid.cells, size, size, start, target, penalty, masks=grid.neighbor_masks[1]))
+
+        methods = [
+            ("cells", lambda path: path),
+            ("smooth", smooth_path),
+            ("any-angle", lambda path: any_angle_path(path, grid.cells, size, penalty)),
+        ]
+        for name, reduce in methods:
+            began = time.perf_counter()
+            reduced = [reduce(path) for path in paths]
+            elapsed = time.perf_counter() - began
+            waypoints = sum(len(path) for path in reduced) / len(paths)
+            length = sum(path_length(path) for path in reduced) / len(paths)
+            sailed = [list(trace_waypoints(path)) for path in reduced]
+            moves = sum(len(cells) - 1 for cells in sailed) / len(paths)
+            cost = sum(grid.get_path_cost(cells) for cells in sailed) / len(paths)
+            print(f"{size:>6} {name:>10} {waypoints:10.1f} {length:9.1f} {moves:8.1f} {cost:8.1f} "
+                  f"{elapsed * 1000 / len(paths):8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--pairs", type=int, default=20, help="start/target pairs per map")
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args()
+    run(args.sizes, args.pairs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Compare the heap-based A* engine with the original linear-scan planner from main.py.
+
+Both planners run on the same seeded maps and the same start/target pairs,
+using main.py's cost model (1 per straight step, 1.4 per diagonal, plus the
+exp(-d) shore penalty). The original planner is reproduced verbatim below,
+including its 2000-expansion cap, so the numbers show what main.find_path
+used to do.
+
+Run from the repository root:
+    python -m benchmarks.bench_astar --sizes 100 250 500
+"""
+import argparse
+import math
+import random
+import time
+
+from grid.shore_cost import shore_cost_field
+from grid.terrain import generate_landmass
+from nav.pathfinding import astar, path_cost
+
+SHORE_PENALTY = 15
+DIAGONAL_COST = 1.4
+LEGACY_LIMIT = 2000
+LAND_CHANCE = 0.45
+SMOOTHING_PASSES = 8
+WATER, LAND = 0, 1
+
+
+def generate_terrain(size, seed):
+    """main.generate_terrain on a seeded map, returning rows of WATER/LAND"""
+    land = generate_landmass(size, size, LAND_CHANCE, SMOOTHING_PASSES, seed)
+    return [[LAND if cell else WATER for cell in row] for row in land.tolist()]
+
+
+def count_land_in_radius(grid, x, y, radius=2):
+    size = len(grid)
+    land_count = 0
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and grid[ny][nx] == LAND:
+                land_count += math.exp(-math.sqrt(dx * dx + dy * dy))
+    return land_count
+
+
+def legacy_neighbors(pos, grid):
+    size = len(grid)
+    x, y = pos
+    neighbors = []
+    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]:
+        new_x, new_y = x + dx, y + dy
+        if not (0 <= new_x < size and 0 <= new_y < size):
+            continue
+        if grid[new_y][new_x] != WATER:
+            continue
+        if dx != 0 and dy != 0 and (grid[y][new_x] == LAND or grid[new_y][x] == LAND):
+            continue
+        neighbors.append((new_x, new_y))
+    return neighbors
+
+
+def legacy_find_path(grid, start, target):
+    """The original main.find_path search, without the final smoothing"""
+
+    def heuristic(pos):
+        dx = abs(target[0] - pos[0])
+        dy = abs(target[1] - pos[1])
+        return abs(dx - dy) + DIAGONAL_COST * min(dx, dy)
+
+    frontier = [(0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    cells_checked = 0
+
+    while frontier and cells_checked < LEGACY_LIMIT:
+        current = min(frontier, key=lambda x: x[0])[1]
+        if current == target:
+            break
+        frontier = [f for f in frontier if f[1] != current]
+        cells_checked += 1
+        for next_pos in legacy_neighbors(current, grid):
+            dx = abs(next_pos[0] - current[0])
+            dy = abs(next_pos[1] - current[1])
+            move_cost = DIAGONAL_COST if (dx + dy) == 2 else 1
+            shore_penalty = SHORE_PENALTY * count_land_in_radius(grid, next_pos[0], next_pos[1])
+            new_cost = cost_so_far[current] + move_cost + shore_penalty
+            if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
+                cost_so_far[next_pos] = new_cost
+                frontier.append((new_cost + heuristic(next_pos), next_pos))
+                came_from[next_pos] = current
+
+    path = []
+    current = target
+    while current in came_from:
+        path.append(current)
+        current = came_from[current]
+    path.reverse()
+    return path, cells_checked
+
+
+def pick_pairs(grid, count, seed):
+    """Seeded water start/target pairs at least half the map apart"""
+    rng = random.Random(seed)
+    size = len(grid)
+    water = [(x, y) for y in range(size) for x in range(size) if grid[y][x] == WATER]
+    pairs = []
+    while len(pairs) < count:
+        a, b = rng.choice(water), rng.choice(water)
+        if max(abs(a[0] - b[0]), abs(a[1] - b[1])) >= size // 2:
+            pairs.append((a, b))
+    return pairs
+
+
+def run(sizes, pairs_per_map, seed, legacy_max_size):
+    print(f"{'size':>6} {'planner':>8} {'found':>7} {'mean ms':>10} {'expanded':>10} {'mean cost':>10}")
+    print("(mean cost is taken over the pairs that every planner solved)")
+    for size in sizes:
+        grid = generate_terrain(size, seed)
+        flat = bytearray(cell == WATER for row in grid for cell in row)
+        penalty = shore_cost_field([[cell == LAND for cell in row] for row in grid], SHORE_PENALTY).ravel().tolist()
+        pairs = pick_pairs(grid, pairs_per_map, seed)
+
+        planners = [("heap", None)]
+        if size <= legacy_max_size:
+            planners.append(("legacy", legacy_find_path))
+
+        results = {}
+        for name, legacy in planners:
+            results[name] = []
+            for start, target in pairs:
+                began = time.perf_counter()
+                if legacy:
+                    path, checked = legacy(grid, start, target)
+                else:
+                    stats = {}
+                    path = astar(flat, size, size, start, target, penalty=penalty, stats=stats)
+                    checked = stats["expanded"]
+                elapsed = time.perf_counter() - began
+                cost = path_cost(path, size, penalty) if path and path[0] == start else None
+                results[name].append((elapsed, checked, cost))
+
+        # Only compare costs on pairs every planner managed to solve
+        solved = [i for i in range(len(pairs)) if all(r[i][2] is not None for r in results.values())]
+        for name, rows in results.items():
+            found = sum(1 for _, _, cost in rows if cost is not None)
+            mean_ms = sum(elapsed for elapsed, _, _ in rows) * 1000 / len(rows)
+            expanded = sum(checked for _, checked, _ in rows) // len(rows)
+            mean_cost = (f"{sum(rows[i][2] for i in solved) / len(solved):10.1f}"
+                         if solved else f"{'-':>10}")
+            print(f"{size:>6} {name:>8} {found:>3}/{len(rows):<3} {mean_ms:10.1f} {expanded:10d} {mean_cost}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 250, 500])
+    parser.add_argument("--pairs", type=int, default=5, help="start/target pairs per map")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--legacy-max-size", type=int, default=250,
+                        help="skip the legacy planner above this size")
+    args = parser.parse_args()
+    run(args.sizes, args.pairs, args.seed, args.legacy_max_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure how batch path planning scales with the number of worker processes.
+
+Plans the same seeded start/target pairs once in this process, one astar
+call per pair, then through nav.batch.find_paths with each requested pool
+size, and reports throughput and speedup over the single-process loop.
+Results are checked to be the same paths.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch --size 500 --pairs 200 --processes 1 2 4 8
+"""
+import argparse
+import os
+import random
+import time
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.batch import find_paths
+from nav.pathfinding import astar
+
+MAIN_SHORE_PENALTY = 15
+
+
+def run(size, pair_count, seed, pool_sizes):
+    land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+    grid = Grid.from_landmass(land)
+    penalty = grid.shore_costs(MAIN_SHORE_PENALTY)
+    rng = random.Random(seed)
+    component = grid.components.largest()
+    pairs = [(grid.find_random_location(rng, component), grid.find_random_location(rng, component))
+             for _ in range(pair_count)]
+
+    began = time.perf_counter()
+    expected = [astar(grid.cells, size, size, start, target, penalty, masks=grid.neighbor_masks[1])
+                for start, target in pairs]
+    baseline = time.perf_counter() - began
+    print(f"{'processes':>10} {'pairs/s':>9} {'speedup':>8} {'same':>5}")
+    print(f"{'loop':>10} {pair_count / baseline:9.1f} {1:7.2f}x {'-':>5}")
+
+    for processes in pool_sizes:
+        began = time.perf_counter()
+        paths = [path for _, path in find_paths(grid, pairs, MAIN_SHORE_PENALTY, processes=processes)]
+        elapsed = time.perf_counter() - began
+        print(f"{processes:>10} {pair_count / elapsed:9.1f} {baseline / elapsed:7.2f}x "
+              f"{'yes' if paths == expected else 'NO':>5}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--pairs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=2024)
+    cores = os.cpu_count() or 1
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({n for n in (1, 2, 4) if n <= cores} | {cores}))
+    args = parser.parse_args()
+    run(args.size, args.pairs, args.seed, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Plan across a chunked world far larger than any map that fits in memory.
+
+Measures the cost of generating one tile, then runs A* between seeded
+open-water cells some distance apart on a ChunkedGrid, reporting how many
+tiles each search touched and what the tile cache held afterwards.
+
+Run from the repository root:
+    python -m benchmarks.bench_chunked --size 1048576 --distances 200 500 1000
+"""
+import argparse
+import random
+import time
+
+from grid.chunked import ChunkedGrid
+from nav.pathfinding import astar
+
+MAIN_SHORE_PENALTY = 15
+
+
+def pick_pair(grid, distance, rng):
+    """Open-water start and target roughly distance cells apart"""
+    while True:
+        start = grid.find_random_location(rng)
+        target = (start[0] + distance, start[1] + rng.randrange(-distance // 2, distance // 2 + 1))
+        if grid.in_bounds(*target) and grid.check_for_water(*target):
+            return start, target
+
+
+def run(size, tile_size, budget_mb, distances, pairs, seed):
+    grid = ChunkedGrid(seed, size, size, tile_size, budget_mb * 1024 * 1024)
+    began = time.perf_counter()
+    for key in ((0, 0), (1, 0), (0, 1), (1, 1)):
+        grid.tiles.get(key)
+    print(f"{size}x{size} world, {tile_size}x{tile_size} tiles, "
+          f"{(time.perf_counter() - began) * 1000 / 4:.1f} ms per tile")
+
+    rng = random.Random(seed)
+    print(f"{'distance':>9} {'ms':>9} {'length':>7} {'tiles':>6} {'held':>5} {'MB':>7}")
+    for distance in distances:
+        for _ in range(pairs):
+            start, target = pick_pair(grid, distance, rng)
+            builds = grid.tiles.builds
+            began = time.perf_counter()
+            path = astar(grid.cells, grid.cols, grid.rows, start, target, grid.shore_costs(MAIN_SHORE_PENALTY),
+                         masks=grid.neighbor_masks[1])
+            elapsed = time.perf_counter() - began
+            print(f"{distance:>9} {elapsed * 1000:9.1f} {len(path):>7} {grid.tiles.builds - builds:>6} "
+                  f"{len(grid.tiles):>5} {grid.tiles.nbytes / 1e6:7.1f}", flush=True)
+    grid.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1 << 20, help="rows and columns of the world")
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--budget", type=int, default=64, help="tile cache budget in MB")
+    parser.add_argument("--distances", type=int, nargs="+", default=[200, 500, 1000])
+    parser.add_argument("--pairs", type=int, default=3, help="searches per distance")
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args()
+    run(args.size, args.tile_size, args.budget, args.distances, args.pairs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Memory and lookup throughput of the byte-buffer Grid against per-cell GridCells storage.
+
+The legacy layout is rebuilt the way Grid used to build it: a list of lists
+holding one GridCells (and its dict) per cell. Memory is measured with
+tracemalloc while each structure is built from the same seeded landmass.
+
+Run from the repository root:
+    python -m benchmarks.bench_grid_storage --sizes 150 1000 4000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from grid.grid import Grid
+from grid.grid_cells import GridCells
+from grid.terrain import generate_landmass
+
+LOOKUPS = 200_000
+
+
+def measure_memory(build):
+    """Build a structure and return it with the bytes it allocated"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        structure = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return structure, after - before
+
+
+def measure_lookups(lookup, positions):
+    """Lookups per second of lookup(x, y) over the given positions"""
+    began = time.perf_counter()
+    for x, y in positions:
+        lookup(x, y)
+    return len(positions) / (time.perf_counter() - began)
+
+
+def run(sizes, seed, legacy_max_size):
+    print(f"{'size':>6} {'storage':>8} {'MB':>10} {'bytes/cell':>11} {'get() /s':>12} {'raw /s':>12}")
+    for size in sizes:
+        landmass = generate_landmass(size, size, 0.425, seed=seed)
+        rng = random.Random(seed)
+        positions = [(rng.randrange(size), rng.randrange(size)) for _ in range(LOOKUPS)]
+
+        grid, grid_bytes = measure_memory(lambda: Grid.from_landmass(landmass))
+        cells, cols = grid.cells, grid.cols
+        rows = [
+            ("buffer", grid_bytes,
+             measure_lookups(lambda x, y: grid[x, y].get("navigable"), positions),
+             measure_lookups(lambda x, y: cells[y * cols + x], positions)),
+        ]
+        del grid, cells
+
+        if size <= legacy_max_size:
+            land_rows = landmass.tolist()
+            legacy, legacy_bytes = measure_memory(
+                lambda: [[GridCells(navigable=not land, default=True) for land in row] for row in land_rows])
+            rows.append(
+                ("legacy", legacy_bytes,
+                 measure_lookups(lambda x, y: legacy[y][x].get("navigable"), positions),
+                 measure_lookups(lambda x, y: legacy[y][x].navigable, positions)))
+            del legacy
+
+        for name, allocated, api_rate, raw_rate in rows:
+            print(f"{size:>6} {name:>8} {allocated / 2 ** 20:10.2f} {allocated / (size * size):11.1f} "
+                  f"{api_rate:12,.0f} {raw_rate:12,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 1000, 4000])
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--legacy-max-size", type=int, default=1000,
+                        help="skip the legacy layout above this size (4000x4000 needs several GB)")
+    args = parser.parse_args()
+    run(args.sizes, args.seed, args.legacy_max_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the hierarchical planner (HPA*) with flat A* on large seeded maps.
+
+For each map the abstract graph is built once, then every start/target
+pair is planned twice. The cold pass still computes intra-cluster edges
+lazily. The warm pass has them cached and is timed in two parts: the
+abstract query, and its refinement into cells. The optimality gap is the
+HPA* path cost over the flat A* cost, minus one, on the same cost model.
+
+Run from the repository root:
+    python -m benchmarks.bench_hpa --sizes 1000 2000 4000 --flat-max-size 2000
+"""
+import argparse
+import random
+import time
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.hierarchical import HierarchicalPlanner
+from nav.pathfinding import astar, path_cost
+
+
+def pick_pairs(grid, count, seed):
+    """Seeded open-water start/target pairs in one body of water, at least half the map apart"""
+    rng = random.Random(seed)
+    component = grid.components.largest()
+    pairs = []
+    while len(pairs) < count:
+        a = grid.find_random_location(rng, component)
+        b = grid.find_random_location(rng, component)
+        if max(abs(a[0] - b[0]), abs(a[1] - b[1])) >= grid.cols // 2:
+            pairs.append((a, b))
+    return pairs
+
+
+def run(sizes, pairs_per_map, seed, cluster_size, flat_max_size, precompute):
+    print(f"{'size':>6} {'build s':>8} {'cold ms':>9} {'query ms':>9} {'refine ms':>10} {'nodes':>7} "
+          f"{'flat ms':>9} {'flat exp':>9} {'gap mean':>9} {'gap max':>8}")
+    for size in sizes:
+        land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+        grid = Grid.from_landmass(land)
+        penalty = grid.shore_costs()
+        pairs = pick_pairs(grid, pairs_per_map, seed)
+
+        planner = HierarchicalPlanner(grid, cluster_size)
+        build_time = planner.build_time + (planner.precompute() if precompute else 0)
+
+        # Cold: first plans, which also cost the intra-cluster edges they touch
+        cold = []
+        for start, target in pairs:
+            began = time.perf_counter()
+            planner.find_path(start, target)
+            cold.append(time.perf_counter() - began)
+
+        # Warm: the abstract query, then its refinement into cells
+        query, refine, nodes, costs = [], [], [], []
+        for start, target in pairs:
+            began = time.perf_counter()
+            waypoints = planner.abstract_path(start, target)
+            query.append(time.perf_counter() - began)
+            nodes.append(planner.stats["abstract_expanded"])
+            began = time.perf_counter()
+            path = list(planner.refine(waypoints))
+            refine.append(time.perf_counter() - began)
+            costs.append(path_cost(path, grid.cols, penalty))
+
+        flat_ms = flat_expanded = gap_mean = gap_max = "-"
+        if size <= flat_max_size:
+            times, expanded, gaps = [], [], []
+            for (start, target), cost in zip(pairs, costs):
+                stats = {}
+                began = time.perf_counter()
+                path = astar(grid.cells, grid.cols, grid.rows, start, target, penalty,
+                             stats=stats, masks=grid.neighbor_masks[1])
+                times.append(time.perf_counter() - began)
+                expanded.append(stats["expanded"])
+                gaps.append(cost / path_cost(path, grid.cols, penalty) - 1)
+            flat_ms = f"{sum(times) * 1000 / len(times):.1f}"
+            flat_expanded = f"{sum(expanded) // len(expanded)}"
+            gap_mean = f"{sum(gaps) / len(gaps):.2%}"
+            gap_max = f"{max(gaps):.2%}"
+
+        def mean_ms(samples):
+            return sum(samples) * 1000 / len(samples)
+
+        print(f"{size:>6} {build_time:8.2f} {mean_ms(cold):9.1f} {mean_ms(query):9.1f} {mean_ms(refine):10.1f} "
+              f"{sum(nodes) // len(nodes):>7} {flat_ms:>9} {flat_expanded:>9} {gap_mean:>9} {gap_max:>8}",
+              flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--pairs", type=int, default=5, help="start/target pairs per map")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--cluster-size", type=int, default=32)
+    parser.add_argument("--flat-max-size", type=int, default=2000,
+                        help="skip flat A* above this size")
+    parser.add_argument("--precompute", action="store_true",
+                        help="cost every intra-cluster edge while building (counted in build s)")
+    args = parser.parse_args()
+    run(args.sizes, args.pairs, args.seed, args.cluster_size, args.flat_max_size, args.precompute)
+
+
+if __name__ == "__main__":
+    main()
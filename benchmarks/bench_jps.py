@@ -0,0 +1,90 @@
+"""
+Compare jump point search with plain A* on the standard seeded maps.
+
+Both searches run on the same maps and start/target pairs, once with the
+shore penalty main.py plans with and once without any penalty. Jump point
+search only skips uniform-cost water, so the penalty decides how much of the
+map it can jump across. Path costs are checked to be equal.
+
+Run from the repository root:
+    python -m benchmarks.bench_jps --sizes 250 500 1000
+"""
+import argparse
+import random
+import time
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.pathfinding import astar, jump_point_search, path_cost
+
+MAIN_SHORE_PENALTY = 15
+
+
+def pick_pairs(grid, count, seed):
+    """Seeded open-water start/target pairs in one body of water, at least half the map apart"""
+    rng = random.Random(seed)
+    component = grid.components.largest()
+    pairs = []
+    while len(pairs) < count:
+        a = grid.find_random_location(rng, component)
+        b = grid.find_random_location(rng, component)
+        if max(abs(a[0] - b[0]), abs(a[1] - b[1])) >= grid.cols // 2:
+            pairs.append((a, b))
+    return pairs
+
+
+def run(sizes, pairs_per_map, seed, penalties):
+    print(f"{'size':>6} {'penalty':>8} {'uniform':>8} {'A* exp':>9} {'JPS exp':>9} {'ratio':>6} "
+          f"{'A* ms':>8} {'JPS ms':>8} {'tables ms':>10} {'same cost':>10}")
+    for size in sizes:
+        land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+        grid = Grid.from_landmass(land)
+        masks = grid.neighbor_masks[1]
+        pairs = pick_pairs(grid, pairs_per_map, seed)
+
+        for shore_penalty in penalties:
+            penalty = grid.shore_costs(shore_penalty)
+            began = time.perf_counter()
+            uniform, runs = grid.jump_runs(shore_penalty)
+            tables_ms = (time.perf_counter() - began) * 1000
+
+            totals = {"astar": [0, 0.0], "jps": [0, 0.0]}
+            same = 0
+            for start, target in pairs:
+                stats = {}
+                began = time.perf_counter()
+                flat = astar(grid.cells, size, size, start, target, penalty, stats=stats, masks=masks)
+                totals["astar"][1] += time.perf_counter() - began
+                totals["astar"][0] += stats["expanded"]
+
+                began = time.perf_counter()
+                jumped = jump_point_search(masks, uniform, runs, size, size, start, target, penalty, stats=stats)
+                totals["jps"][1] += time.perf_counter() - began
+                totals["jps"][0] += stats["expanded"]
+
+                same += abs(path_cost(flat, size, penalty) - path_cost(jumped, size, penalty)) < 1e-6
+
+            count = len(pairs)
+            astar_expanded, astar_time = totals["astar"]
+            jps_expanded, jps_time = totals["jps"]
+            print(f"{size:>6} {shore_penalty:>8} {sum(uniform) / len(uniform):8.1%} "
+                  f"{astar_expanded // count:>9} {jps_expanded // count:>9} "
+                  f"{astar_expanded / max(jps_expanded, 1):5.1f}x "
+                  f"{astar_time * 1000 / count:8.1f} {jps_time * 1000 / count:8.1f} {tables_ms:10.1f} "
+                  f"{same:>6}/{count:<3}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000])
+    parser.add_argument("--pairs", type=int, default=10, help="start/target pairs per map")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--penalties", type=float, nargs="+", default=[MAIN_SHORE_PENALTY, 0],
+                        help="shore penalties to plan with")
+    args = parser.parse_args()
+    run(args.sizes, args.pairs, args.seed, args.penalties)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compare planned paths stored as lists of tuples with PackedPath and PathArchive.
+
+Plans seeded start/target pairs with A*, then reports the memory of the
+paths as lists of tuples, as packed paths and as an archive, the time to
+pack, unpack and save them, and the time of PackedPath.cost against
+Grid.get_path_cost. Results are checked to be the same paths and costs.
+
+Run from the repository root:
+    python -m benchmarks.bench_packed_path --size 500 --pairs 200
+"""
+import argparse
+import io
+import random
+import sys
+import time
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.packed_path import PackedPath, PathArchive
+from nav.pathfinding import astar
+
+MAIN_SHORE_PENALTY = 15
+
+
+def list_bytes(path):
+    """Memory of a list of (x, y) tuples, counting every tuple and int"""
+    return sys.getsizeof(path) + sum(sys.getsizeof(cell) + sys.getsizeof(cell[0]) + sys.getsizeof(cell[1])
+                                     for cell in path)
+
+
+def timed(function):
+    began = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - began
+
+
+def run(size, pair_count, seed):
+    land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+    grid = Grid.from_landmass(land)
+    penalty = grid.shore_costs(MAIN_SHORE_PENALTY)
+    rng = random.Random(seed)
+    component = grid.components.largest()
+    pairs = [(grid.find_random_location(rng, component), grid.find_random_location(rng, component))
+             for _ in range(pair_count)]
+    paths = [astar(grid.cells, size, size, start, target, penalty, masks=grid.neighbor_masks[1])
+             for start, target in pairs]
+    cells = sum(len(path) for path in paths)
+    print(f"{len(paths)} paths, {cells} cells")
+
+    packed, pack_time = timed(lambda: [PackedPath.from_cells(path) for path in paths])
+    archive = PathArchive(packed)
+    unpacked, unpack_time = timed(lambda: [list(path) for path in archive])
+    buffer = io.BytesIO()
+    _, save_time = timed(lambda: archive.save(buffer))
+    print(f"{'storage':>10} {'bytes':>10} {'bytes/cell':>11}")
+    for name, total in (("lists", sum(list_bytes(path) for path in paths)),
+                        ("packed", sum(sys.getsizeof(path) + sys.getsizeof(path.runs) for path in packed)),
+                        ("archive", archive.nbytes)):
+        print(f"{name:>10} {total:10d} {total / cells:11.2f}")
+    print(f"pack {cells / pack_time / 1e6:.2f}M cells/s, unpack {cells / unpack_time / 1e6:.2f}M cells/s, "
+          f"save {save_time * 1000:.2f} ms, same: {'yes' if unpacked == paths else 'NO'}")
+
+    expected, list_time = timed(lambda: [grid.get_path_cost(path) for path in paths])
+    costs, packed_time = timed(lambda: [path.cost(grid) for path in packed])
+    print(f"cost: get_path_cost {list_time * 1000:.1f} ms, PackedPath.cost {packed_time * 1000:.1f} ms "
+          f"({list_time / packed_time:.1f}x), same: {'yes' if costs == expected else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--pairs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=2024)
+    args = parser.parse_args()
+    run(args.size, args.pairs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measure batch path-cost evaluation against the Grid.get_path_cost loop.
+
+Plans seeded A* paths, then scores many candidate routes made from them
+(the paths and slices of them) once per path with Grid.get_path_cost,
+then in batches: the lists themselves with Grid.get_path_costs (which
+converts them on every call), a padded array, the paths joined end to
+end, and packed direction streams with nav.packed_path.packed_path_costs.
+Every method, the loop included, reports its best time over the same
+number of repeats. Results are checked to be the same costs.
+
+Run from the repository root:
+    python -m benchmarks.bench_path_cost --size 500 --pairs 50 --candidates 20000 --repeat 3
+"""
+import argparse
+import random
+import time
+
+import constants
+from grid.grid import Grid
+from grid.path_cost import join_paths, joined_path_costs, pad_paths, path_costs
+from grid.terrain import generate_landmass
+from nav.packed_path import PackedPath, packed_path_costs
+from nav.pathfinding import astar
+
+MAIN_SHORE_PENALTY = 15
+
+
+def timed(function, repeat=1):
+    """Result of function and its best time over repeat calls"""
+    best = float('inf')
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - began)
+    return result, best
+
+
+def run(size, pair_count, candidate_count, seed, repeat):
+    land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+    grid = Grid.from_landmass(land)
+    penalty = grid.shore_costs(MAIN_SHORE_PENALTY)
+    rng = random.Random(seed)
+    component = grid.components.largest()
+    planned = []
+    for _ in range(pair_count):
+        start, target = grid.find_random_location(rng, component), grid.find_random_location(rng, component)
+        planned.append(astar(grid.cells, size, size, start, target, penalty, masks=grid.neighbor_masks[1]))
+    candidates = []
+    for _ in range(candidate_count):
+        path = rng.choice(planned)
+        first = rng.randrange(len(path) // 2 + 1)
+        candidates.append(path[first:first + rng.randrange(len(path) + 1)])
+    steps = sum(max(len(path) - 1, 0) for path in candidates)
+    print(f"{len(candidates)} candidate paths, {steps} steps")
+
+    expected, loop_time = timed(lambda: [grid.get_path_cost(path) for path in candidates], repeat)
+    padded, lengths = pad_paths(candidates)
+    joined, _ = join_paths(candidates)
+    packed = [PackedPath.from_cells(path) for path in candidates]
+    clear = grid.clear_water()  # Built once per grid version, not per batch
+
+    print(f"{'method':>14} {'steps/s':>12} {'speedup':>8} {'same':>5}")
+    print(f"{'loop':>14} {steps / loop_time:12.0f} {1:7.1f}x {'-':>5}")
+    for name, function in (("lists", lambda: grid.get_path_costs(candidates)),
+                           ("padded", lambda: path_costs(clear, padded, lengths, constants.SHORE_PENALTY)),
+                           ("joined", lambda: joined_path_costs(clear, joined, lengths, constants.SHORE_PENALTY)),
+                           ("packed", lambda: packed_path_costs(grid, packed))):
+        costs, elapsed = timed(function, repeat)
+        print(f"{name:>14} {steps / elapsed:12.0f} {loop_time / elapsed:7.1f}x "
+              f"{'yes' if costs.tolist() == expected else 'NO':>5}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--pairs", type=int, default=50)
+    parser.add_argument("--candidates", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per method, the best one counts")
+    args = parser.parse_args()
+    run(args.size, args.pairs, args.candidates, args.seed, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
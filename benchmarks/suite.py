@@ -0,0 +1,328 @@
+"""
+Reproducible performance benchmark suite.
+
+Every case runs headless on seeded maps at each requested size and reports
+time per operation (mean and percentiles), throughput in the case's own units
+(expanded cells, navigation steps, cells) and peak traced memory. Results can
+be saved as JSON and compared with an earlier run; the comparison exits with
+status 1 when any case's median time grew by more than the threshold.
+
+Run from the repository root:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --compare before.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+
+import constants
+from grid.grid import Grid
+from grid.shore_cost import shore_cost_field
+from grid.terrain import generate_landmass
+from nav.boat import Boat
+from nav.flow_field import FlowField
+from nav.navigate import GreedyNavigate
+from nav.pathfinding import astar, jump_point_search
+
+DEFAULT_SIZES = [100, 150, 500, 2000]
+# JSON files grow to ~40 bytes per cell, so the JSON cases stop here
+JSON_MAX_SIZE = 500
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def seeded_grid(size, seed):
+    return Grid.from_landmass(generate_landmass(size, size, constants.LAND_PROBABILITY,
+                                                constants.SMOOTHING_ITERATIONS, seed))
+
+
+def seeded_pairs(grid, count, seed):
+    """Seeded open-water start/target pairs at least half the map apart"""
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < count:
+        start = grid.find_random_location(rng)
+        target = grid.find_random_location(rng)
+        if max(abs(start[0] - target[0]), abs(start[1] - target[1])) >= grid.cols // 2:
+            pairs.append((start, target))
+    return pairs
+
+
+# Each case takes (size, seed) and returns (unit name, operation) or None to skip
+# the size. The operation runs once per call and returns how many units it processed.
+
+def case_generate(size, seed):
+    def operation():
+        generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+        return size * size
+    return "cells", operation
+
+
+def case_shore_costs(size, seed):
+    land = generate_landmass(size, size, constants.LAND_PROBABILITY, constants.SMOOTHING_ITERATIONS, seed)
+
+    def operation():
+        shore_cost_field(land, constants.SHORE_PENALTY)
+        return size * size
+    return "cells", operation
+
+
+def case_astar(size, seed):
+    grid = seeded_grid(size, seed)
+    penalty = grid.shore_costs()
+    masks = grid.neighbor_masks[1]
+    pairs = iter(seeded_pairs(grid, 1000, seed))
+
+    def operation():
+        start, target = next(pairs)
+        stats = {}
+        astar(grid.cells, grid.cols, grid.rows, start, target, penalty=penalty, stats=stats, masks=masks)
+        return stats["expanded"]
+    return "expansions", operation
+
+
+def case_jump_point_search(size, seed):
+    grid = seeded_grid(size, seed)
+    penalty = grid.shore_costs()
+    uniform, runs = grid.jump_runs()
+    masks = grid.neighbor_masks[1]
+    pairs = iter(seeded_pairs(grid, 1000, seed))
+
+    def operation():
+        start, target = next(pairs)
+        stats = {}
+        jump_point_search(masks, uniform, runs, grid.cols, grid.rows, start, target, penalty=penalty, stats=stats)
+        return stats["expanded"]
+    return "expansions", operation
+
+
+def case_flow_field(size, seed):
+    grid = seeded_grid(size, seed)
+    penalty = grid.shore_costs()
+    rng = random.Random(seed)
+
+    def operation():
+        FlowField(grid.cells, grid.cols, grid.rows, grid.find_random_location(rng), penalty)
+        return size * size
+    return "cells", operation
+
+
+def case_greedy_navigate(size, seed, steps=200):
+    grid = seeded_grid(size, seed)
+    pairs = iter(seeded_pairs(grid, 1000, seed))
+
+    def operation():
+        start, target = next(pairs)
+        navigator = GreedyNavigate(Boat(grid, start))
+        navigator.target = target
+        for _ in range(steps):
+            navigator.navigate()
+        return steps
+    return "steps", operation
+
+
+def _io_case(size, seed, suffix, direction):
+    if suffix == ".json" and size > JSON_MAX_SIZE:
+        return None
+    grid = seeded_grid(size, seed)
+    handle, filename = tempfile.mkstemp(suffix=suffix)
+    os.close(handle)
+    grid.save(filename)
+
+    def operation():
+        if direction == "save":
+            grid.save(filename)
+        else:
+            Grid.load(filename)
+        return size * size
+    operation.cleanup = lambda: os.remove(filename)
+    return "cells", operation
+
+
+def case_save_binary(size, seed):
+    return _io_case(size, seed, ".bin", "save")
+
+
+def case_load_binary(size, seed):
+    return _io_case(size, seed, ".bin", "load")
+
+
+def case_save_json(size, seed):
+    return _io_case(size, seed, ".json", "save")
+
+
+def case_load_json(size, seed):
+    return _io_case(size, seed, ".json", "load")
+
+
+def case_draw_grid(size, seed):
+    try:
+        import pygame
+        from display_main import gui
+    except ImportError:
+        return None
+    pygame.display.init()
+    screen = pygame.display.set_mode((gui.width + gui.sidebar_width, gui.height))
+    gui.grid_map = seeded_grid(size, seed)
+    gui.camera.set_world(size, size)
+    gui.camera.fit()
+    # The pyramid is built once per grid; each frame draws the view from it again
+    gui.terrain.render(gui.grid_map, gui.camera)
+
+    def operation():
+        gui.terrain.invalidate()
+        gui.draw_grid(screen)
+        return gui.camera.size[0] * gui.camera.size[1]
+    return "pixels", operation
+
+
+CASES = {
+    "generate": case_generate,
+    "shore_costs": case_shore_costs,
+    "astar": case_astar,
+    "jump_point_search": case_jump_point_search,
+    "flow_field": case_flow_field,
+    "greedy_navigate": case_greedy_navigate,
+    "save_binary": case_save_binary,
+    "load_binary": case_load_binary,
+    "save_json": case_save_json,
+    "load_json": case_load_json,
+    "draw_grid": case_draw_grid,
+}
+
+
+def run_case(name, size, seed, repeat, budget):
+    """Time one case at one size; returns a result dict or None if the case skips the size"""
+    prepared = CASES[name](size, seed)
+    if prepared is None:
+        return None
+    unit, operation = prepared
+
+    try:
+        # One traced run for peak memory, kept out of the timings
+        tracemalloc.start()
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        times = []
+        units = 0
+        started = time.perf_counter()
+        while len(times) < repeat and (not times or time.perf_counter() - started < budget):
+            began = time.perf_counter()
+            units += operation()
+            times.append(time.perf_counter() - began)
+    finally:
+        if hasattr(operation, "cleanup"):
+            operation.cleanup()
+
+    return {
+        "case": name,
+        "size": size,
+        "runs": len(times),
+        "mean": sum(times) / len(times),
+        "min": min(times),
+        "p50": percentile(times, 0.5),
+        "p90": percentile(times, 0.9),
+        "p99": percentile(times, 0.99),
+        "max": max(times),
+        "unit": unit,
+        "units_per_second": units / sum(times),
+        "peak_memory": peak,
+    }
+
+
+def run_suite(cases, sizes, seed, repeat, budget):
+    results = []
+    print(f"{'case':<16} {'size':>6} {'runs':>5} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} "
+          f"{'rate':>14} {'peak MB':>9}")
+    for name in cases:
+        for size in sizes:
+            result = run_case(name, size, seed, repeat, budget)
+            if result is None:
+                continue
+            results.append(result)
+            print(f"{name:<16} {size:>6} {result['runs']:>5} {result['p50'] * 1000:10.2f} "
+                  f"{result['p90'] * 1000:10.2f} {result['p99'] * 1000:10.2f} "
+                  f"{result['units_per_second']:10,.0f} {result['unit'][:3]}/s "
+                  f"{result['peak_memory'] / 2 ** 20:9.2f}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the change in median time against a baseline run.
+
+    Returns:
+        list: (case, size, ratio) for every case slower than 1 + threshold
+    """
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'case':<16} {'size':>6} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for result in results:
+        before = previous.get((result["case"], result["size"]))
+        if before is None:
+            continue
+        ratio = result["p50"] / before["p50"]
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{result['case']:<16} {result['size']:>6} {before['p50'] * 1000:10.2f} "
+              f"{result['p50'] * 1000:10.2f} {ratio - 1:+8.1%}{flag}")
+        if flag:
+            regressions.append((result["case"], result["size"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the performance benchmark suite")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case and size")
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="stop repeating a case after this many seconds (at least one run)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative growth of median time before failing")
+    args = parser.parse_args()
+
+    results = run_suite(args.cases, args.sizes, args.seed, args.repeat, args.budget)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "meta": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "numpy": np.__version__,
+                    "seed": args.seed,
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                },
+                "results": results,
+            }, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,14 @@ SMOOTHING_ITERATIONS = 8
 # Grid
 ROWS = 150
 COLS = 150
+# Chunked worlds (grid.chunked.ChunkedGrid)
+TILE_SIZE = 256
+TILE_MEMORY_BUDGET = 256 * 1024 * 1024  # Bytes of tiles kept in memory
+TILE_SPILL_DIR = None  # Directory for tiles evicted from memory, None to regenerate them
 # Pygame
 WIDTH = 1050
 HEIGHT = 1050
-DATAPATH = "data/grid.json"
+DATAPATH = "data/grid.bin"
 # Boat
 BOAT_STARTING_POS = 0, 0
 BOAT_TARGET_POS = (ROWS - 1, COLS - 1)
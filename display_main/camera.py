@@ -0,0 +1,186 @@
+import math
+
+import pygame
+
+
+class Camera:
+    """
+    Pan and zoom over a grid, mapping between screen pixels and cells.
+
+    The view is described by the cell at its top-left corner and a zoom in
+    pixels per cell, which may be fractional: below 1 a pixel covers several
+    cells and the terrain is drawn from a downsampled TerrainPyramid level.
+    Screen pixel (px, py) shows the cell its center falls in.
+
+    Attributes:
+        size (tuple): Width and height of the viewport in pixels
+        world (tuple): Columns and rows of the grid being viewed
+        x (float): Column at the left edge of the viewport
+        y (float): Row at the top edge of the viewport
+        zoom (float): Pixels per cell
+        max_zoom (float): Largest zoom allowed
+    """
+
+    ZOOM_STEP = 1.25
+
+    def __init__(self, size, world, max_zoom=64):
+        """
+        Initialize a camera showing the whole grid.
+
+        Args:
+            size: (width, height) of the viewport in pixels
+            world: (cols, rows) of the grid
+            max_zoom: Largest zoom allowed, in pixels per cell
+        """
+        self.size = tuple(size)
+        self.world = tuple(world)
+        self.max_zoom = max_zoom
+        self.x = 0.0
+        self.y = 0.0
+        self.zoom = 1.0
+        self.fit()
+
+    @property
+    def key(self):
+        """Everything the picture depends on, to tell when it has to be redrawn"""
+        return self.size, self.world, self.x, self.y, self.zoom
+
+    @property
+    def rect(self):
+        """The viewport as a pygame.Rect at the screen origin"""
+        return pygame.Rect((0, 0), self.size)
+
+    @property
+    def fit_zoom(self):
+        """Zoom at which the whole grid fits, in whole pixels per cell when it is at least 1"""
+        zoom = min(self.size[0] / self.world[0], self.size[1] / self.world[1])
+        return math.floor(zoom) if zoom >= 1 else zoom
+
+    @property
+    def min_zoom(self):
+        return min(self.fit_zoom, 1)
+
+    def fit(self):
+        """Zoom to show the whole grid"""
+        self.zoom = self.fit_zoom
+        self._clamp()
+
+    def set_world(self, cols, rows):
+        """Switch to a grid of the given size, showing all of it if the size changed"""
+        if (cols, rows) != self.world:
+            self.world = (cols, rows)
+            self.fit()
+
+    def level(self):
+        """Pyramid level to draw from: each level halves the resolution, 0 is full detail"""
+        if self.zoom >= 1:
+            return 0
+        return int(math.log2(1 / self.zoom) + 1e-9)
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) pixels"""
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._clamp()
+
+    def zoom_at(self, factor, pixel=None):
+        """
+        Multiply the zoom by factor, keeping the cell under pixel in place.
+
+        Args:
+            factor: Zoom multiplier, above 1 to zoom in
+            pixel: Screen position (px, py) to zoom around, the viewport center by default
+        """
+        px, py = pixel if pixel is not None else (self.size[0] / 2, self.size[1] / 2)
+        zoom = max(self.min_zoom, min(self.zoom * factor, self.max_zoom))
+        # Cell coordinates under the pixel before and after must agree
+        self.x += (px + 0.5) / self.zoom - (px + 0.5) / zoom
+        self.y += (py + 0.5) / self.zoom - (py + 0.5) / zoom
+        self.zoom = zoom
+        self._clamp()
+
+    def center_on(self, x, y):
+        """Put the center of cell (x, y) in the middle of the viewport"""
+        self.x = x + 0.5 - self.size[0] / (2 * self.zoom)
+        self.y = y + 0.5 - self.size[1] / (2 * self.zoom)
+        self._clamp()
+
+    def _clamp(self):
+        """Keep the grid in view: centered when it is smaller than the viewport, edge to edge otherwise"""
+        for axis in (0, 1):
+            view = self.size[axis] / self.zoom
+            extent = self.world[axis]
+            position = self.x if axis == 0 else self.y
+            if view >= extent:
+                position = (extent - view) / 2
+            else:
+                position = max(0.0, min(position, extent - view))
+            if axis == 0:
+                self.x = position
+            else:
+                self.y = position
+
+    def screen_x(self, column):
+        """First pixel column showing the given grid column"""
+        return math.ceil((column - self.x) * self.zoom - 0.5)
+
+    def screen_y(self, row):
+        """First pixel row showing the given grid row"""
+        return math.ceil((row - self.y) * self.zoom - 0.5)
+
+    def cell_at(self, px, py):
+        """Cell (x, y) shown at a screen pixel, which may lie off the grid"""
+        return math.floor(self.x + (px + 0.5) / self.zoom), math.floor(self.y + (py + 0.5) / self.zoom)
+
+    def cell_rect(self, x, y):
+        """Screen rectangle of cell (x, y), at least one pixel wide and high"""
+        left, top = self.screen_x(x), self.screen_y(y)
+        return pygame.Rect(left, top, max(self.screen_x(x + 1) - left, 1), max(self.screen_y(y + 1) - top, 1))
+
+    def visible_cells(self):
+        """
+        Range of cells at least partly in view, clipped to the grid.
+
+        Returns:
+            tuple: (x0, y0, x1, y1) with x1 and y1 exclusive
+        """
+        x0, y0 = self.cell_at(0, 0)
+        x1, y1 = self.cell_at(self.size[0] - 1, self.size[1] - 1)
+        return max(x0, 0), max(y0, 0), min(x1 + 1, self.world[0]), min(y1 + 1, self.world[1])
+
+    def is_visible(self, x, y):
+        x0, y0, x1, y1 = self.visible_cells()
+        return x0 <= x < x1 and y0 <= y < y1
+
+    def handle_event(self, event):
+        """
+        Pan with the arrow keys or by dragging with the right or middle button,
+        zoom with the mouse wheel or +/-, and show everything again with Home.
+
+        Returns:
+            bool: True if the event moved the camera
+        """
+        if event.type == pygame.MOUSEWHEEL:
+            pixel = pygame.mouse.get_pos()
+            if not self.rect.collidepoint(pixel):
+                return False
+            self.zoom_at(self.ZOOM_STEP ** event.y, pixel)
+        elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN:
+            step_x, step_y = self.size[0] // 8, self.size[1] // 8
+            moves = {pygame.K_LEFT: (-step_x, 0), pygame.K_RIGHT: (step_x, 0),
+                     pygame.K_UP: (0, -step_y), pygame.K_DOWN: (0, step_y)}
+            if event.key in moves:
+                self.pan(*moves[event.key])
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom_at(self.ZOOM_STEP)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom_at(1 / self.ZOOM_STEP)
+            elif event.key == pygame.K_HOME:
+                self.fit()
+            else:
+                return False
+        else:
+            return False
+        return True
@@ -1,20 +1,46 @@
 import pygame
 from .colors import *
 from .text import *
+from .camera import Camera
+from .profiler import Profiler, ProfilerHUD
+from .surfaces import TerrainView
 import constants
 from grid.grid import Grid
-from nav.navigate import GreedyNavigate
-from nav.boat import Boat
+from nav.background import PlanningService
+from sim.simulation import Simulation
 
 width, height = constants.WIDTH, constants.HEIGHT
 sidebar_width = 200
 
 
-# Setup
-grid_map = Grid.load(constants.DATAPATH)
-boat = Boat(grid_map)
-navigator = GreedyNavigate(boat)
-cell_size = width // grid_map.cols
+# Phase timings of draw_page, shown over the map while show_profiler is set
+profiler = Profiler(allocations=True)
+profiler_hud = ProfilerHUD(profiler)
+show_profiler = False
+
+
+def label_boat_water(grid, start, target, cancel=None):
+    """Label the bodies of water a greedy boat can cross between, the one costly part of its steps"""
+    with profiler.phase("label_water"):
+        return grid.boat_components
+
+
+def start_labelling():
+    """Label the current grid's water on the planning thread; the boat waits for it to finish"""
+    return planning.submit(grid_map, (boat.x, boat.y), navigator.target, key="labelling", plan=label_boat_water)
+
+
+# Setup: the greedy navigator's reachability labels are made on a background thread
+# so a new map never holds up drawing
+planning = PlanningService()
+simulation = Simulation(Grid.load(constants.DATAPATH), navigator="greedy")
+navigator = simulation.add_boat()
+grid_map = simulation.grid
+boat = navigator.boat
+labelling = start_labelling()
+# Only the part of the map in view is drawn, at any map size
+camera = Camera((width, height), (grid_map.cols, grid_map.rows))
+terrain = TerrainView(BLUE, BLACK, BLACK)
 
 # Game state
 current_page = 0
@@ -31,29 +57,32 @@ target_input_text = f"{target_pos[0]}, {target_pos[1]}"
 
 def generate_new_grid():
     """Generate a new grid and save it"""
-    global grid_map, boat, navigator, navigating, boat_pos, target_pos, boat_input_text, target_input_text
+    global simulation, grid_map, boat, navigator, labelling, navigating, boat_pos, target_pos, boat_input_text, \
+        target_input_text
 
     # Create new grid instance using your existing Grid class
     grid_map = Grid()
 
-    # Save to grid.json using your existing save method
+    # Save to the data file using your existing save method
     grid_map.save(constants.DATAPATH)
 
-    # Reinitialize boat and navigator with new grid
-    boat = Boat(grid_map)
-    navigator = GreedyNavigate(boat)
-
     # Reset positions to valid water locations
-    new_boat_pos = grid_map.find_random_location()
-    new_target_pos = grid_map.find_random_location()
+    new_boat_pos = grid_map.find_random_location(component=grid_map.components.largest())
+    new_target_pos = grid_map.find_random_location(component=grid_map.components.component(*new_boat_pos))
 
     # Update all positions
     boat_pos = list(new_boat_pos)
     target_pos = list(new_target_pos)
     print(target_pos)
-    boat.x, boat.y = boat_pos[0], boat_pos[1]
     constants.BOAT_TARGET_POS = tuple(target_pos)
 
+    # Restart the simulation on the new grid and label its water off the frame
+    simulation = Simulation(grid_map, navigator="greedy")
+    navigator = simulation.add_boat(new_boat_pos, new_target_pos)
+    boat = navigator.boat
+    labelling = start_labelling()
+    camera.set_world(grid_map.cols, grid_map.rows)
+
     # Update input text displays
     boat_input_text = f"{boat_pos[0]}, {boat_pos[1]}"
     target_input_text = f"{target_pos[0]}, {target_pos[1]}"
@@ -61,6 +90,40 @@ def generate_new_grid():
     # Stop navigation when generating new map
     navigating = False
 
+
+def toggle_profiler():
+    """Start or stop profiling together with its on-screen table"""
+    global show_profiler
+    show_profiler = not show_profiler
+    profiler.enabled = show_profiler
+
+
+def parse_position(text):
+    """Parse "x, y" into a navigable cell on the map, or None if it is not one"""
+    try:
+        x, y = (int(part) for part in text.split(","))
+    except ValueError:
+        return None
+    return [x, y] if grid_map.in_bounds(x, y) and grid_map.is_navigable(x, y) else None
+
+
+def apply_coordinates():
+    """Restart navigation from the typed coordinates"""
+    global simulation, boat, navigator, navigating, boat_pos, target_pos
+
+    new_boat_pos = parse_position(boat_input_text)
+    new_target_pos = parse_position(target_input_text)
+    if new_boat_pos is None or new_target_pos is None:
+        return False
+
+    boat_pos, target_pos = new_boat_pos, new_target_pos
+    simulation = Simulation(grid_map, navigator="greedy")
+    navigator = simulation.add_boat(tuple(boat_pos), tuple(target_pos))
+    boat = navigator.boat
+    navigating = False
+    return True
+
+
 def draw_button(screen, text, y_pos):
     """Draw a button with text at specified vertical position"""
     button_rect = pygame.Rect(width // 2 - 100, y_pos, 200, 50)
@@ -92,34 +155,53 @@ def draw_input_box(screen, text, rect, active, label=""):
     return rect
 
 
+def handle_camera_event(event):
+    """Pan and zoom the map on the navigation page, see Camera.handle_event"""
+    if current_page != 2 or (event.type == pygame.KEYDOWN and (boat_input_active or target_input_active)):
+        return False
+    return camera.handle_event(event)
+
+
+def handle_navigation_event(event):
+    """Toggle the profiler with F3 on the navigation page, otherwise pan and zoom the map"""
+    if current_page == 2 and event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+        toggle_profiler()
+        return True
+    return handle_camera_event(event)
+
+
 def draw_grid(screen):
     """Draw the navigation grid with walls and paths"""
-    for y in range(grid_map.rows):
-        for x in range(grid_map.cols):
-            color = BLUE if grid_map[x, y].get("navigable") else BLACK
-            pygame.draw.rect(screen, color, (x * cell_size, y * cell_size, cell_size, cell_size))
+    # Terrain and grid lines are drawn for the cells in view whenever the camera or grid changes
+    screen.blit(terrain.render(grid_map, camera), camera.rect)
+
 
-    # Draw grid lines
-    for x in range(0, width, cell_size):
-        pygame.draw.line(screen, BLACK, (x, 0), (x, height))
-    for y in range(0, height, cell_size):
-        pygame.draw.line(screen, BLACK, (0, y), (width, y))
+def draw_cell(screen, color, x, y):
+    """Fill cell (x, y) if it is in view"""
+    if camera.is_visible(x, y):
+        pygame.draw.rect(screen, color, camera.cell_rect(x, y))
 
 
 def draw_navigation(screen):
     """Draw the navigation view with boat, start, and target positions"""
     global navigating
-    if navigating:
-        navigator.navigate()
-        if (boat.x, boat.y) == tuple(target_pos):
-            navigating = False
+    with profiler.phase("navigate"):
+        # The boat holds still until its map's water is labelled
+        if navigating and labelling.done():
+            simulation.step()
+            if simulation.done:
+                navigating = False
 
-    draw_grid(screen)
+    with profiler.phase("draw_grid"):
+        draw_grid(screen)
 
-    # Draw start, target, and boat positions
-    pygame.draw.rect(screen, START_COLOR, (boat_pos[0] * cell_size, boat_pos[1] * cell_size, cell_size, cell_size))
-    pygame.draw.rect(screen, END_COLOR, (target_pos[0] * cell_size, target_pos[1] * cell_size, cell_size, cell_size))
-    pygame.draw.rect(screen, BOAT_COLOR, (boat.x * cell_size, boat.y * cell_size, cell_size, cell_size))
+    # Draw start, target, and boat positions, kept off the sidebar
+    with profiler.phase("markers"):
+        screen.set_clip(camera.rect)
+        draw_cell(screen, START_COLOR, *boat_pos)
+        draw_cell(screen, END_COLOR, *target_pos)
+        draw_cell(screen, BOAT_COLOR, boat.x, boat.y)
+        screen.set_clip(None)
 
 
 def draw_sidebar(screen):
@@ -165,5 +247,9 @@ def draw_page(screen):
         draw_text(screen, "Page 2", width // 2, 100)
         return draw_button(screen, "Go to Page 3", 200)
     else:  # Page 3 (Navigation)
-        draw_navigation(screen)
+        with profiler.phase("draw_page"):
+            draw_navigation(screen)
+        if show_profiler:
+            profiler_hud.draw(screen)
+        profiler.frame()
         return pygame.Rect(0, 0, 0, 0)  # Return empty rect since we don't need a button
@@ -0,0 +1,283 @@
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import nullcontext
+
+import numpy as np
+import pygame
+
+# What a disabled profiler hands out for every phase
+_IDLE = nullcontext()
+
+
+class _Span:
+    """One timed phase in progress, see Profiler.phase"""
+    __slots__ = ("profiler", "key", "start")
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler._add(self.key, self.start, time.perf_counter_ns() - self.start, 0)
+
+
+class _CountingSpan(_Span):
+    """A _Span that also records the change in allocated memory blocks"""
+    __slots__ = ("blocks",)
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        self.profiler._add(self.key, self.start, end - self.start, sys.getallocatedblocks() - self.blocks)
+
+
+class Profiler:
+    """
+    Timings of named phases and counters kept in fixed-size ring buffers.
+
+    Wrap each phase of a frame in `with profiler.phase(name):`. While the
+    profiler is disabled that is one attribute check and a shared do-nothing
+    context manager, so the hooks can stay in the loop for good. Enabled, every
+    phase records its duration into preallocated arrays; nothing grows however
+    long it runs. With allocations set it also records the change in allocated
+    memory blocks (sys.getallocatedblocks), which costs a few microseconds per
+    phase. count() records values such as cells expanded per plan.
+    Recording is thread-safe, so phases on a planning thread show up too.
+
+    Attributes:
+        enabled (bool): Whether phases and counters are recorded
+        allocations (bool): Whether phases count allocated memory blocks
+        capacity (int): Samples kept per phase or counter
+        frames (int): Number of frame() calls while enabled
+    """
+
+    def __init__(self, enabled=False, allocations=False, capacity=1024, trace_capacity=65536):
+        """
+        Initialize an empty profiler.
+
+        Args:
+            enabled: Start recording right away
+            allocations: Count allocated memory blocks per phase as well
+            capacity: Samples kept per phase or counter for percentiles
+            trace_capacity: Events kept for export_chrome_trace
+        """
+        self.enabled = enabled
+        self.allocations = allocations
+        self.capacity = capacity
+        self.frames = 0
+        self._names = []
+        self._keys = {}
+        self._counter = []  # Per key: True for counters, False for phases
+        self._values = []  # Per key: ring of durations in ms or counter values
+        self._allocations = []  # Per key: ring of allocated block deltas
+        self._counts = []  # Per key: samples recorded so far
+        self._lock = threading.Lock()
+        # One ring of events in recording order, for traces
+        self._trace_capacity = trace_capacity
+        self._trace_key = array("H", [0]) * trace_capacity
+        self._trace_start = array("q", [0]) * trace_capacity
+        self._trace_value = array("d", [0]) * trace_capacity
+        self._trace_blocks = array("q", [0]) * trace_capacity
+        self._trace_thread = array("Q", [0]) * trace_capacity
+        self._trace_count = 0
+        self._origin = time.perf_counter_ns()
+
+    def _key(self, name, counter):
+        key = self._keys.get(name)
+        if key is None:
+            with self._lock:
+                key = self._keys.get(name)
+                if key is None:
+                    key = len(self._names)
+                    self._names.append(name)
+                    self._counter.append(counter)
+                    self._values.append(array("d", [0]) * self.capacity)
+                    self._allocations.append(array("q", [0]) * self.capacity)
+                    self._counts.append(0)
+                    self._keys[name] = key
+        return key
+
+    def phase(self, name):
+        """
+        Context manager timing one phase.
+
+        Args:
+            name: Phase name, shown on the HUD and in traces
+
+        Returns:
+            A context manager; a shared no-op one while disabled
+        """
+        if not self.enabled:
+            return _IDLE
+        return (_CountingSpan if self.allocations else _Span)(self, self._key(name, False))
+
+    def count(self, name, value):
+        """Record one sample of a counter, such as the cells a search expanded"""
+        if self.enabled:
+            self._add(self._key(name, True), time.perf_counter_ns(), value, 0)
+
+    def frame(self):
+        """Mark the end of a frame"""
+        if self.enabled:
+            self.frames += 1
+
+    def _add(self, key, start, value, blocks):
+        if not self._counter[key]:
+            value /= 1e6  # Durations are kept in ms
+        with self._lock:
+            slot = self._counts[key] % self.capacity
+            self._values[key][slot] = value
+            self._allocations[key][slot] = blocks
+            self._counts[key] += 1
+            slot = self._trace_count % self._trace_capacity
+            self._trace_key[slot] = key
+            self._trace_start[slot] = start
+            self._trace_value[slot] = value
+            self._trace_blocks[slot] = blocks
+            self._trace_thread[slot] = threading.get_ident()
+            self._trace_count += 1
+
+    def reset(self):
+        """Forget every sample, keeping the names"""
+        with self._lock:
+            self._counts = [0] * len(self._names)
+            self._trace_count = 0
+            self.frames = 0
+
+    @property
+    def names(self):
+        """Phase and counter names in the order they were first recorded"""
+        return list(self._names)
+
+    def samples(self, name):
+        """Samples of a phase (ms) or counter still in its ring buffer, oldest first"""
+        key = self._keys.get(name)
+        if key is None:
+            return np.zeros(0)
+        count = self._counts[key]
+        values = np.frombuffer(self._values[key], dtype=np.float64)
+        if count <= self.capacity:
+            return values[:count].copy()
+        slot = count % self.capacity
+        return np.concatenate((values[slot:], values[:slot]))
+
+    def summary(self, name):
+        """
+        Rolling statistics of a phase or counter.
+
+        Returns:
+            dict: count (samples ever recorded), mean, p50, p90, p99, max over
+            the ring buffer, and allocations, the mean allocated block delta;
+            None if nothing was recorded
+        """
+        key = self._keys.get(name)
+        if key is None or not self._counts[key]:
+            return None
+        values = self.samples(name)
+        kept = min(self._counts[key], self.capacity)
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        return {"count": self._counts[key], "mean": float(values.mean()), "p50": float(p50),
+                "p90": float(p90), "p99": float(p99), "max": float(values.max()),
+                "allocations": float(np.frombuffer(self._allocations[key], dtype=np.int64)[:kept].mean())}
+
+    def chrome_trace(self):
+        """
+        The recorded events in Chrome's trace event format.
+
+        Phases become complete ("X") events with their allocated block delta
+        in args, counters become counter ("C") events. Load the exported file
+        in chrome://tracing or https://ui.perfetto.dev.
+
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        with self._lock:
+            count = self._trace_count
+            first = max(0, count - self._trace_capacity)
+            slots = [i % self._trace_capacity for i in range(first, count)]
+            events = [(self._trace_key[s], self._trace_start[s], self._trace_value[s],
+                       self._trace_blocks[s], self._trace_thread[s]) for s in slots]
+        pid = os.getpid()
+        threads = {}
+        trace = []
+        for key, start, value, blocks, thread in events:
+            tid = threads.setdefault(thread, len(threads))
+            name = self._names[key]
+            ts = (start - self._origin) / 1000
+            if self._counter[key]:
+                trace.append({"name": name, "ph": "C", "ts": ts, "pid": pid, "tid": tid, "args": {name: value}})
+            else:
+                trace.append({"name": name, "ph": "X", "ts": ts, "dur": value * 1000, "pid": pid, "tid": tid,
+                              "args": {"allocated_blocks": blocks}})
+        for thread, tid in threads.items():
+            name = "main" if thread == threading.main_thread().ident else f"thread {tid}"
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filename):
+        """Write chrome_trace() to a JSON file"""
+        with open(filename, "w") as file:
+            json.dump(self.chrome_trace(), file)
+
+
+class ProfilerHUD:
+    """
+    On-screen table of a Profiler's rolling percentiles.
+
+    The text is rendered again only every refresh frames and blitted in
+    between, so the HUD costs little more than one blit per frame.
+
+    Attributes:
+        profiler (Profiler): Where the numbers come from
+        position (tuple): Top-left corner on screen
+        refresh (int): Frames between two renders of the text
+    """
+
+    def __init__(self, profiler, font=None, position=(10, 50), refresh=10,
+                 color=(255, 255, 255), background=(0, 0, 0, 160)):
+        self.profiler = profiler
+        # Columns only line up in a fixed-width font
+        self.font = font or pygame.font.SysFont("monospace", 14)
+        self.position = position
+        self.refresh = refresh
+        self.color = color
+        self.background = background
+        self._surface = None
+        self._frames = 0
+
+    def lines(self):
+        """The table as text, one line per phase and counter"""
+        lines = [f"{'phase':<16}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}{'allocs':>8}"]
+        for name in self.profiler.names:
+            stats = self.profiler.summary(name)
+            if stats is None:
+                continue
+            lines.append(f"{name[:15]:<16}{stats['p50']:8.2f}{stats['p90']:8.2f}{stats['p99']:8.2f}"
+                         f"{stats['max']:8.2f}{stats['allocations']:8.0f}")
+        return lines
+
+    def draw(self, screen):
+        """Blit the table, rendering it again if it is due; returns the rect drawn over"""
+        if self._surface is None or self._frames % self.refresh == 0:
+            rendered = [self.font.render(line, True, self.color) for line in self.lines()]
+            height = self.font.get_linesize()
+            surface = pygame.Surface((max(line.get_width() for line in rendered) + 8,
+                                      height * len(rendered) + 8), pygame.SRCALPHA)
+            surface.fill(self.background)
+            for i, line in enumerate(rendered):
+                surface.blit(line, (4, 4 + i * height))
+            self._surface = surface
+        self._frames += 1
+        return screen.blit(self._surface, self.position)
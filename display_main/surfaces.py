@@ -0,0 +1,283 @@
+import numpy as np
+import pygame
+
+
+class TerrainSurface:
+    """
+    Pre-rendered terrain and grid lines, rebuilt only when the grid changes.
+
+    The navigability buffer is turned into an RGB pixel array with numpy and
+    uploaded through surfarray, so a frame costs one blit instead of a
+    pygame.draw call per cell.
+
+    Attributes:
+        water: Color of navigable cells
+        land: Color of land cells
+        line_color: Color of the grid lines, or None for no lines
+        line_offsets (tuple): Pixel offsets inside each cell where lines are drawn
+        builds (int): Number of times the surface was rendered
+    """
+
+    def __init__(self, water, land, line_color=None, line_offsets=(0,)):
+        """
+        Initialize an empty cache.
+
+        Args:
+            water: Color of navigable cells
+            land: Color of land cells
+            line_color: Color of the grid lines, or None for no lines
+            line_offsets: Pixel offsets inside each cell where a horizontal and a
+                vertical line are drawn; (0,) draws a line along every cell's top
+                and left edge, (0, cell_size - 1) outlines every cell
+        """
+        self.water = water
+        self.land = land
+        self.line_color = line_color
+        self.line_offsets = line_offsets
+        self.builds = 0
+        self._surface = None
+        self._key = None
+        self._grid = None
+
+    def stale(self, grid, cell_size):
+        """Check whether the next render call has to rebuild the surface"""
+        return self._surface is None or self._grid is not grid or self._key != (grid.version, cell_size)
+
+    def render(self, grid, cell_size):
+        """
+        Get the terrain surface of grid, rendering it if the grid changed.
+
+        Args:
+            grid: Grid to draw
+            cell_size: Width and height of a cell in pixels
+
+        Returns:
+            pygame.Surface: grid.cols * cell_size by grid.rows * cell_size pixels
+        """
+        if self.stale(grid, cell_size):
+            self._surface = self._build(grid, cell_size)
+            self._grid = grid
+            self._key = (grid.version, cell_size)
+            self.builds += 1
+        return self._surface
+
+    def _build(self, grid, cell_size):
+        # surfarray arrays are indexed [x, y], the grid buffer is [y, x]
+        navigable = grid.navigable_array().T[:, :, np.newaxis]
+        colors = np.where(navigable, np.array(self.water, np.uint8), np.array(self.land, np.uint8))
+        pixels = colors.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+        if self.line_color is not None:
+            for offset in self.line_offsets:
+                pixels[offset::cell_size, :] = self.line_color
+                pixels[:, offset::cell_size] = self.line_color
+
+        surface = pygame.surfarray.make_surface(pixels)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        return surface
+
+
+class TerrainPyramid:
+    """
+    Navigability of a grid at full and successively halved resolutions.
+
+    Level 0 is the grid's own navigability buffer, 1 for water. Each further
+    level covers 2 x 2 cells of the one below with their average water
+    coverage from 0 to 255, so a zoomed-out view reads a small array instead
+    of the whole map. Levels are built the first time they are asked for.
+
+    Attributes:
+        version (int): Grid version the levels were built from
+        top (int): Highest level, the first one that is a single cell
+    """
+
+    def __init__(self, grid):
+        self.version = grid.version
+        self._levels = [grid.navigable_array()]
+        self.top = max(grid.rows - 1, grid.cols - 1, 1).bit_length()
+
+    @staticmethod
+    def full(level):
+        """Value of a cell that is all water at the given level"""
+        return 1 if level == 0 else 255
+
+    def level(self, level):
+        """(rows >> level, cols >> level) array of water coverage, rounded up in size"""
+        levels = self._levels
+        while len(levels) <= level:
+            below = levels[-1]
+            if below.shape[0] % 2 or below.shape[1] % 2:
+                # Odd edges repeat their last row or column
+                below = np.pad(below, ((0, below.shape[0] % 2), (0, below.shape[1] % 2)), mode="edge")
+            if len(levels) == 1:
+                # Water counts of up to 4 fit in the bytes of the full map
+                total = below[0::2, 0::2] + below[1::2, 0::2] + below[0::2, 1::2] + below[1::2, 1::2]
+                total = total.astype(np.uint16) * 255
+            else:
+                total = below[0::2, 0::2].astype(np.uint16)
+                total += below[1::2, 0::2]
+                total += below[0::2, 1::2]
+                total += below[1::2, 1::2]
+            levels.append(((total + 2) >> 2).astype(np.uint8))
+        return levels[level]
+
+
+class TerrainView:
+    """
+    Terrain as seen through a Camera, drawn from the cells in view only.
+
+    Every frame reads one value per screen pixel from the TerrainPyramid level
+    that matches the zoom, so the cost depends on the viewport, not on the
+    map. The picture is kept until the camera moves or the grid changes.
+
+    Attributes:
+        water: Color of navigable cells
+        land: Color of land cells
+        line_color: Color of the grid lines, or None for no lines
+        background: Color around the grid when it is smaller than the viewport
+        min_line_zoom (float): Smallest zoom, in pixels per cell, at which lines are drawn
+        builds (int): Number of times the picture was drawn
+    """
+
+    def __init__(self, water, land, line_color=None, background=(50, 50, 50), min_line_zoom=4):
+        self.water = water
+        self.land = land
+        self.line_color = line_color
+        self.background = background
+        self.min_line_zoom = min_line_zoom
+        self.builds = 0
+        self._surface = None
+        self._key = None
+        self._grid = None
+        self._pyramid = None
+
+    def stale(self, grid, camera):
+        """Check whether the next render call has to draw the picture again"""
+        return self._surface is None or self._grid is not grid or self._key != (grid.version, camera.key)
+
+    def invalidate(self):
+        """Make the next render call draw the picture again, keeping the pyramid"""
+        self._surface = None
+
+    def pyramid(self, grid):
+        """The grid's TerrainPyramid, rebuilt after the grid changed"""
+        if self._pyramid is None or self._grid is not grid or self._pyramid.version != grid.version:
+            self._pyramid = TerrainPyramid(grid)
+        return self._pyramid
+
+    def render(self, grid, camera):
+        """
+        Get the picture of grid through camera, drawing it if either changed.
+
+        Args:
+            grid: Grid to draw
+            camera: Camera that decides what is in view
+
+        Returns:
+            pygame.Surface: camera.size pixels
+        """
+        if self.stale(grid, camera):
+            pyramid = self.pyramid(grid)
+            self._surface = self._build(grid, camera, pyramid)
+            self._grid = grid
+            self._key = (grid.version, camera.key)
+            self.builds += 1
+        return self._surface
+
+    def _build(self, grid, camera, pyramid):
+        width, height = camera.size
+        level = min(camera.level(), pyramid.top)
+        # Cell under the center of every pixel column and row
+        columns = np.floor(camera.x + (np.arange(width) + 0.5) / camera.zoom).astype(np.int64)
+        rows = np.floor(camera.y + (np.arange(height) + 0.5) / camera.zoom).astype(np.int64)
+        values = pyramid.level(level)[np.clip(rows, 0, grid.rows - 1)[:, np.newaxis] >> level,
+                                      np.clip(columns, 0, grid.cols - 1)[np.newaxis, :] >> level]
+
+        # Blend land and water by coverage; surfarray arrays are indexed [x, y]
+        full = pyramid.full(level)
+        coverage = np.arange(full + 1)[:, np.newaxis] / full
+        water, land = np.array(self.water, float), np.array(self.land, float)
+        palette = np.rint(land + (water - land) * coverage).astype(np.uint8)
+        pixels = palette[values.T]
+
+        if self.line_color is not None and camera.zoom >= self.min_line_zoom:
+            # A line along the top and left edge of every cell, as TerrainSurface draws them
+            pixels[np.r_[True, columns[1:] != columns[:-1]], :] = self.line_color
+            pixels[:, np.r_[True, rows[1:] != rows[:-1]]] = self.line_color
+        pixels[(columns < 0) | (columns >= grid.cols), :] = self.background
+        pixels[:, (rows < 0) | (rows >= grid.rows)] = self.background
+
+        surface = pygame.surfarray.make_surface(pixels)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        return surface
+
+
+class TrailOverlay:
+    """
+    Translucent layer of visited cells, painted one cell at a time.
+
+    Cells are painted into a persistent per-pixel alpha surface when the boat
+    enters them, so drawing the trail is a single blit however long it is.
+
+    Attributes:
+        color: RGB color of visited cells
+        alpha (int): Opacity of visited cells, 0 to 255
+        cell_size (int): Width and height of a cell in pixels
+        surface (pygame.Surface): The overlay, transparent where nothing was visited
+    """
+
+    def __init__(self, size, cell_size, color, alpha=128):
+        """
+        Initialize an empty overlay.
+
+        Args:
+            size: (width, height) of the overlay in pixels
+            cell_size: Width and height of a cell in pixels
+            color: RGB color of visited cells
+            alpha: Opacity of visited cells, 0 to 255
+        """
+        self.color = tuple(color)
+        self.alpha = alpha
+        self.cell_size = cell_size
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self._empty = True
+        self._pending_clear = False
+        self._trail = None
+        self._painted = 0
+
+    def clear(self):
+        """Forget every painted cell; the pixels are wiped on the next paint"""
+        self._empty = True
+        self._pending_clear = True
+        self._trail = None
+        self._painted = 0
+
+    def paint(self, x, y):
+        """Mark the cell (x, y) as visited"""
+        if self._pending_clear:
+            self.surface.fill((0, 0, 0, 0))
+            self._pending_clear = False
+        size = self.cell_size
+        self.surface.fill(self.color + (self.alpha,), (x * size, y * size, size, size))
+        self._empty = False
+
+    def follow(self, trail):
+        """
+        Paint the cells appended to a growing list of cells since the last call.
+
+        Args:
+            trail: List of cells (x, y) that only ever grows, such as a
+                Simulation trajectory; passing a different list clears the overlay
+        """
+        if trail is not self._trail:
+            self.clear()
+            self._trail = trail
+        for x, y in trail[self._painted:]:
+            self.paint(x, y)
+        self._painted = len(trail)
+
+    def draw(self, screen, position=(0, 0)):
+        """Composite the overlay onto screen with a single blit"""
+        if not self._empty:
+            screen.blit(self.surface, position)
@@ -0,0 +1,408 @@
+import os
+import random
+import shutil
+import tempfile
+import weakref
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+import constants
+from grid.components import LAND
+from grid.grid import Grid
+from grid.neighbor_mask import padded_neighbor_masks
+from grid.shore_cost import shore_cost_field
+from grid.terrain import hashed_land_field, smooth_landmass
+
+# Shore penalty looks this many cells out, and so must every tile
+SHORE_RADIUS = 2
+
+
+class ChunkedGridError(TypeError):
+    """Raised for Grid operations that need the whole map in memory, which a chunked world never has"""
+
+
+class Tile:
+    """
+    One square of a chunked world: navigability, neighbor masks and shore field.
+
+    Attributes:
+        cells (bytearray): Row-major navigability, 1 where a boat can sail
+        masks (tuple): (open, moves, shore) mask bytearrays, see grid.neighbor_mask
+        shore (numpy.ndarray): Flat shore penalty field for a penalty of 1
+        costs (dict): Shore penalty per multiplier, as array('d'), built on demand
+    """
+    __slots__ = ("cells", "masks", "shore", "costs")
+
+    def __init__(self, cells, masks, shore):
+        self.cells = cells
+        self.masks = masks
+        self.shore = shore
+        self.costs = {}
+
+    def shore_costs(self, penalty):
+        """Shore penalty of every cell of the tile for a multiplier, cached per multiplier"""
+        costs = self.costs.get(penalty)
+        if costs is None:
+            costs = self.costs[penalty] = array("d", (penalty * self.shore).tobytes())
+        return costs
+
+    @property
+    def nbytes(self):
+        """Memory held by the tile, counted against the cache budget"""
+        return 4 * len(self.cells) + self.shore.nbytes + sum(costs.itemsize * len(costs) for costs in self.costs.values())
+
+    def to_bytes(self):
+        """Cells, masks and shore field back to back, as spilled to disk"""
+        return b"".join((bytes(self.cells), *map(bytes, self.masks), self.shore.tobytes()))
+
+    @classmethod
+    def from_bytes(cls, data, area):
+        """Rebuild a tile of area cells written by to_bytes"""
+        views = [bytearray(data[i * area:(i + 1) * area]) for i in range(4)]
+        return cls(views[0], tuple(views[1:]), np.frombuffer(data[4 * area:], dtype=np.float64).copy())
+
+
+class TileCache:
+    """
+    Least recently used tiles within a memory budget, optionally spilling to disk.
+
+    Tiles are built on demand. When the kept tiles outgrow the budget the
+    least recently used ones are dropped, or written to the spill directory
+    so that reading them back replaces building them again.
+
+    Attributes:
+        budget (int): Bytes of tiles kept in memory
+        spill_dir (str): Private directory evicted tiles are written to, or None
+        builds (int): Number of tiles built
+        loads (int): Number of tiles read back from the spill directory
+        evictions (int): Number of tiles dropped from memory
+    """
+
+    def __init__(self, build, area, budget, spill_dir=None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            build: Function from a tile key (tx, ty) to a new Tile
+            area: Cells per tile
+            budget: Bytes of tiles kept in memory; the most recent tile is always kept
+            spill_dir: Optional directory to create the private spill directory in
+        """
+        self.build = build
+        self.area = area
+        self.budget = budget
+        self.spill_dir = tempfile.mkdtemp(prefix="tiles-", dir=spill_dir) if spill_dir is not None else None
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.spill_dir, True) if self.spill_dir else None
+        self._tiles = OrderedDict()
+        self._spilled = set()
+        self.nbytes = 0
+        self.builds = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __contains__(self, key):
+        return key in self._tiles
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, f"{key[0]}_{key[1]}.tile")
+
+    def get(self, key):
+        """The tile at key, building or loading it if it is not in memory"""
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        if key in self._spilled:
+            with open(self._path(key), "rb") as file:
+                tile = Tile.from_bytes(file.read(), self.area)
+            self.loads += 1
+        else:
+            tile = self.build(key)
+            self.builds += 1
+        self._tiles[key] = tile
+        self.nbytes += tile.nbytes
+        self.trim()
+        return tile
+
+    def trim(self):
+        """Evict least recently used tiles until the rest fit the budget"""
+        # Shore cost arrays may have grown the tiles since they were counted
+        self.nbytes = sum(tile.nbytes for tile in self._tiles.values())
+        while self.nbytes > self.budget and len(self._tiles) > 1:
+            key, tile = self._tiles.popitem(last=False)
+            self.nbytes -= tile.nbytes
+            self.evictions += 1
+            if self.spill_dir is not None and key not in self._spilled:
+                with open(self._path(key), "wb") as file:
+                    file.write(tile.to_bytes())
+                self._spilled.add(key)
+
+    def discard(self, key):
+        """Forget a tile everywhere, so that it is built again on next use"""
+        tile = self._tiles.pop(key, None)
+        if tile is not None:
+            self.nbytes -= tile.nbytes
+        if key in self._spilled:
+            self._spilled.remove(key)
+            os.remove(self._path(key))
+
+    def close(self):
+        """Drop every tile and remove the spill directory"""
+        self._tiles.clear()
+        self._spilled.clear()
+        self.nbytes = 0
+        if self._finalizer is not None:
+            self._finalizer()
+
+
+class TiledLayer:
+    """
+    Flat, row-major sequence over one layer of every tile of a chunked world.
+
+    Indexed like Grid.cells and friends, with cell (x, y) at y * cols + x, so
+    code written for flat buffers reads across tiles without noticing. The
+    tile last read from is remembered, which keeps neighboring reads cheap.
+    """
+    __slots__ = ("world", "pick", "_key", "_data", "_generation")
+
+    def __init__(self, world, pick):
+        """
+        Args:
+            world: The ChunkedGrid
+            pick: Function from a Tile to the flat buffer of this layer
+        """
+        self.world = world
+        self.pick = pick
+        self._key = None
+        self._data = None
+        self._generation = -1
+
+    def __len__(self):
+        return self.world.rows * self.world.cols
+
+    def __getitem__(self, index):
+        world = self.world
+        y, x = divmod(index, world.cols)
+        shift = world.tile_shift
+        key = (x >> shift, y >> shift)
+        if key != self._key or self._generation != world.generation:
+            self._data = self.pick(world.tiles.get(key))
+            self._key = key
+            self._generation = world.generation
+        mask = world.tile_size - 1
+        return self._data[((y & mask) << shift) | (x & mask)]
+
+    def __setitem__(self, index, value):
+        self.world.edit(index, value)
+
+
+class OpenWorldComponents:
+    """
+    Stand-in for WaterComponents on a world too large to label up front.
+
+    All water is taken to be one body of water, so reachability is optimistic:
+    a search for a target that turns out to be cut off runs until it gives up.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.count = 1
+        self.sizes = np.array([grid.rows * grid.cols])
+
+    def component(self, x, y):
+        """0 for water, LAND for land"""
+        return 0 if self.grid.is_navigable(x, y) else LAND
+
+    def reachable(self, start, target):
+        return self.grid.is_navigable(*start) and self.grid.is_navigable(*target)
+
+    def largest(self):
+        return 0
+
+    def random_cell(self, rng, component=None, attempts=1000):
+        """
+        Sample random cells until one is open water.
+
+        Returns:
+            Optional[tuple]: Cell (x, y), or None if every attempt hit land or shore
+        """
+        grid = self.grid
+        for _ in range(attempts):
+            x = rng.randrange(grid.cols)
+            y = rng.randrange(grid.rows)
+            if grid.check_for_water(x, y):
+                return x, y
+        return None
+
+
+class ChunkedGrid(Grid):
+    """
+    Grid whose map is generated tile by tile as boats and planners reach it.
+
+    The landmass is a pure function of the seed: every cell's starting value
+    is hashed from its coordinates, and each tile is smoothed together with a
+    border wide enough for the cellular automaton, its neighbor masks and its
+    shore penalty. Tiles therefore agree at their seams exactly as if the whole
+    map had been generated at once, and an evicted tile comes back identical.
+    Edits are kept separately and applied on top whenever a tile is built.
+
+    cells, neighbor_masks and shore_costs are TiledLayer sequences indexed
+    like a flat Grid, so Boat, the navigators and the search functions work
+    on it unchanged. What needs the whole map at once is not available:
+    navigable_array, exact water components (see OpenWorldComponents), flow
+    fields, jump point tables, hierarchical planning and saving to a file.
+
+    Attributes:
+        seed (int): Seed of the landmass
+        tile_size (int): Side of a tile in cells, a power of two
+        tiles (TileCache): Tiles currently held, with build and eviction counters
+        generation (int): Bumped whenever cached tiles are invalidated
+    """
+
+    def __init__(self, seed=0, rows=None, cols=None, tile_size=None, memory_budget=None, spill_dir=None,
+                 land_probability=constants.LAND_PROBABILITY, passes=constants.SMOOTHING_ITERATIONS):
+        """
+        Initialize a world without generating anything yet.
+
+        Args:
+            seed: Integer seed of the landmass
+            rows: Number of rows, constants.ROWS by default
+            cols: Number of columns, constants.COLS by default
+            tile_size: Side of a tile, constants.TILE_SIZE by default
+            memory_budget: Bytes of tiles kept in memory, constants.TILE_MEMORY_BUDGET by default
+            spill_dir: Directory for evicted tiles, constants.TILE_SPILL_DIR by default
+            land_probability: Chance of each cell starting as land
+            passes: Number of smoothing passes
+
+        Raises:
+            ValueError: If tile_size is not a power of two
+        """
+        tile_size = constants.TILE_SIZE if tile_size is None else tile_size
+        if tile_size <= 0 or tile_size & (tile_size - 1):
+            raise ValueError(f"Tile size must be a power of two, got {tile_size}")
+        self.rows = constants.ROWS if rows is None else rows
+        self.cols = constants.COLS if cols is None else cols
+        self.seed = seed
+        self.tile_size = tile_size
+        self.tile_shift = tile_size.bit_length() - 1
+        self.land_probability = land_probability
+        self.passes = passes
+        self.tiles = TileCache(self._build_tile, tile_size * tile_size,
+                               constants.TILE_MEMORY_BUDGET if memory_budget is None else memory_budget,
+                               constants.TILE_SPILL_DIR if spill_dir is None else spill_dir)
+        self.generation = 0
+        # Navigability edits per tile, {(tx, ty): {(x, y): navigable}}
+        self._edits = {}
+
+        self.attributes = {}
+        self.defaults = dict(self.DEFAULT_ATTRIBUTES)
+        self.layers = {}
+        self.version = 0
+        self.randomize_target = constants.RANDOMIZE_TARGET_POS
+        self.cells = TiledLayer(self, lambda tile: tile.cells)
+        self._neighbor_masks = tuple(TiledLayer(self, lambda tile, i=i: tile.masks[i]) for i in range(3))
+        self._shore_costs = {}
+        self._components = OpenWorldComponents(self)
+
+    def _build_tile(self, key):
+        """Generate the tile at key from the seed and apply the edits around it"""
+        tx, ty = key
+        size = self.tile_size
+        # Every pass of the automaton reads one cell further out
+        border = self.passes + SHORE_RADIUS
+        x0 = tx * size - border
+        y0 = ty * size - border
+        span = size + 2 * border
+        x = np.arange(x0, x0 + span)
+        y = np.arange(y0, y0 + span)
+        on_map = ((y >= 0) & (y < self.rows))[:, np.newaxis] & ((x >= 0) & (x < self.cols))
+        land = hashed_land_field(self.seed, x0, y0, span, span, self.land_probability) & on_map
+        land = smooth_landmass(land, self.passes, keep=on_map)
+
+        # Only the tile and SHORE_RADIUS cells around it survived every pass exactly
+        inner = slice(self.passes, span - self.passes)
+        land = land[inner, inner]
+        on_map = on_map[inner, inner]
+        left, top = x0 + self.passes, y0 + self.passes
+        for ex in (tx - 1, tx, tx + 1):
+            for ey in (ty - 1, ty, ty + 1):
+                for (cx, cy), navigable in self._edits.get((ex, ey), {}).items():
+                    if 0 <= cx - left < land.shape[1] and 0 <= cy - top < land.shape[0]:
+                        land[cy - top, cx - left] = not navigable
+        water = ~land & on_map
+
+        tile = slice(SHORE_RADIUS, SHORE_RADIUS + size)
+        ring = slice(SHORE_RADIUS - 1, SHORE_RADIUS + size + 1)
+        masks = padded_neighbor_masks(water[ring, ring], land[ring, ring])
+        shore = shore_cost_field(land, 1.0)[tile, tile]
+        return Tile(bytearray(water[tile, tile].astype(np.uint8).tobytes()),
+                    tuple(bytearray(mask.tobytes()) for mask in masks),
+                    shore.ravel())
+
+    def edit(self, index, navigable):
+        """Record a navigability change; set_navigable and set_cell go through here"""
+        y, x = divmod(index, self.cols)
+        shift = self.tile_shift
+        self._edits.setdefault((x >> shift, y >> shift), {})[(x, y)] = bool(navigable)
+
+    def _update_neighbor_masks(self, x, y):
+        """Drop every tile whose cells, masks or shore penalty an edit at (x, y) changes"""
+        shift = self.tile_shift
+        for tx in range((x - SHORE_RADIUS) >> shift, ((x + SHORE_RADIUS) >> shift) + 1):
+            for ty in range((y - SHORE_RADIUS) >> shift, ((y + SHORE_RADIUS) >> shift) + 1):
+                self.tiles.discard((tx, ty))
+        self.generation += 1
+
+    def close(self):
+        """Drop all tiles and remove spilled ones from disk"""
+        self.tiles.close()
+        self.generation += 1
+
+    @property
+    def neighbor_masks(self):
+        """(open, moves, shore) TiledLayers, see Grid.neighbor_masks"""
+        return self._neighbor_masks
+
+    @property
+    def components(self):
+        return self._components
+
+    def shore_costs(self, penalty=None):
+        """Shore penalty of every cell as a TiledLayer, one per penalty"""
+        if penalty is None:
+            penalty = constants.SHORE_PENALTY
+        layer = self._shore_costs.get(penalty)
+        if layer is None:
+            layer = self._shore_costs[penalty] = TiledLayer(self, lambda tile: tile.shore_costs(penalty))
+        return layer
+
+    def find_random_location(self, rng=random, component=None):
+        """Find a random open-water cell by sampling, see OpenWorldComponents.random_cell"""
+        location = self.components.random_cell(rng, component)
+        if location is None:
+            raise ValueError("No open water found in grid")
+        return location
+
+    def navigable_array(self):
+        raise ChunkedGridError("A chunked world is never held as one array")
+
+    def jump_runs(self, penalty=None):
+        raise ChunkedGridError("Jump point tables need the whole map")
+
+    def clear_water(self):
+        raise ChunkedGridError("A clear water mask needs the whole map; use get_path_cost")
+
+    def save(self, filename=constants.DATAPATH):
+        raise ChunkedGridError("A chunked world is defined by its seed; it is not saved as one file")
+
+    def __str__(self):
+        return (f"{self.rows}x{self.cols} world of {self.tile_size}x{self.tile_size} tiles, "
+                f"{len(self.tiles)} in memory")
+
+    def __repr__(self):
+        return f"ChunkedGrid(seed={self.seed}, {self})"
@@ -0,0 +1,157 @@
+import numpy as np
+
+# Label of land cells
+LAND = -1
+
+
+def label_water(navigable, corner_cutting=False):
+    """
+    Label the connected bodies of water in one pass over horizontal runs.
+
+    Planned paths may not cut corners, so a diagonal move is only possible
+    when both orthogonal cells are water as well. Two cells are therefore
+    connected for a planner exactly when they are 4-connected. Boats moved
+    with Boat.get_availability may cut corners, which makes diagonal
+    neighbors connected too.
+
+    Args:
+        navigable: 2D array indexed [y, x], truthy where a boat can sail
+        corner_cutting: Label 8-connected rather than 4-connected water
+
+    Returns:
+        tuple: (labels, count) where labels is an int32 array shaped like
+        navigable holding LAND or a component number from 0 to count - 1,
+        numbered in row-major order of each component's first cell
+    """
+    water = np.asarray(navigable, dtype=bool)
+    height, width = water.shape
+
+    # Number the horizontal runs of water cells
+    starts = water.copy()
+    starts[:, 1:] &= ~water[:, :-1]
+    run_ids = np.cumsum(starts).reshape(height, width) - 1
+    runs = int(starts.sum())
+
+    # Runs touching vertically belong to the same body of water
+    touching = water[:-1] & water[1:]
+    upper = run_ids[:-1][touching]
+    lower = run_ids[1:][touching]
+    if corner_cutting:
+        # So do runs touching at a corner, down-right and down-left
+        for above, below in ((np.s_[:-1, :-1], np.s_[1:, 1:]), (np.s_[:-1, 1:], np.s_[1:, :-1])):
+            corner = water[above] & water[below]
+            upper = np.concatenate((upper, run_ids[above][corner]))
+            lower = np.concatenate((lower, run_ids[below][corner]))
+        order = np.lexsort((lower, upper))
+        upper, lower = upper[order], lower[order]
+    # Overlapping runs produce one pair per shared column; keep the first of each
+    first = np.ones(len(upper), dtype=bool)
+    first[1:] = (upper[1:] != upper[:-1]) | (lower[1:] != lower[:-1])
+    pairs = np.stack([upper[first], lower[first]], axis=1)
+
+    parent = list(range(runs))
+    for a, b in pairs.tolist():
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        while parent[b] != b:
+            parent[b] = b = parent[parent[b]]
+        if a != b:
+            # Keep the earlier run as the root so numbering follows the first cell
+            if a < b:
+                parent[b] = a
+            else:
+                parent[a] = b
+
+    roots = np.array(parent, dtype=np.int64)
+    # Point every run straight at its root
+    while True:
+        jumped = roots[roots]
+        if np.array_equal(jumped, roots):
+            break
+        roots = jumped
+    unique_roots, run_labels = np.unique(roots, return_inverse=True)
+
+    labels = np.full((height, width), LAND, dtype=np.int32)
+    labels[water] = run_labels[run_ids[water]]
+    return labels, len(unique_roots)
+
+
+class WaterComponents:
+    """
+    Connected bodies of water of one grid, with open-water spawn candidates per body.
+
+    Attributes:
+        width (int): Number of grid columns
+        labels (numpy.ndarray): Flat int32 component number per cell, LAND for land
+        count (int): Number of bodies of water
+        sizes (numpy.ndarray): Number of cells in each body of water
+    """
+
+    def __init__(self, navigable, shore_mask=None, corner_cutting=False):
+        """
+        Label a grid's water.
+
+        Args:
+            navigable: 2D array indexed [y, x], truthy where a boat can sail
+            shore_mask: Optional flat shore masks (Grid.neighbor_masks[2]); cells
+                without land around them become the preferred spawn candidates
+            corner_cutting: Connect diagonal neighbors, see label_water
+        """
+        labels, self.count = label_water(navigable, corner_cutting)
+        self.width = labels.shape[1]
+        self.labels = labels.ravel()
+        self.sizes = np.bincount(self.labels[self.labels != LAND], minlength=self.count)
+
+        open_water = self.labels != LAND
+        if shore_mask is not None:
+            open_water &= np.frombuffer(shore_mask, dtype=np.uint8) == 0
+        candidates = np.flatnonzero(open_water)
+        order = np.argsort(self.labels[candidates], kind="stable")
+        # Candidates of component c are _candidates[_offsets[c]:_offsets[c + 1]], in row-major order
+        self._candidates = candidates[order]
+        self._offsets = np.searchsorted(self.labels[self._candidates], np.arange(self.count + 1))
+        self._open_water = candidates
+
+    def component(self, x, y):
+        """Component number of a cell, or LAND"""
+        return int(self.labels[y * self.width + x])
+
+    def reachable(self, start, target):
+        """Check whether a boat at start can ever reach target"""
+        labels = self.labels
+        a = labels[start[1] * self.width + start[0]]
+        return bool(a != LAND and a == labels[target[1] * self.width + target[0]])
+
+    def largest(self):
+        """Number of the biggest body of water, or None if there is no water"""
+        return int(np.argmax(self.sizes)) if self.count else None
+
+    def candidates(self, component=None):
+        """
+        Flat indexes of the open-water cells of one body of water, or of all of them.
+
+        Falls back to every cell of the component when it has no open water.
+        """
+        if component is None:
+            return self._open_water
+        chosen = self._candidates[self._offsets[component]:self._offsets[component + 1]]
+        if len(chosen) == 0:
+            chosen = np.flatnonzero(self.labels == component)
+        return chosen
+
+    def random_cell(self, rng, component=None):
+        """
+        Pick a uniformly random spawn candidate.
+
+        Args:
+            rng: random module or random.Random instance
+            component: Restrict the pick to this body of water
+
+        Returns:
+            Optional[tuple]: Cell (x, y), or None if there is no candidate
+        """
+        chosen = self.candidates(component)
+        if len(chosen) == 0:
+            return None
+        index = int(chosen[rng.randrange(len(chosen))])
+        return index % self.width, index // self.width
@@ -1,77 +1,241 @@
-from grid.grid_cells import GridCells
+from grid.components import WaterComponents
+from grid.grid_cells import GridCells, CellView
+from grid.grid_file import GridFileError, is_grid_file, read_grid_file, write_grid_file
+from grid.jump_runs import jump_runs, uniform_cells
+from grid.neighbor_mask import cell_masks, decode_table, neighbor_masks
+from grid.path_cost import clear_water_mask, join_paths, joined_path_costs, path_costs
+from grid.shore_cost import shore_cost_field
+from array import array
+from collections import deque
 import json
+import os
 import constants
 import random
+import numpy as np
+
+
+# Navigability changes remembered for changed_cells; older ones are forgotten
+CHANGE_LOG_SIZE = 4096
+
+# get_neighbors has always listed neighbors column by column
+NEIGHBOR_ORDER = decode_table(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
 
 
 class Grid:
-    def __init__(self):
-        self.rows = constants.ROWS
-        self.cols = constants.COLS
+    # Attributes shared by every cell that has no entry in the side table
+    DEFAULT_ATTRIBUTES = {"default": True}
+
+    def __init__(self, seed=None, rows=None, cols=None):
+        self.rows = constants.ROWS if rows is None else rows
+        self.cols = constants.COLS if cols is None else cols
         # Generate the landmass map
-        self.landmass_map = GridCells.generate_landmass_map(self.rows, self.cols)
-        # Create the grid with correct landmass map access
-        self.grid = [[GridCells.default(i, j, self.landmass_map) for j in range(self.cols)] for i in range(self.rows)]
+        landmass = GridCells.generate_landmass_map(self.rows, self.cols, seed)
+        self._allocate(self.rows, self.cols)
+        self.cells[:] = np.logical_not(landmass).astype(np.uint8).tobytes()
         self.randomize_target = constants.RANDOMIZE_TARGET_POS
 
+    def _allocate(self, rows, cols):
+        """Set up empty storage for a rows x cols grid"""
+        self.rows = rows
+        self.cols = cols
+        # Navigability, one byte per cell: cell (x, y) lives at index y * cols + x
+        self.cells = bytearray(rows * cols)
+        # Sparse per-cell attributes keyed by cell index, replacing the defaults entirely
+        self.attributes = {}
+        self.defaults = dict(self.DEFAULT_ATTRIBUTES)
+        # Optional named (rows, cols) arrays, only persisted by the binary format
+        self.layers = {}
+        # Bumped on every change so caches built from the grid know when to rebuild
+        self.version = 0
+        # (version, x, y) of recent navigability changes, complete after version _changes_from
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self._changes_from = 0
+        self._shore_costs = {}
+        self._jump_runs = {}
+        self._neighbor_masks = None
+        self._components = None
+        self._boat_components = None
+        self._clear_water = None
+
+    @classmethod
+    def from_landmass(cls, landmass):
+        """Create a Grid from a 2D array indexed [y][x] that is True for land"""
+        landmass = np.asarray(landmass, dtype=bool)
+        instance = cls.__new__(cls)
+        instance._allocate(*landmass.shape)
+        instance.cells[:] = np.logical_not(landmass).astype(np.uint8).tobytes()
+        instance.randomize_target = constants.RANDOMIZE_TARGET_POS
+        return instance
+
+    def navigable_array(self):
+        """Zero-copy (rows, cols) uint8 view of the navigability buffer"""
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.rows, self.cols)
+
+    @property
+    def neighbor_masks(self):
+        """
+        One-byte masks of every cell's 8 neighbors, see grid.neighbor_mask.
+
+        Built on first use and kept up to date by set_navigable and set_cell,
+        so the buffers can be held on to.
+
+        Returns:
+            tuple: Flat (open, moves, shore) bytearrays indexed like cells
+        """
+        if self._neighbor_masks is None:
+            masks = neighbor_masks(self.navigable_array())
+            self._neighbor_masks = tuple(bytearray(mask.tobytes()) for mask in masks)
+        return self._neighbor_masks
+
+    def _update_neighbor_masks(self, x, y):
+        """Recompute the masks around a cell whose navigability changed"""
+        if self._neighbor_masks is None:
+            return
+        open_masks, move_masks, shore_masks = self._neighbor_masks
+        for ny in range(max(y - 1, 0), min(y + 2, self.rows)):
+            for nx in range(max(x - 1, 0), min(x + 2, self.cols)):
+                index = ny * self.cols + nx
+                open_masks[index], move_masks[index], shore_masks[index] = \
+                    cell_masks(self.cells, self.cols, self.rows, nx, ny)
+
+    @property
+    def components(self):
+        """Connected bodies of water, relabeled after the grid changes"""
+        if self._components is None or self._components[0] != self.version:
+            self._components = (self.version, WaterComponents(self.navigable_array(), self.neighbor_masks[2]))
+        return self._components[1]
+
+    @property
+    def boat_components(self):
+        """Bodies of water joined by corner-cutting moves as well, as Boat.get_availability allows"""
+        if self._boat_components is None or self._boat_components[0] != self.version:
+            self._boat_components = (self.version, WaterComponents(self.navigable_array(), self.neighbor_masks[2],
+                                                                   corner_cutting=True))
+        return self._boat_components[1]
+
+    def reachable(self, start, target, corner_cutting=False):
+        """Check in constant time whether a boat at start can ever reach target, optionally cutting corners"""
+        components = self.boat_components if corner_cutting else self.components
+        return (self.in_bounds(*start) and self.in_bounds(*target)
+                and components.reachable(start, target))
+
+    def shore_costs(self, penalty=None):
+        """Flat shore penalty of every cell, cached per penalty until the grid changes"""
+        if penalty is None:
+            penalty = constants.SHORE_PENALTY
+        version, costs = self._shore_costs.get(penalty, (None, None))
+        if version != self.version:
+            land = self.navigable_array() == 0
+            costs = shore_cost_field(land, penalty).ravel().tolist()
+            self._shore_costs[penalty] = (self.version, costs)
+        return costs
+
+    def clear_water(self):
+        """(rows, cols) bool array of the cells check_for_water accepts, cached until the grid changes"""
+        if self._clear_water is None or self._clear_water[0] != self.version:
+            self._clear_water = (self.version, clear_water_mask(self.navigable_array()))
+        return self._clear_water[1]
+
+    def jump_runs(self, penalty=None):
+        """
+        Uniform-cost cells and their straight run lengths, for jump point search.
+
+        Cached per penalty until the grid changes, like shore_costs.
+
+        Returns:
+            tuple: (uniform, runs) where uniform is a flat bytearray that is 1 for
+            the cells grid.jump_runs.uniform_cells picks, and runs holds a flat
+            array('i') per grid.jump_runs.RUN_DIRECTIONS entry
+        """
+        if penalty is None:
+            penalty = constants.SHORE_PENALTY
+        version, tables = self._jump_runs.get(penalty, (None, None))
+        if version != self.version:
+            uniform = uniform_cells(self.navigable_array(), self.shore_costs(penalty) if penalty else None)
+            runs = tuple(array("i", run.tobytes()) for run in jump_runs(uniform))
+            tables = (bytearray(uniform.astype(np.uint8).tobytes()), runs)
+            self._jump_runs[penalty] = (self.version, tables)
+        return tables
+
+    def in_bounds(self, x, y):
+        """Check if a position lies inside the grid"""
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
     def check_for_water(self, x, y):
         """Check if a location and its surrounding cells are navigable"""
-        if x < 0 or y < 0 or x >= self.rows or y >= self.cols:
+        if not self.in_bounds(x, y):
             return False
 
+        cells = self.cells
+        cols = self.cols
         # Check center cell first
-        if not self.is_navigable(x, y):
+        if not cells[y * cols + x]:
             return False
 
         # Check surrounding cells (8-directional)
-        neighbors = [
-            (x - 1, y - 1), (x + 1, y + 1), (x + 1, y - 1), (x - 1, y + 1),
-            (x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)
-        ]
-
-        for nx, ny in neighbors:
-            if not (0 <= nx < self.rows and 0 <= ny < self.cols):
-                continue
-            if not self.is_navigable(nx, ny):
-                return False
+        for ny in range(max(y - 1, 0), min(y + 2, self.rows)):
+            for nx in range(max(x - 1, 0), min(x + 2, cols)):
+                if not cells[ny * cols + nx]:
+                    return False
 
         return True
 
-    def find_random_location(self):
-        """Find a random navigable location with navigable neighbors"""
-        max_attempts = 1000
-        attempts = 0
-
-        while attempts < max_attempts:
-            x = random.randint(0, self.rows - 1)
-            y = random.randint(0, self.cols - 1)
+    def find_random_location(self, rng=random, component=None):
+        """
+        Find a random navigable location with navigable neighbors.
 
-            if self.check_for_water(x, y):
-                return (x, y)
+        Picks uniformly among the open-water cells, optionally within one body
+        of water (see components), and falls back to any navigable cell.
+        """
+        location = self.components.random_cell(rng, component)
+        if location is not None:
+            return location
 
-            attempts += 1
-
-        # If we couldn't find a good spot, try to find any navigable spot
-        for x in range(self.rows):
-            for y in range(self.cols):
-                if self.is_navigable(x, y):
-                    return (x, y)
+        # If there is no open water, settle for any navigable spot
+        index = self.cells.find(1)
+        if index >= 0:
+            return (index % self.cols, index // self.cols)
 
         raise ValueError("No navigable locations found in grid")
 
     @classmethod
     def from_json(cls, data):
         """Create a Grid instance from JSON data"""
-        instance = cls()
-        instance.rows = data["rows"]
-        instance.cols = data["cols"]
-        instance.grid = [[GridCells(**cell_data) for cell_data in row] for row in data["grid"]]
+        instance = cls.__new__(cls)
+        instance._allocate(data["rows"], data["cols"])
+        instance.randomize_target = constants.RANDOMIZE_TARGET_POS
+        cells = instance.cells
+        defaults = instance.defaults
+        index = 0
+        for row in data["grid"]:
+            for cell_data in row:
+                cell = GridCells(**cell_data)
+                cells[index] = bool(cell.navigable)
+                extra = {key: value for key, value in cell_data.items() if key != "navigable"}
+                if extra != defaults:
+                    instance.attributes[index] = extra
+                index += 1
         return instance
 
     @classmethod
-    def load(cls, filename):
-        """Load grid from a JSON file or create new if file doesn't exist"""
+    def from_binary(cls, filename, use_mmap=None):
+        """Create a Grid instance from a binary grid file"""
+        data = read_grid_file(filename, use_mmap)
+        instance = cls.__new__(cls)
+        instance._allocate(data["rows"], data["cols"])
+        instance.randomize_target = constants.RANDOMIZE_TARGET_POS
+        instance.cells = data["cells"]
+        instance.defaults = data["defaults"]
+        instance.attributes = data["attributes"]
+        instance.layers = data["layers"]
+        return instance
+
+    @classmethod
+    def load(cls, filename=constants.DATAPATH):
+        """Load grid from a binary or JSON file or create new if file doesn't exist"""
         try:
+            if is_grid_file(filename):
+                return cls.from_binary(filename)
             with open(filename, 'r') as f:
                 return cls.from_json(json.load(f))
         except FileNotFoundError:
@@ -79,60 +243,99 @@ class Grid:
             instance = cls()
             instance.save(filename)
             return instance
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, UnicodeDecodeError, GridFileError):
             # If file is corrupted, create a new grid
             print(f"Warning: {filename} was corrupted. Creating new grid.")
             instance = cls()
             instance.save(filename)
             return instance
 
+    def set_navigable(self, x, y, navigable):
+        """Set whether the cell at (x, y) is navigable"""
+        self.cells[y * self.cols + x] = bool(navigable)
+        self._update_neighbor_masks(x, y)
+        self.version += 1
+        self._log_change(x, y)
+
+    def _log_change(self, x, y):
+        """Remember that the navigability of (x, y) changed in the current version"""
+        if len(self._changes) == self._changes.maxlen:
+            self._changes_from = self._changes[0][0]
+        self._changes.append((self.version, x, y))
+
+    def changed_cells(self, since):
+        """
+        Cells whose navigability changed after a version, for incremental updates.
+
+        Args:
+            since: Version the caller last saw
+
+        Returns:
+            list: Cells (x, y), possibly repeated, or None if the changes go
+            back further than the grid remembers
+        """
+        if since < self._changes_from:
+            return None
+        return [(x, y) for version, x, y in self._changes if version > since]
+
     def set_cell(self, xy, value):
         """Set a cell at position xy to value"""
         x, y = xy
-        if 0 <= x < self.rows and 0 <= y < self.cols:
-            self.grid[y][x] = value
+        if self.in_bounds(x, y):
+            index = y * self.cols + x
+            data = value.save()
+            self.cells[index] = bool(data["navigable"])
+            self._update_neighbor_masks(x, y)
+            extra = {key: item for key, item in data.items() if key != "navigable"}
+            if extra == self.defaults:
+                self.attributes.pop(index, None)
+            else:
+                self.attributes[index] = extra
+            self.version += 1
+            self._log_change(x, y)
 
     def get_cell(self, xy):
         """Get the cell at position xy"""
         x, y = xy
-        if 0 <= x < self.rows and 0 <= y < self.cols:
-            return self.grid[y][x]
+        if self.in_bounds(x, y):
+            return CellView(self, y * self.cols + x)
         return None
 
     def is_navigable(self, x, y):
         """Check if a position is navigable"""
-        return self.grid[y][x].dict["navigable"]
-
-    def get_neighbors(self, x, y):
-        """Get all valid neighboring positions"""
-        neighbors = []
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                nx, ny = x + dx, y + dy
-                if (0 <= nx < self.rows and
-                        0 <= ny < self.cols and
-                        self.is_navigable(nx, ny)):
-                    neighbors.append((nx, ny))
-        return neighbors
-
-    def save(self, filename):
-        """Save grid to a JSON file"""
-        with open(filename, "w") as file:
-            json.dump(self.save_json(), file)
+        return bool(self.cells[y * self.cols + x])
+
+    def get_neighbors(self, x, y, corner_cutting=True):
+        """Get all valid neighboring positions, optionally without diagonals that cut past land"""
+        mask = self.neighbor_masks[0 if corner_cutting else 1][y * self.cols + x]
+        return [(x + dx, y + dy) for dx, dy in NEIGHBOR_ORDER[mask]]
+
+    def save(self, filename=constants.DATAPATH):
+        """Save grid to a JSON file if filename ends in .json, otherwise to a binary grid file"""
+        if os.fspath(filename).endswith(".json"):
+            with open(filename, "w") as file:
+                json.dump(self.save_json(), file)
+        else:
+            write_grid_file(filename, self.rows, self.cols, self.cells,
+                            self.defaults, self.attributes, self.layers)
 
     def save_json(self):
         """Convert grid to JSON format"""
+        cells = self.cells
+        attributes = self.attributes
+        defaults = self.defaults
         return {
             "rows": self.rows,
             "cols": self.cols,
-            "grid": [[cell.save() for cell in row] for row in self.grid]
+            "grid": [[{"navigable": bool(cells[index]), **attributes.get(index, defaults)}
+                      for index in range(y * self.cols, (y + 1) * self.cols)]
+                     for y in range(self.rows)]
         }
 
     def __str__(self):
         """String representation of the grid"""
-        return "\n".join(" ".join(str(cell) for cell in row) for row in self.grid)
+        return "\n".join(" ".join("." if cell else "#" for cell in self.cells[y * self.cols:(y + 1) * self.cols])
+                         for y in range(self.rows))
 
     def __repr__(self):
         """Detailed string representation of the grid"""
@@ -163,4 +366,22 @@ class Grid:
 
             cost += distance
 
-        return cost
\ No newline at end of file
+        return cost
+
+    def get_path_costs(self, paths, lengths=None):
+        """
+        Calculate the cost of many paths at once, each exactly as get_path_cost would.
+
+        Args:
+            paths: A list of paths, or an integer array (count, size, 2) of
+                paths padded to the same size
+            lengths: Number of real cells in each padded path, all of them by default
+
+        Returns:
+            numpy.ndarray: float64 cost of every path, infinite for empty ones
+        """
+        if not isinstance(paths, np.ndarray):
+            # Lists are joined end to end rather than padded
+            cells, lengths = join_paths(paths)
+            return joined_path_costs(self.clear_water(), cells, lengths, constants.SHORE_PENALTY)
+        return path_costs(self.clear_water(), paths, lengths, constants.SHORE_PENALTY)
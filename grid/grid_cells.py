@@ -1,5 +1,5 @@
-import random
 import constants
+from grid.terrain import generate_landmass
 
 class GridCells:
     REQUIRED = {"navigable"}
@@ -30,36 +30,62 @@ class GridCells:
         return self.dict
 
     @staticmethod
-    def generate_landmass_map(rows, cols):
-        # Initialize the grid randomly
-        grid = [[random.random() < constants.LAND_PROBABILITY for _ in range(cols)] for _ in range(rows)]
-
-        # Helper function to count land neighbors
-        def count_land_neighbors(x, y):
-            count = 0
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    if dx == 0 and dy == 0:
-                        continue
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < rows and 0 <= ny < cols and grid[nx][ny]:
-                        count += 1
-            return count
-
-        # Smooth the map to create more natural-looking landmasses
-        for _ in range(constants.SMOOTHING_ITERATIONS):
-            new_grid = [[False for _ in range(cols)] for _ in range(rows)]
-            for i in range(rows):
-                for j in range(cols):
-                    land_neighbors = count_land_neighbors(i, j)
-                    if grid[i][j]:
-                        new_grid[i][j] = land_neighbors >= 4
-                    else:
-                        new_grid[i][j] = land_neighbors >= 5
-            grid = new_grid
-        return grid
+    def generate_landmass_map(rows, cols, seed=None):
+        # Smooth a random map to create more natural-looking landmasses
+        return generate_landmass(rows, cols, constants.LAND_PROBABILITY,
+                                 constants.SMOOTHING_ITERATIONS, seed)
 
     @classmethod
     def default(cls, row, col, landmass_map):
         # Now landmass_map is the full 2D array, so we access it with row and col
-        return cls(navigable=not landmass_map[row][col], default=True)
\ No newline at end of file
+        return cls(navigable=not landmass_map[row][col], default=True)
+
+
+class CellView:
+    """
+    Lightweight view of one cell of a Grid with the same interface as GridCells.
+
+    Navigability is read from and written to the grid's byte buffer. Other
+    attributes come from the grid's side table, falling back to the grid's
+    shared default attributes for cells that were never customised.
+    """
+    __slots__ = ("grid", "index")
+
+    def __init__(self, grid, index):
+        self.grid = grid
+        self.index = index
+
+    @property
+    def navigable(self):
+        return bool(self.grid.cells[self.index])
+
+    @property
+    def dict(self):
+        return self.save()
+
+    def __bool__(self):
+        return self.navigable
+
+    def set(self, key, value):
+        if key == "navigable":
+            self.grid.set_navigable(self.index % self.grid.cols, self.index // self.grid.cols, value)
+            return
+        attributes = self.grid.attributes.get(self.index)
+        if attributes is None:
+            attributes = self.grid.attributes[self.index] = dict(self.grid.defaults)
+        attributes[key] = value
+        self.grid.version += 1
+
+    def get(self, key):
+        if key == "navigable":
+            return self.navigable
+        return self.grid.attributes.get(self.index, self.grid.defaults)[key]
+
+    def __contains__(self, item):
+        return item == "navigable" or item in self.grid.attributes.get(self.index, self.grid.defaults)
+
+    def save(self):
+        return {"navigable": self.navigable, **self.grid.attributes.get(self.index, self.grid.defaults)}
+
+    def __repr__(self):
+        return f"CellView({self.save()})"
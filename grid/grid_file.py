@@ -0,0 +1,194 @@
+"""
+Binary grid file format.
+
+Layout (little-endian):
+    header      magic b"DMGR", format version, layer count, rows, cols,
+                metadata length, CRC-32 of everything after the header
+    navigation  rows * cols navigability bits, packed 8 per byte, row-major
+    metadata    UTF-8 JSON with the default cell attributes, the sparse
+                per-cell attribute table and the layer directory
+    padding     zero bytes up to the next 8-byte boundary
+    layers      raw rows * cols arrays, each starting on an 8-byte boundary
+
+Files larger than MMAP_THRESHOLD are memory-mapped. Their extra layers are
+numpy views onto the mapping, so the OS only pages them in when they are read.
+The navigability plane is packed 8 cells per byte and is always unpacked into
+memory, one byte per cell, mapped or not.
+
+Convert an existing JSON grid with:
+    python -m grid.grid_file data/grid.json data/grid.bin
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"DMGR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+ALIGNMENT = 8
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+
+class GridFileError(ValueError):
+    """Raised when a binary grid file is malformed or fails its checksum"""
+
+
+def is_grid_file(filename):
+    """Check whether filename starts with the binary grid magic bytes"""
+    with open(filename, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _padding(offset):
+    return -offset % ALIGNMENT
+
+
+def write_grid_file(filename, rows, cols, cells, defaults, attributes, layers=None):
+    """
+    Write a grid in the binary format.
+
+    Args:
+        filename: Destination path
+        rows: Number of rows
+        cols: Number of columns
+        cells: rows * cols navigability bytes, row-major
+        defaults: Attributes shared by cells without a side table entry
+        attributes: Side table mapping cell index to that cell's attributes
+        layers: Optional dict of name -> (rows, cols) numpy array
+    """
+    plane = np.packbits(np.frombuffer(cells, dtype=np.uint8)).tobytes()
+
+    directory = []
+    blobs = []
+    offset = 0
+    for name, layer in (layers or {}).items():
+        layer = np.ascontiguousarray(layer)
+        if layer.shape != (rows, cols):
+            raise GridFileError(f"Layer {name!r} has shape {layer.shape}, expected {(rows, cols)}")
+        directory.append({"name": name, "dtype": layer.dtype.str, "offset": offset})
+        blob = layer.tobytes()
+        blobs.append(blob + bytes(_padding(len(blob))))
+        offset += len(blobs[-1])
+
+    metadata = json.dumps({
+        "defaults": defaults,
+        "attributes": {str(index): value for index, value in attributes.items()},
+        "layers": directory,
+    }).encode("utf-8")
+    padding = bytes(_padding(HEADER.size + len(plane) + len(metadata)))
+
+    checksum = 0
+    for chunk in (plane, metadata, padding, *blobs):
+        checksum = zlib.crc32(chunk, checksum)
+
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(directory), rows, cols, len(metadata), checksum))
+        for chunk in (plane, metadata, padding, *blobs):
+            file.write(chunk)
+
+
+def read_grid_file(filename, use_mmap=None, verify=None):
+    """
+    Read a grid written by write_grid_file.
+
+    Args:
+        filename: Source path
+        use_mmap: Memory-map the file so that the layers are read lazily;
+            defaults to True above MMAP_THRESHOLD. The cells are unpacked
+            in full either way
+        verify: Check the CRC-32; defaults to True unless the file is memory-mapped,
+            since verifying touches every page of the mapping
+
+    Returns:
+        dict: rows, cols, cells (bytearray, copied out of the file), defaults,
+        attributes and layers (views onto the mapping when memory-mapped)
+
+    Raises:
+        GridFileError: If the file is not a valid grid file
+    """
+    if use_mmap is None:
+        use_mmap = os.path.getsize(filename) > MMAP_THRESHOLD
+    if verify is None:
+        verify = not use_mmap
+
+    with open(filename, "rb") as file:
+        if use_mmap:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = file.read()
+
+    if len(data) < HEADER.size:
+        raise GridFileError(f"{filename} is too short to be a grid file")
+    magic, version, layer_count, rows, cols, metadata_length, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise GridFileError(f"{filename} is not a grid file")
+    if version != VERSION:
+        raise GridFileError(f"{filename} has unsupported format version {version}")
+
+    view = memoryview(data)
+    if verify and zlib.crc32(view[HEADER.size:]) != checksum:
+        raise GridFileError(f"{filename} failed its checksum")
+
+    plane_start = HEADER.size
+    plane_length = (rows * cols + 7) // 8
+    metadata_start = plane_start + plane_length
+    layers_start = metadata_start + metadata_length
+    layers_start += _padding(layers_start)
+    if len(data) < layers_start:
+        raise GridFileError(f"{filename} is truncated")
+
+    plane = np.frombuffer(data, dtype=np.uint8, count=plane_length, offset=plane_start)
+    cells = bytearray(np.unpackbits(plane, count=rows * cols).tobytes())
+    try:
+        metadata = json.loads(bytes(view[metadata_start:metadata_start + metadata_length]))
+    except ValueError as error:
+        raise GridFileError(f"{filename} has unreadable metadata") from error
+
+    layers = {}
+    for entry in metadata["layers"][:layer_count]:
+        dtype = np.dtype(entry["dtype"])
+        start = layers_start + entry["offset"]
+        if start + rows * cols * dtype.itemsize > len(data):
+            raise GridFileError(f"{filename} is truncated in layer {entry['name']!r}")
+        layers[entry["name"]] = np.frombuffer(data, dtype=dtype, count=rows * cols, offset=start).reshape(rows, cols)
+
+    return {
+        "rows": rows,
+        "cols": cols,
+        "cells": cells,
+        "defaults": metadata["defaults"],
+        "attributes": {int(index): value for index, value in metadata["attributes"].items()},
+        "layers": layers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a grid between the JSON and binary formats")
+    parser.add_argument("source", help="existing grid file (JSON or binary)")
+    parser.add_argument("destination", help="output path; a .json suffix writes JSON, anything else binary")
+    args = parser.parse_args()
+
+    from grid.grid import Grid
+
+    if not os.path.exists(args.source):
+        parser.error(f"{args.source} does not exist")
+    # Not Grid.load, which replaces a file it cannot read with a random grid
+    try:
+        if is_grid_file(args.source):
+            grid = Grid.from_binary(args.source)
+        else:
+            with open(args.source, "r") as file:
+                grid = Grid.from_json(json.load(file))
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        parser.error(f"cannot read {args.source}: {error}")
+    grid.save(args.destination)
+    print(f"Wrote {grid.rows}x{grid.cols} grid to {args.destination} "
+          f"({os.path.getsize(args.destination):,} bytes, was {os.path.getsize(args.source):,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Directions of the run tables, the straight half of nav.pathfinding.DIRECTIONS
+RUN_DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def uniform_cells(navigable, shore_cost=None):
+    """
+    Find the cells where every move costs the same.
+
+    A cell is uniform when it and all 8 of its neighbors are on the map,
+    navigable and free of shore penalty. Any move into or out of such a cell
+    costs only its length, which is what jump point search relies on.
+
+    Args:
+        navigable: 2D array indexed [y, x], truthy where a boat can sail
+        shore_cost: Optional per-cell shore penalty, same shape or flat
+
+    Returns:
+        numpy.ndarray: bool array shaped like navigable
+    """
+    free = np.asarray(navigable, dtype=bool)
+    height, width = free.shape
+    if shore_cost is not None:
+        free = free & (np.asarray(shore_cost).reshape(height, width) == 0)
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = free
+
+    uniform = free.copy()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            uniform &= padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+    return uniform
+
+
+def jump_runs(uniform):
+    """
+    Count, for every cell, the straight steps to the next non-uniform cell.
+
+    Args:
+        uniform: 2D bool array from uniform_cells
+
+    Returns:
+        tuple: One int32 array per RUN_DIRECTIONS entry, shaped like uniform.
+        Moving k steps from a cell, k being its entry, lands on the first cell
+        in that direction that is not uniform. Entries of non-uniform cells are
+        meaningless; uniform cells never border the edge, so theirs always are.
+    """
+    uniform = np.asarray(uniform, dtype=bool)
+    height, width = uniform.shape
+    stop = ~uniform
+    runs = []
+    for dx, dy in RUN_DIRECTIONS:
+        axis = 1 if dx else 0
+        length = width if dx else height
+        shape = [1, 1]
+        shape[axis] = length
+        position = np.arange(length).reshape(shape)
+        if dx + dy > 0:
+            # Nearest stop at or after each position, then shifted to strictly after
+            nearest = np.where(stop, position, length)
+            nearest = np.flip(np.minimum.accumulate(np.flip(nearest, axis), axis=axis), axis)
+            following = np.full_like(nearest, length)
+            if axis:
+                following[:, :-1] = nearest[:, 1:]
+            else:
+                following[:-1] = nearest[1:]
+            runs.append((following - position).astype(np.int32))
+        else:
+            nearest = np.maximum.accumulate(np.where(stop, position, -1), axis=axis)
+            preceding = np.full_like(nearest, -1)
+            if axis:
+                preceding[:, 1:] = nearest[:, :-1]
+            else:
+                preceding[1:] = nearest[:-1]
+            runs.append((position - preceding).astype(np.int32))
+    return tuple(runs)
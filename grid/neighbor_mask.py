@@ -0,0 +1,106 @@
+import numpy as np
+
+# Bit i of a mask stands for the neighbor at NEIGHBOR_OFFSETS[i], (dx, dy).
+# Same order as nav.pathfinding.DIRECTIONS so masks decode straight into moves.
+NEIGHBOR_OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+def decode_table(order=NEIGHBOR_OFFSETS):
+    """
+    Lookup table from a mask to the neighbor offsets it contains.
+
+    Args:
+        order: The offsets in the order they should be listed
+
+    Returns:
+        tuple: 256 tuples of (dx, dy), entry m holding the offsets whose bit is set in m
+    """
+    bits = [(NEIGHBOR_OFFSETS.index(offset), offset) for offset in order]
+    return tuple(tuple(offset for bit, offset in bits if mask >> bit & 1) for mask in range(256))
+
+
+NEIGHBORS = decode_table()
+
+
+def neighbor_masks(navigable):
+    """
+    Compute the neighbor masks of every cell in one vectorized pass.
+
+    Args:
+        navigable: 2D array indexed [y, x], truthy where a boat can sail
+
+    Returns:
+        tuple: Three uint8 arrays shaped like navigable:
+            open: bit set where the neighbor is on the map and navigable
+            moves: like open, but without diagonals that cut past land
+            shore: bit set where the neighbor is on the map and land
+    """
+    navigable = np.asarray(navigable, dtype=bool)
+    height, width = navigable.shape
+    # Cells off the map are neither water nor shore
+    water = np.zeros((height + 2, width + 2), dtype=bool)
+    water[1:-1, 1:-1] = navigable
+    land = np.zeros((height + 2, width + 2), dtype=bool)
+    land[1:-1, 1:-1] = ~navigable
+    return padded_neighbor_masks(water, land)
+
+
+def padded_neighbor_masks(water, land):
+    """
+    Compute neighbor masks from water and land arrays with a one-cell border.
+
+    Lets callers that know what lies beyond the edge, such as one tile of a
+    larger map, decide it themselves; neighbor_masks puts the edge of the map
+    there.
+
+    Args:
+        water: 2D bool array of shape (height + 2, width + 2), True where a boat can sail
+        land: 2D bool array of the same shape, True for land
+
+    Returns:
+        tuple: (open, moves, shore) uint8 arrays of shape (height, width), see neighbor_masks
+    """
+    height = water.shape[0] - 2
+    width = water.shape[1] - 2
+
+    def shifted(padded, dx, dy):
+        return padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
+    open_mask = np.zeros((height, width), dtype=np.uint8)
+    move_mask = np.zeros((height, width), dtype=np.uint8)
+    shore_mask = np.zeros((height, width), dtype=np.uint8)
+    for bit, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+        neighbor = shifted(water, dx, dy)
+        open_mask |= neighbor.astype(np.uint8) << bit
+        if dx and dy:
+            neighbor = neighbor & shifted(water, dx, 0) & shifted(water, 0, dy)
+        move_mask |= neighbor.astype(np.uint8) << bit
+        shore_mask |= shifted(land, dx, dy).astype(np.uint8) << bit
+    return open_mask, move_mask, shore_mask
+
+
+def cell_masks(cells, width, height, x, y):
+    """
+    Compute the open, moves and shore masks of a single cell.
+
+    Args:
+        cells: Flat row-major navigability buffer
+        width: Number of columns
+        height: Number of rows
+        x, y: The cell
+
+    Returns:
+        tuple: (open, moves, shore) masks as ints, see neighbor_masks
+    """
+    open_mask = move_mask = shore_mask = 0
+    for bit, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < width and 0 <= ny < height):
+            continue
+        if not cells[ny * width + nx]:
+            shore_mask |= 1 << bit
+            continue
+        open_mask |= 1 << bit
+        if not (dx and dy) or (cells[y * width + nx] and cells[ny * width + x]):
+            move_mask |= 1 << bit
+    return open_mask, move_mask, shore_mask
@@ -0,0 +1,182 @@
+from itertools import chain
+
+import numpy as np
+
+# Cells evaluated per block, so that the temporaries stay small enough for the caches
+STEP_BLOCK = 1 << 16
+# One cell (x, y) of an int64 path array as a single item
+_CELL = np.dtype((np.void, 16))
+
+
+def clear_water_mask(navigable):
+    """
+    Find the cells Grid.check_for_water accepts, all at once.
+
+    A cell is clear water when it and every neighbor that lies on the map
+    are navigable. Neighbors outside the map do not count, as in the
+    per-cell check.
+
+    Args:
+        navigable: 2D array indexed [y, x], truthy where a boat can sail
+
+    Returns:
+        numpy.ndarray: bool array shaped like navigable
+    """
+    land = np.logical_not(np.asarray(navigable, dtype=bool))
+    height, width = land.shape
+    padded = np.zeros((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = land
+    near_land = np.zeros_like(land)
+    for dy in range(3):
+        for dx in range(3):
+            near_land |= padded[dy:dy + height, dx:dx + width]
+    return ~near_land
+
+
+def step_penalties(clear, x, y):
+    """
+    Which steps end outside clear water and pay the shore penalty.
+
+    Args:
+        clear: clear_water_mask of the grid
+        x, y: int64 arrays of the cells the steps end in, any shape
+
+    Returns:
+        numpy.ndarray: bool array shaped like x, True where the penalty applies,
+        including every cell off the map
+    """
+    rows, cols = clear.shape
+    # Negative coordinates turn huge when read as unsigned, so one compare per axis bounds them
+    inside = (x.view(np.uint64) < cols) & (y.view(np.uint64) < rows)
+    return ~(inside & clear.ravel().take(y * cols + x, mode='clip'))
+
+
+def joined_path_costs(clear, cells, lengths, penalty=1):
+    """
+    Cost of many paths stored end to end, exactly as Grid.get_path_cost computes each.
+
+    Every step costs max(|dx|, |dy|), plus penalty when the cell it enters is
+    not clear water. The step costs are summed cumulatively over all paths
+    at once, and each path's cost is the difference of the sums at its ends;
+    the steps from one path into the next are never read. All of that is
+    integer arithmetic for an integer penalty, so the costs are exact.
+
+    Args:
+        clear: clear_water_mask of the grid
+        cells: Integer array (total, 2) of the cells (x, y) of every path in turn
+        lengths: Number of cells in each path, adding up to total
+        penalty: Shore penalty per step
+
+    Returns:
+        numpy.ndarray: float64 costs, infinite for empty paths
+
+    Raises:
+        ValueError: If cells is not shaped (total, 2) or the lengths do not add up to total
+    """
+    clear = np.asarray(clear, dtype=bool)
+    cells = np.asarray(cells, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if cells.ndim != 2 or cells.shape[1] != 2:
+        raise ValueError(f"Cells must be shaped (total, 2), not {cells.shape}")
+    if lengths.ndim != 1 or (len(lengths) and lengths.min() < 0) or lengths.sum() != len(cells):
+        raise ValueError("Path lengths must be at least 0 and add up to the number of cells")
+
+    costs = np.empty(len(lengths))
+    ends = np.cumsum(lengths)
+    first = 0
+    while first < len(lengths):
+        # Take paths until the block holds STEP_BLOCK cells, at least one path
+        last = max(int(np.searchsorted(ends, ends[first] - lengths[first] + STEP_BLOCK, side="right")), first + 1)
+        begin = ends[first] - lengths[first]
+        costs[first:last] = _block_costs(clear, cells[begin:ends[last - 1]], lengths[first:last], penalty)
+        first = last
+    return costs
+
+
+def _block_costs(clear, cells, lengths, penalty):
+    """joined_path_costs of one block, without the checks"""
+    x, y = cells[:, 0], cells[:, 1]
+    step = np.maximum(np.abs(x[1:] - x[:-1]), np.abs(y[1:] - y[:-1]))
+    step = step + step_penalties(clear, x[1:], y[1:]) * penalty
+    totals = np.concatenate(([0], np.cumsum(step)))
+    ends = np.cumsum(lengths) - 1
+    starts = np.minimum(ends - lengths + 1, len(totals) - 1)
+    costs = (totals[np.maximum(ends, starts)] - totals[starts]).astype(np.float64)
+    costs[lengths == 0] = float('inf')
+    return costs
+
+
+def path_costs(clear, paths, lengths=None, penalty=1):
+    """
+    Cost of many padded paths at once, exactly as Grid.get_path_cost computes each.
+
+    Each block of paths is stripped of its padding and scored by
+    joined_path_costs.
+
+    Args:
+        clear: clear_water_mask of the grid
+        paths: Integer array (count, size, 2) of cells (x, y), each path
+            padded to size cells with anything
+        lengths: Number of real cells in each path, size for all by default
+        penalty: Shore penalty per step
+
+    Returns:
+        numpy.ndarray: float64 costs, infinite for empty paths
+
+    Raises:
+        ValueError: If paths is not shaped (count, size, 2) or a length does not fit
+    """
+    clear = np.asarray(clear, dtype=bool)
+    paths = np.ascontiguousarray(paths, dtype=np.int64)
+    if paths.ndim != 3 or paths.shape[2] != 2:
+        raise ValueError(f"Paths must be shaped (count, size, 2), not {paths.shape}")
+    count, size = paths.shape[:2]
+    lengths = np.full(count, size, dtype=np.int64) if lengths is None else np.asarray(lengths, dtype=np.int64)
+    if lengths.shape != (count,) or (count and (lengths.min() < 0 or lengths.max() > size)):
+        raise ValueError("Each path needs a length between 0 and the padded size")
+
+    # Each cell as one 16-byte item, which boolean indexing copies far faster than pairs of ints
+    items = paths.view(_CELL)[..., 0]
+    costs = np.empty(count)
+    block = max(1, STEP_BLOCK // max(size, 1))
+    for first in range(0, count, block):
+        real = lengths[first:first + block]
+        cells = items[first:first + block][np.arange(size) < real[:, None]].view(np.int64).reshape(-1, 2)
+        costs[first:first + block] = _block_costs(clear, cells, real, penalty)
+    return costs
+
+
+def join_paths(paths):
+    """
+    Store paths of different lengths end to end for joined_path_costs.
+
+    Args:
+        paths: Sequences of cells (x, y)
+
+    Returns:
+        tuple: (cells, lengths), an int64 array (total, 2) of every cell in
+        turn and the length of every path
+    """
+    lengths = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+    total = int(lengths.sum())
+    cells = np.fromiter(chain.from_iterable(chain.from_iterable(paths)), dtype=np.int64, count=2 * total)
+    return cells.reshape(total, 2), lengths
+
+
+def pad_paths(paths, fill=0):
+    """
+    Stack paths of different lengths into one padded array for path_costs.
+
+    Args:
+        paths: Sequences of cells (x, y)
+        fill: Value of the padding
+
+    Returns:
+        tuple: (cells, lengths), an int64 array (count, longest, 2) and the
+        length of every path
+    """
+    joined, lengths = join_paths(paths)
+    size = int(lengths.max(initial=0))
+    cells = np.full((len(paths), size, 2), fill, dtype=np.int64)
+    cells[np.arange(size) < lengths[:, None]] = joined
+    return cells, lengths
@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def random_land_field(rows, cols, land_probability, seed=None):
+    """
+    Draw the initial random landmass that the cellular automaton smooths.
+
+    Args:
+        rows: Number of rows
+        cols: Number of columns
+        land_probability: Chance of each cell starting as land
+        seed: Optional seed; the same seed always gives the same field
+
+    Returns:
+        numpy.ndarray: bool array of shape (rows, cols), True for land
+    """
+    return np.random.default_rng(seed).random((rows, cols)) < land_probability
+
+
+def hashed_land_field(seed, x0, y0, rows, cols, land_probability):
+    """
+    Draw part of an unbounded random landmass, addressed by cell coordinates.
+
+    Each cell's value comes from a hash of the seed and its own (x, y), so
+    any window can be drawn on its own and overlapping windows agree where
+    they overlap.
+
+    Args:
+        seed: Integer seed of the whole landmass
+        x0, y0: Cell at the top left corner of the window, may be negative
+        rows: Number of rows in the window
+        cols: Number of columns in the window
+        land_probability: Chance of each cell starting as land
+
+    Returns:
+        numpy.ndarray: bool array of shape (rows, cols), True for land
+    """
+    x = np.arange(x0, x0 + cols, dtype=np.int64).astype(np.uint64)
+    y = np.arange(y0, y0 + rows, dtype=np.int64).astype(np.uint64)
+    key = np.uint64(seed * 0xD1B54A32D192ED03 & 0xFFFFFFFFFFFFFFFF)
+    # splitmix64 finalizer over a mix of seed and coordinates
+    z = key ^ (y[:, np.newaxis] * np.uint64(0x9E3779B97F4A7C15)) ^ (x * np.uint64(0xC2B2AE3D27D4EB4F))
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)) * (1.0 / (1 << 53)) < land_probability
+
+
+def count_land_neighbors(land):
+    """
+    Count the land cells among the 8 neighbors of every cell.
+
+    Cells outside the map count as water. The 3x3 window is summed as a
+    vertical pass followed by a horizontal pass over a zero-padded copy.
+
+    Args:
+        land: 2D bool array, True for land
+
+    Returns:
+        numpy.ndarray: uint8 array with the same shape as land
+    """
+    land = np.asarray(land, dtype=np.uint8)
+    rows, cols = land.shape
+    padded = np.zeros((rows + 2, cols + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = land
+    vertical = padded[:-2] + padded[1:-1] + padded[2:]
+    return vertical[:, :-2] + vertical[:, 1:-1] + vertical[:, 2:] - land
+
+
+def smooth_landmass(land, passes=8, survive=4, birth=5, keep=None):
+    """
+    Smooth a landmass with the cellular automaton used by every map generator.
+
+    On each pass a land cell stays land with at least `survive` land
+    neighbors, and a water cell becomes land with at least `birth` land
+    neighbors.
+
+    Args:
+        land: 2D bool array, True for land
+        passes: Number of smoothing passes
+        survive: Land neighbors needed for land to stay land
+        birth: Land neighbors needed for water to become land
+        keep: Optional bool array shaped like land; cells outside it are
+            turned back to water after every pass, as if they were off the map
+
+    Returns:
+        numpy.ndarray: Smoothed bool array
+    """
+    land = np.asarray(land, dtype=bool)
+    for _ in range(passes):
+        neighbors = count_land_neighbors(land)
+        land = np.where(land, neighbors >= survive, neighbors >= birth)
+        if keep is not None:
+            land &= keep
+    return land
+
+
+def generate_landmass(rows, cols, land_probability, passes=8, seed=None, survive=4, birth=5):
+    """
+    Generate a smoothed random landmass.
+
+    Args:
+        rows: Number of rows
+        cols: Number of columns
+        land_probability: Chance of each cell starting as land
+        passes: Number of smoothing passes
+        seed: Optional seed for a reproducible map
+        survive: Land neighbors needed for land to stay land
+        birth: Land neighbors needed for water to become land
+
+    Returns:
+        numpy.ndarray: bool array of shape (rows, cols), True for land
+    """
+    field = random_land_field(rows, cols, land_probability, seed)
+    return smooth_landmass(field, passes, survive, birth)
@@ -1,10 +1,14 @@
 import pygame
 import random
-import math
-from collections import deque
 
-# Initialize Pygame
-pygame.init()
+from display_main.profiler import Profiler, ProfilerHUD
+from display_main.surfaces import TerrainSurface, TrailOverlay
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav import batch
+from nav.background import PlanningService
+from nav.pathfinding import any_angle_path, astar, jump_point_search, smooth_path
+from sim.simulation import Simulation
 
 # === CONSTANTS ===
 GRID_SIZE = 100
@@ -23,196 +27,90 @@ GRID_LINES = (100, 100, 100)
 
 # Navigation Settings
 SHORE_PENALTY = 15  # Reduced shore penalty for more balanced paths
-MAX_STUCK_TIME = 10
-PATHFINDING_LIMIT = 2000  # Increased limit for better path finding
 DIAGONAL_COST = 1.4  # Correct cost for diagonal movement
+# Jump across water with no shore penalty instead of expanding it cell by cell.
+# Same path costs and about half the expansions (see benchmarks/bench_jps.py),
+# but not faster in CPython with the shore penalty on. Only find_path and
+# find_paths search with it: the boats here follow the D* Lite planner, which
+# has no jump point variant (the "background" navigator can use it through
+# nav.background.plan_path).
+JUMP_POINT_SEARCH = False
+# Sail straight any-angle lines through the plans instead of 8-direction
+# staircases: the boats here, find_path and find_paths. About a sixth of the
+# waypoints for the same moves and path cost as the searched path (see
+# benchmarks/bench_any_angle.py).
+ANY_ANGLE = True
+
+# Profiling: F3 toggles the profiler and its HUD, F4 saves a Chrome trace
+PROFILE = False
+TRACE_PATH = "data/trace.json"
+PROFILER = Profiler(enabled=PROFILE, allocations=True)
 
 # Terrain Generation
 LAND_CHANCE = 0.45
 SMOOTHING_PASSES = 8
 
 
-def generate_terrain():
+def generate_terrain(seed=None):
     """Generate terrain using cellular automata"""
-    grid = [[1 if random.random() < LAND_CHANCE else 0
-             for _ in range(GRID_SIZE)]
-            for _ in range(GRID_SIZE)]
-
-    for _ in range(SMOOTHING_PASSES):
-        new_grid = [[0] * GRID_SIZE for _ in range(GRID_SIZE)]
-        for y in range(GRID_SIZE):
-            for x in range(GRID_SIZE):
-                land_neighbors = 0
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < GRID_SIZE and 0 <= ny < GRID_SIZE:
-                            land_neighbors += grid[ny][nx]
-                new_grid[y][x] = 1 if (grid[y][x] == 1 and land_neighbors >= 4) or \
-                                      (grid[y][x] == 0 and land_neighbors >= 5) else 0
-        grid = new_grid
-
-    return [[LAND if cell else WATER for cell in row] for row in grid]
-
-
-def count_land_in_radius(grid, x, y, radius=2):
-    """Count land cells within radius with improved distance weighting"""
-    land_count = 0
-    for dy in range(-radius, radius + 1):
-        for dx in range(-radius, radius + 1):
-            nx, ny = x + dx, y + dy
-            if (0 <= nx < GRID_SIZE and
-                    0 <= ny < GRID_SIZE and
-                    grid[ny][nx] == LAND):
-                # Exponential decay with distance
-                distance = math.sqrt(dx * dx + dy * dy)
-                land_count += math.exp(-distance)
-    return land_count
-
-
-def get_neighbors(pos, grid):
-    """Get valid water neighbors with proper diagonal handling"""
-    x, y = pos
-    neighbors = []
-
-    # Check all 8 directions
-    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]:
-        new_x = x + dx
-        new_y = y + dy
-
-        # Basic bounds and water check
-        if not (0 <= new_x < GRID_SIZE and 0 <= new_y < GRID_SIZE):
-            continue
-        if grid[new_y][new_x] != WATER:
-            continue
-
-        # For diagonal moves, check if we can actually get there
-        if dx != 0 and dy != 0:
-            if grid[y][new_x] == LAND or grid[new_y][x] == LAND:
-                continue
-
-        neighbors.append((new_x, new_y))
-
-    return neighbors
-
-
-def find_water_pos(grid):
-    """Find a good water position away from land"""
-    best_pos = None
-    lowest_land_count = float('inf')
+    land = generate_landmass(GRID_SIZE, GRID_SIZE, LAND_CHANCE, SMOOTHING_PASSES, seed)
+    return Grid.from_landmass(land)
+
+
+def find_water_pos(grid, component=None):
+    """Find a good water position away from land, optionally within one body of water"""
+    shore_cost = grid.shore_costs(SHORE_PENALTY)
+    candidates = grid.components.candidates(grid.components.largest() if component is None else component)
+    if len(candidates) == 0:
+        return list(grid.find_random_location())
+
+    best_index = None
+    lowest_shore_cost = float('inf')
 
     attempts = 100  # Limit search attempts
     for _ in range(attempts):
-        x = random.randint(0, GRID_SIZE - 1)
-        y = random.randint(0, GRID_SIZE - 1)
-        if grid[y][x] == WATER:
-            land_count = count_land_in_radius(grid, x, y)
-            if land_count < lowest_land_count:
-                best_pos = [x, y]
-                lowest_land_count = land_count
+        index = int(candidates[random.randrange(len(candidates))])
+        cost = shore_cost[index]
+        if cost < lowest_shore_cost:
+            best_index = index
+            lowest_shore_cost = cost
 
-    return best_pos if best_pos else [GRID_SIZE // 2, GRID_SIZE // 2]
+    return [best_index % grid.cols, best_index // grid.cols]
 
 
 def find_path(grid, start, target):
     """A* pathfinding with improved heuristic and balanced penalties"""
-
-    def manhattan_distance(pos1, pos2):
-        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-
-    def heuristic(pos):
-        # Combine manhattan distance with diagonal shortcut potential
-        dx = abs(target[0] - pos[0])
-        dy = abs(target[1] - pos[1])
-        straight = abs(dx - dy)
-        diagonal = min(dx, dy)
-        return straight + DIAGONAL_COST * diagonal
-
-    start = tuple(start)
-    target = tuple(target)
-
-    frontier = [(0, start)]
-    came_from = {start: None}
-    cost_so_far = {start: 0}
-    cells_checked = 0
-
-    while frontier and cells_checked < PATHFINDING_LIMIT:
-        current = min(frontier, key=lambda x: x[0])[1]
-        if current == target:
-            break
-
-        frontier = [f for f in frontier if f[1] != current]
-        cells_checked += 1
-
-        for next_pos in get_neighbors(current, grid):
-            # Calculate movement cost (diagonal vs straight)
-            dx = abs(next_pos[0] - current[0])
-            dy = abs(next_pos[1] - current[1])
-            move_cost = DIAGONAL_COST if (dx + dy) == 2 else 1
-
-            # Add shore penalty with distance falloff
-            shore_penalty = SHORE_PENALTY * count_land_in_radius(grid, next_pos[0], next_pos[1])
-
-            # Calculate total cost
-            new_cost = cost_so_far[current] + move_cost + shore_penalty
-
-            if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
-                cost_so_far[next_pos] = new_cost
-                priority = new_cost + heuristic(next_pos)
-                frontier.append((priority, next_pos))
-                came_from[next_pos] = current
-
-    # Reconstruct path
-    path = []
-    current = target
-    while current in came_from:
-        path.append(current)
-        current = came_from[current]
-    path.reverse()
-
-    # Smooth the path
-    if len(path) > 2:
-        smoothed_path = [path[0]]
-        for i in range(1, len(path) - 1):
-            prev = smoothed_path[-1]
-            current = path[i]
-            next_pos = path[i + 1]
-
-            # Only keep points that represent significant direction changes
-            dx1 = current[0] - prev[0]
-            dy1 = current[1] - prev[1]
-            dx2 = next_pos[0] - current[0]
-            dy2 = next_pos[1] - current[1]
-
-            if dx1 != dx2 or dy1 != dy2:
-                smoothed_path.append(current)
-
-        smoothed_path.append(path[-1])
-        path = smoothed_path
-
+    if not grid.reachable(start, target):
+        # Different bodies of water: no search can succeed
+        return []
+    stats = {}
+    with PROFILER.phase("find_path"):
+        penalty = grid.shore_costs(SHORE_PENALTY)
+        if JUMP_POINT_SEARCH:
+            uniform, runs = grid.jump_runs(SHORE_PENALTY)
+            path = jump_point_search(grid.neighbor_masks[1], uniform, runs, grid.cols, grid.rows,
+                                     tuple(start), tuple(target), penalty=penalty, diagonal_cost=DIAGONAL_COST,
+                                     stats=stats)
+        else:
+            path = astar(grid.cells, grid.cols, grid.rows, tuple(start), tuple(target),
+                         penalty=penalty, diagonal_cost=DIAGONAL_COST, stats=stats,
+                         masks=grid.neighbor_masks[1])
+        path = any_angle_path(path, grid.cells, grid.cols, penalty) if ANY_ANGLE else smooth_path(path)
+    PROFILER.count("expanded/plan", stats["expanded"])
     return path
 
 
-def get_next_move(grid, boat_pos, target_pos, visited):
-    """Get next move with pathfinding and unstuck behavior"""
-    path = find_path(grid, boat_pos, target_pos)
-
-    if len(path) > 1:
-        next_pos = path[1]
-        return [next_pos[0] - boat_pos[0], next_pos[1] - boat_pos[1]]
-
-    # If stuck, try to move to least visited water away from shore
-    neighbors = get_neighbors(boat_pos, grid)
-    if neighbors:
-        best_pos = min(neighbors, key=lambda n: (
-                sum(1 for v in visited if v == n) +
-                count_land_in_radius(grid, n[0], n[1]) * SHORE_PENALTY
-        ))
-        return [best_pos[0] - boat_pos[0], best_pos[1] - boat_pos[1]]
+def find_paths(grid, pairs, processes=None):
+    """
+    Plan many (start, target) pairs on a process pool, yielding (index, path) in order.
 
-    return None
+    Plans with the same settings as find_path (JUMP_POINT_SEARCH, ANY_ANGLE),
+    without its profiling. Whether more processes plan faster depends on
+    the machine; measure with benchmarks/bench_batch.py.
+    """
+    for index, path in batch.find_paths(grid, pairs, SHORE_PENALTY, DIAGONAL_COST, any_angle=ANY_ANGLE,
+                                        jump_points=JUMP_POINT_SEARCH, processes=processes):
+        yield index, path if ANY_ANGLE else smooth_path(path)
 
 
 def draw_boat(screen, pos, size):
@@ -227,111 +125,141 @@ def draw_boat(screen, pos, size):
     pygame.draw.circle(screen, BOAT, (center_x, center_y), radius - 2)
 
 
-def reset_simulation():
-    """Reset the simulation state"""
+def reset_simulation(planning, boat_pos=None, target_pos=None):
+    """Reset the simulation on new terrain, keeping the given positions where the target is still reachable"""
     grid = generate_terrain()
-    boat_pos = find_water_pos(grid)
-    target_pos = find_water_pos(grid)
-    while target_pos == boat_pos:
-        target_pos = find_water_pos(grid)
-    return grid, boat_pos, target_pos, set()
-
-
-# === SETUP ===
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Double Minus Demo")
-clock = pygame.time.Clock()
-font = pygame.font.Font(None, 36)
-
-# Initialize simulation
-grid, boat_pos, target_pos, path = reset_simulation()
-moving = True
-running = True
-
-# === MAIN LOOP ===
-while running:
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                moving = not moving
-            elif event.key == pygame.K_r:
-                grid, boat_pos, target_pos, path = reset_simulation()
-                moving = True
-            elif event.key == pygame.K_g:  # Added key for new grid only
-                grid = generate_terrain()
-                path.clear()
-                moving = True
-
-    # Draw background
-    screen.fill((50, 50, 50))
-
-    # Draw terrain and visited paths
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            rect = pygame.Rect(
-                x * CELL_SIZE,
-                y * CELL_SIZE,
-                CELL_SIZE,
-                CELL_SIZE
+    components = grid.components
+    if boat_pos is None or not grid.is_navigable(*boat_pos) or components.sizes[components.component(*boat_pos)] < 2:
+        # A one-cell pond leaves nowhere to go
+        boat_pos = find_water_pos(grid)
+    component = components.component(*boat_pos)
+    if target_pos is None or not grid.reachable(boat_pos, target_pos):
+        target_pos = find_water_pos(grid, component)
+    while tuple(target_pos) == tuple(boat_pos):
+        target_pos = find_water_pos(grid, component)
+
+    # The D* Lite planner makes its full plans on the planning thread while
+    # frames keep coming; repairs and the stuck recovery stay on this one.
+    # Both are timed on the profiler as find_path and repair phases.
+    simulation = Simulation(grid, navigator="planner", shore_penalty=SHORE_PENALTY, planning=planning,
+                            any_angle=ANY_ANGLE, profiler=PROFILER)
+    simulation.add_boat(tuple(boat_pos), tuple(target_pos))
+    return simulation
+
+
+def main():
+    pygame.init()
+
+    # === SETUP ===
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Double Minus Demo")
+    clock = pygame.time.Clock()
+    font = pygame.font.Font(None, 36)
+
+    # Initialize simulation
+    planning = PlanningService()
+    simulation = reset_simulation(planning)
+    terrain = TerrainSurface(WATER, LAND, GRID_LINES, line_offsets=(0, CELL_SIZE - 1))
+    trail = TrailOverlay((WIDTH, HEIGHT), CELL_SIZE, VISITED)
+    profiler = PROFILER
+    hud = ProfilerHUD(profiler)
+    dirty_rects = []  # Screen areas drawn over in the previous frame
+    moving = True
+    running = True
+
+    # === MAIN LOOP ===
+    while running:
+        navigator = simulation.navigators[0]
+
+        # Event handling
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        moving = not moving
+                    elif event.key == pygame.K_r:
+                        simulation.cancel()
+                        simulation = reset_simulation(planning)
+                        moving = True
+                    elif event.key == pygame.K_g:  # Added key for new grid only
+                        simulation.cancel()
+                        simulation = reset_simulation(planning, (navigator.boat.x, navigator.boat.y),
+                                                      navigator.target)
+                        moving = True
+                    elif event.key == pygame.K_F3:
+                        profiler.enabled = not profiler.enabled
+                    elif event.key == pygame.K_F4:
+                        profiler.export_chrome_trace(TRACE_PATH)
+                        print(f"Trace of {profiler.frames} frames saved to {TRACE_PATH}")
+
+        navigator = simulation.navigators[0]
+        grid = simulation.grid
+        boat_pos = (navigator.boat.x, navigator.boat.y)
+        target_pos = navigator.target
+
+        # Draw terrain and grid lines, rendered again only when the grid changed
+        with profiler.phase("draw_grid"):
+            full_redraw = terrain.stale(grid, CELL_SIZE)
+            if full_redraw:
+                screen.fill((50, 50, 50))
+            screen.blit(terrain.render(grid, CELL_SIZE), (0, 0))
+
+        # Draw visited path, painting only the cells entered since the last frame
+        with profiler.phase("trail"):
+            trail.follow(simulation.trajectories[0])
+            trail.draw(screen)
+
+        with profiler.phase("markers"):
+            # Draw target
+            target_center = (
+                target_pos[0] * CELL_SIZE + CELL_SIZE // 2,
+                target_pos[1] * CELL_SIZE + CELL_SIZE // 2
             )
-            # Draw terrain
-            pygame.draw.rect(screen, grid[y][x], rect)
-
-            # Draw visited path
-            if (x, y) in path:
-                s = pygame.Surface((CELL_SIZE, CELL_SIZE))
-                s.fill(VISITED)
-                s.set_alpha(128)
-                screen.blit(s, rect)
-
-            # Draw grid lines
-            pygame.draw.rect(screen, GRID_LINES, rect, 1)
-
-    # Draw target
-    target_center = (
-        target_pos[0] * CELL_SIZE + CELL_SIZE // 2,
-        target_pos[1] * CELL_SIZE + CELL_SIZE // 2
-    )
-    target_radius = int(CELL_SIZE * 0.6) // 2
-    pygame.draw.circle(screen, TARGET, target_center, target_radius)
-
-    # Draw boat
-    draw_boat(screen, boat_pos, CELL_SIZE)
-
-    # Update boat position
-    if moving and boat_pos != target_pos:
-        move = get_next_move(grid, boat_pos, target_pos, path)
-        if move:
-            boat_pos[0] += move[0]
-            boat_pos[1] += move[1]
-            path.add((boat_pos[0], boat_pos[1]))
-
-            # Check if stuck
-            if len(path) > MAX_STUCK_TIME:
-                recent_positions = list(path)[-MAX_STUCK_TIME:]
-                position_counts = {}
-                for pos in recent_positions:
-                    position_counts[pos] = position_counts.get(pos, 0) + 1
-                    if position_counts[pos] > 3:  # If visited same spot 3 times
-                        # Clear recent history and try new path
-                        path = set(list(path)[:-MAX_STUCK_TIME])
-
-    # Draw UI text
-    if boat_pos == target_pos:
-        status = "TARGET REACHED!"
-    else:
-        status = "NAVIGATING" if moving else "PAUSED"
-    text = font.render(status, True, (255, 255, 255))
-    screen.blit(text, (10, 10))
-
-    instructions = font.render("SPACE: Pause/Resume   R: Reset   G: New Grid", True, (255, 255, 255))
-    screen.blit(instructions, (10, HEIGHT - 30))
-
-    # Update display
-    pygame.display.flip()
-    clock.tick(10)  # Slightly higher framerate
-
-pygame.quit()
\ No newline at end of file
+            target_radius = int(CELL_SIZE * 0.6) // 2
+            pygame.draw.circle(screen, TARGET, target_center, target_radius)
+
+            # Draw boat
+            draw_boat(screen, boat_pos, CELL_SIZE)
+
+        # Update boat position
+        with profiler.phase("navigate"):
+            if moving and not simulation.done:
+                simulation.step()
+
+        # Draw UI text
+        with profiler.phase("text"):
+            if simulation.done:
+                status = "TARGET REACHED!"
+            else:
+                status = ("PLANNING" if navigator.waiting else "NAVIGATING") if moving else "PAUSED"
+            text = font.render(status, True, (255, 255, 255))
+            status_rect = screen.blit(text, (10, 10))
+
+            instructions = font.render("SPACE: Pause/Resume   R: Reset   G: New Grid", True, (255, 255, 255))
+            screen.blit(instructions, (10, HEIGHT - 30))
+
+        # Update display: everything after a new grid, otherwise only what moved
+        frame_rects = [
+            pygame.Rect(boat_pos[0] * CELL_SIZE, boat_pos[1] * CELL_SIZE, CELL_SIZE, CELL_SIZE),
+            pygame.Rect(target_pos[0] * CELL_SIZE, target_pos[1] * CELL_SIZE, CELL_SIZE, CELL_SIZE),
+            status_rect,
+        ]
+        if profiler.enabled:
+            frame_rects.append(hud.draw(screen))
+        with profiler.phase("display"):
+            if full_redraw:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty_rects + frame_rects)
+        dirty_rects = frame_rects
+        profiler.frame()
+        clock.tick(10)  # Slightly higher framerate
+
+    planning.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from nav.pathfinding import DIAGONAL_COST, any_angle_path, astar, jump_point_search
+
+# plan(grid, start, target, cancel) -> cells or waypoints from start to target
+Planner = Callable[..., List[Tuple[int, int]]]
+
+
+def plan_path(grid, start: Tuple[int, int], target: Tuple[int, int],
+              cancel: Optional[threading.Event] = None,
+              shore_penalty: Optional[float] = None,
+              diagonal_cost: float = DIAGONAL_COST,
+              stats: Optional[Dict[str, int]] = None,
+              any_angle: bool = False,
+              jump_points: bool = False) -> List[Tuple[int, int]]:
+    """
+    Default planner of a PlanningService: astar over the grid's move masks and shore penalty.
+
+    Args:
+        grid: Grid to plan on
+        start: Starting cell (x, y)
+        target: Target cell (x, y)
+        cancel: Optional event that makes the search give up once set
+        shore_penalty: Multiplier passed to grid.shore_costs
+        diagonal_cost: Cost of one diagonal step
+        stats: Optional dict that receives the number of "expanded" cells
+        any_angle: Return any_angle_path waypoints instead of every cell
+        jump_points: Search with jump_point_search instead of astar
+
+    Returns:
+        List[Tuple[int, int]]: Cells (or waypoints) from start to target, empty
+        if it cannot be reached
+    """
+    if not grid.reachable(start, target):
+        return []
+    penalty = grid.shore_costs(shore_penalty)
+    if jump_points:
+        uniform, runs = grid.jump_runs(shore_penalty)
+        path = jump_point_search(grid.neighbor_masks[1], uniform, runs, grid.cols, grid.rows,
+                                 tuple(start), tuple(target), penalty=penalty, diagonal_cost=diagonal_cost,
+                                 stats=stats, cancel=cancel)
+    else:
+        path = astar(grid.cells, grid.cols, grid.rows, tuple(start), tuple(target),
+                     penalty=penalty, diagonal_cost=diagonal_cost,
+                     stats=stats, masks=grid.neighbor_masks[1], cancel=cancel)
+    if any_angle:
+        path = any_angle_path(path, grid.cells, grid.cols, penalty)
+    return path
+
+
+class PlanningService:
+    """
+    Plans paths on a background thread so that the caller never waits for a search.
+
+    submit() returns a concurrent.futures.Future straight away; a render loop
+    checks future.done() each frame and picks up the path once it is there.
+    Requests carry a key, and a new request cancels the one before it with
+    the same key. Cancelling a request that is already running sets its
+    cancel event, which the search looks at every few thousand cells, so a
+    stale search stops early instead of holding up the next one. The future
+    of a cancelled request raises CancelledError from result().
+
+    Searches are pure Python and share the interpreter with the caller, so
+    they slow the frame down a little but never stop it. A request is
+    forgotten as soon as it finishes, so the service holds nothing for keys
+    that are no longer used.
+
+    Attributes:
+        plan (Planner): Called as plan(grid, start, target, cancel) on the worker thread
+        submitted (int): Requests submitted so far
+        cancelled (int): Requests cancelled so far
+    """
+
+    def __init__(self, plan: Optional[Planner] = None):
+        """
+        Initialize the service; the worker thread starts with the first request.
+
+        Args:
+            plan: Planner to run, plan_path by default
+        """
+        self.plan = plan if plan is not None else plan_path
+        self.submitted = 0
+        self.cancelled = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+        self._pending: Dict[Hashable, Tuple[Future, threading.Event]] = {}
+        # Guards _pending, which finished requests remove themselves from on the worker thread
+        self._lock = threading.Lock()
+
+    def submit(self, grid, start: Tuple[int, int], target: Tuple[int, int], key: Hashable = None,
+               plan: Optional[Planner] = None) -> Future:
+        """
+        Ask for a path from start to target, replacing the pending request with the same key.
+
+        The grid must not be changed until the request is done.
+
+        Args:
+            grid: Grid to plan on
+            start: Starting cell (x, y)
+            target: Target cell (x, y)
+            key: Requests with the same key replace each other
+            plan: Planner to run for this request instead of self.plan
+
+        Returns:
+            Future: Resolves to what the planner returns
+        """
+        self.cancel(key)
+        cancel = threading.Event()
+        future = self._executor.submit(self._run, plan or self.plan, grid, tuple(start), tuple(target), cancel)
+        with self._lock:
+            self._pending[key] = (future, cancel)
+        future.add_done_callback(lambda done: self._forget(key, done))
+        self.submitted += 1
+        return future
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        """Drop a finished request, unless a newer one has taken its key"""
+        with self._lock:
+            if self._pending.get(key, (None,))[0] is future:
+                del self._pending[key]
+
+    @staticmethod
+    def _run(plan, grid, start, target, cancel):
+        if cancel.is_set():
+            raise CancelledError()
+        path = plan(grid, start, target, cancel)
+        if cancel.is_set():
+            # Whatever the search got to is of no use to anyone
+            raise CancelledError()
+        return path
+
+    def cancel(self, key: Hashable = None) -> bool:
+        """
+        Cancel the pending request with the given key, if there is one.
+
+        Returns:
+            bool: True if a request that had not finished was cancelled
+        """
+        with self._lock:
+            future, cancel = self._pending.pop(key, (None, None))
+        if future is None or future.done():
+            return False
+        cancel.set()
+        future.cancel()
+        self.cancelled += 1
+        return True
+
+    def cancel_all(self) -> int:
+        """Cancel every pending request, returning how many had not finished"""
+        with self._lock:
+            keys = list(self._pending)
+        return sum(self.cancel(key) for key in keys)
+
+    @property
+    def busy(self) -> bool:
+        """True while any request is waiting or running"""
+        with self._lock:
+            return any(not future.done() for future, _ in self._pending.values())
+
+    def close(self) -> None:
+        """Cancel everything and let the worker thread finish"""
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,174 @@
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from nav.pathfinding import DIAGONAL_COST, any_angle_path, astar, jump_point_search
+
+# Set in each worker by _attach: the grid as seen through shared memory
+_worker = None
+
+
+class SharedGrid:
+    """
+    Navigability, move masks and shore penalty of a grid in shared memory blocks,
+    and optionally the jump point search tables.
+
+    Worker processes attach to the blocks by name instead of receiving a
+    pickled copy of the grid, so starting a pool costs the same for any map
+    size. The creating process owns the blocks and must close() them.
+
+    Attributes:
+        width (int): Number of grid columns
+        height (int): Number of rows
+        names (tuple): Names of the cells, masks and penalty blocks, for the workers,
+            followed by the uniform and run table blocks when jump tables are shared
+    """
+
+    def __init__(self, grid, shore_penalty: Optional[float] = None, jump_tables: bool = False):
+        """
+        Copy a grid into new shared memory blocks.
+
+        Args:
+            grid: Grid to share
+            shore_penalty: Multiplier passed to grid.shore_costs
+            jump_tables: Also share grid.jump_runs for jump_point_search
+        """
+        self.width = grid.cols
+        self.height = grid.rows
+        penalty = np.asarray(grid.shore_costs(shore_penalty), dtype=np.float64)
+        tables = [bytes(grid.cells), bytes(grid.neighbor_masks[1]), penalty.tobytes()]
+        if jump_tables:
+            uniform, runs = grid.jump_runs(shore_penalty)
+            tables += [bytes(uniform)] + [run.tobytes() for run in runs]
+        self._blocks = []
+        for data in tables:
+            block = SharedMemory(create=True, size=max(len(data), 1))
+            block.buf[:len(data)] = data
+            self._blocks.append(block)
+        self.names = tuple(block.name for block in self._blocks)
+
+    def close(self) -> None:
+        """Release and remove the blocks"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_block(name: str) -> SharedMemory:
+    """Attach to a block owned by another process without adopting it"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the block, but pool
+        # workers share the creator's resource tracker, where it already is
+        return SharedMemory(name=name)
+
+
+def _attach(names: Tuple[str, ...], width: int, height: int, diagonal_cost: float, any_angle: bool) -> None:
+    """Pool initializer: map the shared grid into this worker"""
+    global _worker
+    blocks = [_open_block(name) for name in names]
+    size = width * height
+    cells = blocks[0].buf[:size]
+    masks = blocks[1].buf[:size]
+    penalty = blocks[2].buf[:size * 8].cast("d")
+    jump_tables = None
+    if len(blocks) > 3:
+        jump_tables = (blocks[3].buf[:size], tuple(block.buf[:size * 4].cast("i") for block in blocks[4:]))
+    _worker = (blocks, cells, masks, penalty, jump_tables, width, height, diagonal_cost, any_angle)
+
+
+def _plan(job: Tuple[int, Tuple[int, int], Tuple[int, int]]) -> Tuple[int, List[Tuple[int, int]]]:
+    """Plan one query in a worker"""
+    index, start, target = job
+    _, cells, masks, penalty, jump_tables, width, height, diagonal_cost, any_angle = _worker
+    if jump_tables is not None:
+        uniform, runs = jump_tables
+        path = jump_point_search(masks, uniform, runs, width, height, start, target, penalty=penalty,
+                                 diagonal_cost=diagonal_cost)
+    else:
+        path = astar(cells, width, height, start, target, penalty=penalty,
+                     diagonal_cost=diagonal_cost, masks=masks)
+    if any_angle:
+        path = any_angle_path(path, cells, width, penalty)
+    return index, path
+
+
+def find_paths(grid,
+               pairs: Sequence[Tuple[Tuple[int, int], Tuple[int, int]]],
+               shore_penalty: Optional[float] = None,
+               diagonal_cost: float = DIAGONAL_COST,
+               any_angle: bool = False,
+               jump_points: bool = False,
+               processes: Optional[int] = None,
+               ordered: bool = True,
+               chunksize: Optional[int] = None) -> Iterator[Tuple[int, List[Tuple[int, int]]]]:
+    """
+    Plan many start/target pairs on a process pool.
+
+    The grid is shared with the workers through SharedGrid, so each worker
+    attaches once and queries only carry coordinates. Pairs in different
+    bodies of water are answered right away without reaching the pool.
+    Results stream back while the rest are still being planned; the pool and
+    the shared blocks are released once the iterator is exhausted or closed.
+
+    Throughput should grow with the number of cores, but that is not
+    measured here: benchmarks/bench_batch.py reports the speedup on a given
+    machine, and on a single core a pool is only overhead.
+
+    Args:
+        grid: Grid to plan on; it must not change while the iterator is in use
+        pairs: (start, target) cells
+        shore_penalty: Multiplier passed to grid.shore_costs
+        diagonal_cost: Cost of one diagonal step
+        any_angle: Return any_angle_path waypoints instead of every cell
+        jump_points: Search with jump_point_search instead of astar
+        processes: Number of workers, all cores by default
+        ordered: Yield results in the order of pairs rather than as they finish
+        chunksize: Queries handed to a worker at a time; by default about four
+            chunks per worker
+
+    Yields:
+        Tuple[int, list]: Index into pairs and its path as astar (or
+        jump_point_search) returns it, empty when the target cannot be reached
+    """
+    jobs = []
+    for index, (start, target) in enumerate(pairs):
+        if grid.reachable(start, target):
+            jobs.append((index, tuple(start), tuple(target)))
+        elif not ordered:
+            yield index, []
+    if not jobs:
+        if ordered:
+            yield from ((index, []) for index in range(len(pairs)))
+        return
+
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    if chunksize is None:
+        chunksize = max(1, len(jobs) // (processes * 4))
+    with SharedGrid(grid, shore_penalty, jump_tables=jump_points) as shared:
+        with Pool(processes, _attach, (shared.names, shared.width, shared.height, diagonal_cost, any_angle)) as pool:
+            if not ordered:
+                yield from pool.imap_unordered(_plan, jobs, chunksize)
+                return
+            # Fill in the unreachable pairs between the planned ones
+            expected = 0
+            for index, path in pool.imap(_plan, jobs, chunksize):
+                while expected < index:
+                    yield expected, []
+                    expected += 1
+                yield index, path
+                expected += 1
+            while expected < len(pairs):
+                yield expected, []
+                expected += 1
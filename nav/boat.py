@@ -1,6 +1,12 @@
 import constants
 from typing import Set, Tuple, Optional
 
+from grid.neighbor_mask import decode_table
+
+# Move sets per neighbor mask, built in the order moves have always been collected
+AVAILABLE_MOVES = tuple(frozenset(moves) for moves in decode_table(
+    ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))))
+
 
 class Boat:
     """
@@ -36,9 +42,9 @@ class Boat:
         Raises:
             ValueError: If the position is invalid or not navigable
         """
-        if not (0 <= self.x < constants.ROWS and 0 <= self.y < constants.COLS):
+        if not self.grid.in_bounds(self.x, self.y):
             raise ValueError(f"Position ({self.x}, {self.y}) is outside grid bounds")
-        if not self.grid[self.x, self.y].get("navigable"):
+        if not self.grid.cells[self.y * self.grid.cols + self.x]:
             raise ValueError(f"Position ({self.x}, {self.y}) is not navigable")
 
     def update_xy(self) -> None:
@@ -51,23 +57,10 @@ class Boat:
         Get all available moves from the current position.
 
         Returns:
-            Set[Tuple[int, int]]: Set of valid movement vectors (dx, dy)
+            Set[Tuple[int, int]]: Shared, read-only set of valid movement vectors (dx, dy)
         """
-        available_moves = set()
-
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-
-                nx, ny = self.x + dx, self.y + dy
-
-                if (0 <= nx < constants.ROWS and
-                        0 <= ny < constants.COLS and
-                        self.grid[nx, ny].get("navigable")):
-                    available_moves.add((dx, dy))
-
-        return available_moves
+        grid = self.grid
+        return AVAILABLE_MOVES[grid.neighbor_masks[0][self.y * grid.cols + self.x]]
 
     def get_neighbors(self) -> int:
         """
@@ -91,9 +84,8 @@ class Boat:
         """
         nx, ny = self.x + dx, self.y + dy
 
-        if (0 <= nx < constants.ROWS and
-                0 <= ny < constants.COLS and
-                self.grid[nx, ny].get("navigable")):
+        if (self.grid.in_bounds(nx, ny) and
+                self.grid.cells[ny * self.grid.cols + nx]):
             self.x, self.y = nx, ny
             return True
 
@@ -0,0 +1,166 @@
+import heapq
+from array import array
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from nav.pathfinding import DIAGONAL_COST, DIRECTIONS
+
+# Direction code stored for cells that cannot reach the target (and for the target itself)
+NO_DIRECTION = 255
+
+
+class FlowField:
+    """
+    Cost-to-target and next move for every cell, built by one reverse Dijkstra.
+
+    The search starts at the target and walks moves backwards, so each cell
+    ends up with the cost of its cheapest route to the target and the
+    direction of the first step on that route. Movement rules and costs
+    match nav.pathfinding.astar.
+
+    Attributes:
+        width (int): Number of columns
+        height (int): Number of rows
+        target (tuple): Target cell (x, y)
+        distance (array): Flat cost-to-target per cell, inf where unreachable
+        directions (bytearray): Flat index into DIRECTIONS per cell, or NO_DIRECTION
+    """
+
+    def __init__(self,
+                 passable: Sequence[int],
+                 width: int,
+                 height: int,
+                 target: Tuple[int, int],
+                 penalty: Optional[Sequence[float]] = None,
+                 diagonal_cost: float = DIAGONAL_COST):
+        """
+        Build the field for one target.
+
+        Args:
+            passable: width * height values, truthy where a boat can sail
+            width: Number of columns
+            height: Number of rows
+            target: Target cell (x, y)
+            penalty: Optional width * height extra costs for entering each cell
+            diagonal_cost: Cost of one diagonal step
+        """
+        self.width = width
+        self.height = height
+        self.target = tuple(target)
+        size = width * height
+        inf = float('inf')
+        distance = array('d', [inf]) * size
+        directions = bytearray([NO_DIRECTION]) * size
+        self.distance = distance
+        self.directions = directions
+
+        goal = self.target[1] * width + self.target[0]
+        if not passable[goal]:
+            return
+
+        # For a move in direction code, the neighbor that would make it is at cell - step
+        moves = [(code, -dx, -dy, -(dy * width + dx), diagonal_cost if dx and dy else 1)
+                 for code, (dx, dy) in enumerate(DIRECTIONS)]
+        done = bytearray(size)
+        distance[goal] = 0
+        frontier = [(0, goal)]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        while frontier:
+            cost, cell = heappop(frontier)
+            if done[cell]:
+                continue
+            done[cell] = 1
+            enter_cost = cost + penalty[cell] if penalty is not None else cost
+            cy, cx = divmod(cell, width)
+            for code, dx, dy, step, move_cost in moves:
+                nx = cx + dx
+                ny = cy + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                source = cell + step
+                if done[source] or not passable[source]:
+                    continue
+                if dx and dy and not (passable[cell + dx] and passable[cell + dy * width]):
+                    continue
+                new_cost = enter_cost + move_cost
+                if new_cost < distance[source]:
+                    distance[source] = new_cost
+                    directions[source] = code
+                    heappush(frontier, (new_cost, source))
+
+    def next_move(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """
+        Get the first step of the cheapest route from (x, y) to the target.
+
+        Args:
+            x: Column of the boat
+            y: Row of the boat
+
+        Returns:
+            Optional[Tuple[int, int]]: Movement vector (dx, dy), or None at the
+            target or where the target cannot be reached
+        """
+        code = self.directions[y * self.width + x]
+        return DIRECTIONS[code] if code != NO_DIRECTION else None
+
+    def cost(self, x: int, y: int) -> float:
+        """Cost of the cheapest route from (x, y) to the target, inf if unreachable"""
+        return self.distance[y * self.width + x]
+
+
+class FlowFieldCache:
+    """
+    Least-recently-used cache of flow fields keyed by grid, grid version and target.
+
+    Entries for an older version of a grid are never hit again and age out
+    like any other entry.
+
+    Attributes:
+        capacity (int): Maximum number of fields kept
+        hits (int): Lookups answered from the cache
+        misses (int): Lookups that built a new field
+    """
+
+    def __init__(self, capacity: int = 8):
+        """
+        Initialize an empty cache.
+
+        Args:
+            capacity: Maximum number of fields kept
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._fields = OrderedDict()
+
+    def get(self, grid, target: Tuple[int, int]) -> FlowField:
+        """
+        Get the flow field towards target on grid, building it if needed.
+
+        Args:
+            grid: Grid the boats sail on
+            target: Target cell (x, y)
+
+        Returns:
+            FlowField: Field using the grid's shore penalty costs
+        """
+        key = (id(grid), grid.version, tuple(target))
+        entry = self._fields.get(key)
+        if entry is not None:
+            self._fields.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        field = FlowField(grid.cells, grid.cols, grid.rows, target, grid.shore_costs())
+        # Keep the grid referenced so its id cannot be reused while the entry lives
+        self._fields[key] = (grid, field)
+        while len(self._fields) > self.capacity:
+            self._fields.popitem(last=False)
+        return field
+
+    def clear(self) -> None:
+        """Drop every cached field"""
+        self._fields.clear()
@@ -0,0 +1,399 @@
+import heapq
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from nav.pathfinding import DIAGONAL_COST, DIRECTIONS, octile_distance
+
+# Open stretches of border get one transition per this many cells
+ENTRANCE_SPACING = 8
+
+
+class HierarchicalPlanner:
+    """
+    Hierarchical path planning (HPA*) over a Grid.
+
+    The map is split into square clusters. Wherever water crosses the border
+    between two neighboring clusters, transition cells are placed on both
+    sides and joined by an inter-cluster edge. Edges between the entrances of
+    one cluster are costed with a search confined to that cluster, computed
+    the first time the abstract search reaches an entrance and cached, or all
+    at once by precompute. A query
+    searches this small abstract graph and then refines each abstract edge into
+    cells. Refinement is lazy when refine is iterated directly.
+
+    Transitions sit where the shore penalty along the border is lowest, one
+    per ENTRANCE_SPACING cells of open border, since crossing next to land is
+    what makes a forced crossing expensive.
+
+    Costs follow nav.pathfinding.astar: 1 per straight step, diagonal_cost per
+    diagonal step, plus the shore penalty of the cell entered. Paths are not
+    always optimal, because routes are forced through the chosen transitions.
+    benchmarks.bench_hpa reports the gap against flat A*.
+
+    Attributes:
+        grid: The grid being planned over
+        cluster_size (int): Width and height of a cluster in cells
+        penalty (list): Flat shore penalty per cell
+        build_time (float): Seconds spent finding the transitions
+        stats (dict): Counters of the last query: "abstract_expanded" nodes,
+            "local_searches" run and the abstract "cost"
+    """
+
+    def __init__(self, grid, cluster_size: int = 32, shore_penalty: Optional[float] = None,
+                 diagonal_cost: float = DIAGONAL_COST):
+        """
+        Split the grid into clusters and find the transitions between them.
+
+        Args:
+            grid: Grid to plan over
+            cluster_size: Width and height of a cluster in cells
+            shore_penalty: Shore penalty multiplier, defaults to constants.SHORE_PENALTY
+            diagonal_cost: Cost of one diagonal step
+        """
+        began = time.perf_counter()
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.shore_penalty = shore_penalty
+        self.diagonal_cost = diagonal_cost
+        self.cluster_cols = -(-grid.cols // cluster_size)
+        self.cluster_rows = -(-grid.rows // cluster_size)
+        self.penalty = grid.shore_costs(shore_penalty)
+        width = grid.cols
+        self._moves = [(bit, dx, dy, dy * width + dx, diagonal_cost if dx and dy else 1)
+                       for bit, (dx, dy) in enumerate(DIRECTIONS)]
+
+        self._transitions: Dict[Tuple[int, str], List[Tuple[int, int]]] = {}
+        self._entrances: Dict[int, List[int]] = {}
+        self._inter: Dict[int, Dict[int, float]] = {}
+        self._intra: Dict[int, Dict[int, float]] = {}
+        self.stats = {"abstract_expanded": 0, "local_searches": 0, "cost": float('inf')}
+
+        for cluster in range(self.cluster_cols * self.cluster_rows):
+            self._scan_border(cluster, "E")
+            self._scan_border(cluster, "S")
+        for cluster in range(self.cluster_cols * self.cluster_rows):
+            self._collect_entrances(cluster)
+        self.build_time = time.perf_counter() - began
+
+    # === Abstract graph ===
+
+    def cluster_of(self, cell: int) -> int:
+        """Cluster number of a flat cell index"""
+        y, x = divmod(cell, self.grid.cols)
+        return (y // self.cluster_size) * self.cluster_cols + x // self.cluster_size
+
+    def _bounds(self, cluster: int) -> Tuple[int, int, int, int]:
+        """Cell bounds x0, y0, x1, y1 (exclusive) of a cluster"""
+        cy, cx = divmod(cluster, self.cluster_cols)
+        size = self.cluster_size
+        return (cx * size, cy * size,
+                min((cx + 1) * size, self.grid.cols), min((cy + 1) * size, self.grid.rows))
+
+    def _scan_border(self, cluster: int, side: str) -> None:
+        """Place the transitions on the east ("E") or south ("S") border of a cluster"""
+        key = (cluster, side)
+        for a, b in self._transitions.pop(key, ()):
+            self._inter.get(a, {}).pop(b, None)
+            self._inter.get(b, {}).pop(a, None)
+
+        cy, cx = divmod(cluster, self.cluster_cols)
+        if (side == "E" and cx + 1 >= self.cluster_cols) or (side == "S" and cy + 1 >= self.cluster_rows):
+            return
+        x0, y0, x1, y1 = self._bounds(cluster)
+        width = self.grid.cols
+        cells = self.grid.cells
+        if side == "E":
+            pairs = [((y * width + x1 - 1), (y * width + x1)) for y in range(y0, y1)]
+        else:
+            pairs = [((y1 - 1) * width + x, y1 * width + x) for x in range(x0, x1)]
+
+        penalty = self.penalty
+        transitions = []
+        segment = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and cells[a] and cells[b]:
+                segment.append((a, b))
+                continue
+            # Split the stretch of open border evenly and cross each piece where
+            # the shore penalty is lowest, usually well away from land
+            pieces = -(-len(segment) // ENTRANCE_SPACING)
+            for i in range(pieces):
+                piece = segment[i * len(segment) // pieces:(i + 1) * len(segment) // pieces]
+                transitions.append(min(piece, key=lambda pair: penalty[pair[0]] + penalty[pair[1]]))
+            segment = []
+
+        for a, b in transitions:
+            self._inter.setdefault(a, {})[b] = 1 + penalty[b]
+            self._inter.setdefault(b, {})[a] = 1 + penalty[a]
+        self._transitions[key] = transitions
+
+    def _collect_entrances(self, cluster: int) -> None:
+        """Gather the transition cells inside a cluster and forget its cached edges"""
+        for cell in self._entrances.get(cluster, ()):
+            self._intra.pop(cell, None)
+        cy, cx = divmod(cluster, self.cluster_cols)
+        # Own east and south borders hold the first cell of each pair, the
+        # west and north neighbors' borders the second
+        borders = [((cluster, "E"), 0), ((cluster, "S"), 0)]
+        if cx > 0:
+            borders.append(((cluster - 1, "E"), 1))
+        if cy > 0:
+            borders.append(((cluster - self.cluster_cols, "S"), 1))
+        entrances = set()
+        for key, side in borders:
+            for pair in self._transitions.get(key, ()):
+                entrances.add(pair[side])
+        self._entrances[cluster] = sorted(entrances)
+        for cell in entrances:
+            self._intra.pop(cell, None)
+
+    def _intra_edges(self, cell: int) -> Dict[int, float]:
+        """Costs from an entrance to the other entrances of its cluster, cached"""
+        edges = self._intra.get(cell)
+        if edges is None:
+            cluster = self.cluster_of(cell)
+            entrances = self._entrances[cluster]
+            cost, _ = self._local_search(cell, cluster, targets=entrances)
+            edges = {other: cost[other] for other in entrances if other != cell and other in cost}
+            self._intra[cell] = edges
+        return edges
+
+    def precompute(self) -> float:
+        """
+        Cost every intra-cluster edge up front instead of on first use.
+
+        Returns:
+            float: Seconds spent
+        """
+        began = time.perf_counter()
+        for entrances in self._entrances.values():
+            for cell in entrances:
+                self._intra_edges(cell)
+        return time.perf_counter() - began
+
+    def update_cells(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """
+        Rebuild the clusters around cells whose navigability changed.
+
+        Call after changing the grid. A changed cell alters shore penalties
+        within 2 cells and the moves into those cells, so every cluster within
+        3 cells has its borders rescanned and its cached edges dropped.
+
+        Args:
+            cells: Changed cells (x, y)
+        """
+        self.penalty = self.grid.shore_costs(self.shore_penalty)
+        size = self.cluster_size
+        reach = 3
+        affected = set()
+        for x, y in cells:
+            for cy in range(max(y - reach, 0) // size, min(y + reach, self.grid.rows - 1) // size + 1):
+                for cx in range(max(x - reach, 0) // size, min(x + reach, self.grid.cols - 1) // size + 1):
+                    affected.add(cy * self.cluster_cols + cx)
+
+        touched = set()
+        for cluster in affected:
+            cy, cx = divmod(cluster, self.cluster_cols)
+            self._scan_border(cluster, "E")
+            self._scan_border(cluster, "S")
+            touched.add(cluster)
+            if cx > 0:
+                self._scan_border(cluster - 1, "E")
+                touched.add(cluster - 1)
+            if cy > 0:
+                self._scan_border(cluster - self.cluster_cols, "S")
+                touched.add(cluster - self.cluster_cols)
+            if cx + 1 < self.cluster_cols:
+                touched.add(cluster + 1)
+            if cy + 1 < self.cluster_rows:
+                touched.add(cluster + self.cluster_cols)
+        for cluster in touched:
+            self._collect_entrances(cluster)
+
+    # === Searches ===
+
+    def _local_search(self, source: int, cluster: int, reverse: bool = False,
+                      targets: Optional[Iterable[int]] = None) -> Tuple[Dict[int, float], Dict[int, Optional[int]]]:
+        """
+        Dijkstra confined to one cluster.
+
+        Args:
+            source: Flat cell to search from
+            cluster: Cluster the search may not leave
+            reverse: Follow moves backwards, giving costs to reach source instead of from it
+            targets: Optional cells; the search stops once all of them are settled
+
+        Returns:
+            tuple: (cost, came_from) dicts keyed by flat cell index
+        """
+        self.stats["local_searches"] += 1
+        x0, y0, x1, y1 = self._bounds(cluster)
+        width = self.grid.cols
+        masks = self.grid.neighbor_masks[1]
+        penalty = self.penalty
+        moves = self._moves
+        cost = {source: 0}
+        came_from = {source: None}
+        done = set()
+        frontier = [(0, source)]
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        remaining = set(targets) if targets is not None else None
+
+        while frontier:
+            current_cost, cell = heappop(frontier)
+            if cell in done:
+                continue
+            done.add(cell)
+            if remaining is not None:
+                remaining.discard(cell)
+                if not remaining:
+                    break
+            cy, cx = divmod(cell, width)
+            mask = masks[cell]
+            for bit, dx, dy, step, move_cost in moves:
+                if reverse:
+                    nx, ny = cx - dx, cy - dy
+                    if not (x0 <= nx < x1 and y0 <= ny < y1):
+                        continue
+                    neighbor = cell - step
+                    if not masks[neighbor] >> bit & 1:
+                        continue
+                    new_cost = current_cost + move_cost + penalty[cell]
+                else:
+                    if not mask >> bit & 1:
+                        continue
+                    nx, ny = cx + dx, cy + dy
+                    if not (x0 <= nx < x1 and y0 <= ny < y1):
+                        continue
+                    neighbor = cell + step
+                    new_cost = current_cost + move_cost + penalty[neighbor]
+                if neighbor not in done and new_cost < cost.get(neighbor, float('inf')):
+                    cost[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    heappush(frontier, (new_cost, neighbor))
+        return cost, came_from
+
+    def abstract_path(self, start: Tuple[int, int], target: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Search the abstract graph.
+
+        Args:
+            start: Starting cell (x, y)
+            target: Target cell (x, y)
+
+        Returns:
+            List[Tuple[int, int]]: Waypoints from start to target, each pair either
+            adjacent across a cluster border or inside one cluster, or an empty
+            list if the target cannot be reached
+        """
+        self.stats = {"abstract_expanded": 0, "local_searches": 0, "cost": float('inf')}
+        grid = self.grid
+        if not grid.reachable(start, target):
+            return []
+        width = grid.cols
+        source = start[1] * width + start[0]
+        goal = target[1] * width + target[0]
+        if source == goal:
+            self.stats["cost"] = 0
+            return [tuple(start)]
+
+        start_cluster = self.cluster_of(source)
+        goal_cluster = self.cluster_of(goal)
+        reach, _ = self._local_search(source, start_cluster,
+                                      targets=self._entrances[start_cluster] + [goal])
+        start_edges = {cell: reach[cell] for cell in self._entrances[start_cluster] if cell in reach}
+        start_edges.pop(source, None)
+        if goal in reach:
+            start_edges[goal] = reach[goal]
+        start_edges.update(self._inter.get(source, {}))
+        to_goal_cost, _ = self._local_search(goal, goal_cluster, reverse=True,
+                                             targets=self._entrances[goal_cluster])
+        to_goal = {cell: to_goal_cost[cell] for cell in self._entrances[goal_cluster] if cell in to_goal_cost}
+
+        tx, ty = target
+        diagonal_cost = self.diagonal_cost
+        cost = {source: 0}
+        came_from = {source: None}
+        closed = set()
+        frontier = [(0, 0, source)]
+        while frontier:
+            _, current_cost, cell = heapq.heappop(frontier)
+            if cell in closed:
+                continue
+            if cell == goal:
+                break
+            closed.add(cell)
+            self.stats["abstract_expanded"] += 1
+
+            if cell == source:
+                edges = start_edges.items()
+            else:
+                edges = list(self._intra_edges(cell).items()) + list(self._inter.get(cell, {}).items())
+                if cell in to_goal:
+                    edges.append((goal, to_goal[cell]))
+            for neighbor, edge_cost in edges:
+                if neighbor in closed:
+                    continue
+                new_cost = current_cost + edge_cost
+                if new_cost < cost.get(neighbor, float('inf')):
+                    cost[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    ny, nx = divmod(neighbor, width)
+                    heapq.heappush(frontier, (new_cost + octile_distance(nx, ny, tx, ty, diagonal_cost),
+                                              new_cost, neighbor))
+
+        if goal not in came_from:
+            return []
+        self.stats["cost"] = cost[goal]
+        waypoints = []
+        cell = goal
+        while cell is not None:
+            waypoints.append((cell % width, cell // width))
+            cell = came_from[cell]
+        waypoints.reverse()
+        return waypoints
+
+    def refine(self, waypoints: Sequence[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+        """
+        Expand abstract waypoints into cells, one abstract edge at a time.
+
+        Args:
+            waypoints: Output of abstract_path
+
+        Yields:
+            Tuple[int, int]: Cells (x, y) from start to target
+        """
+        if not waypoints:
+            return
+        width = self.grid.cols
+        yield tuple(waypoints[0])
+        for (ax, ay), (bx, by) in zip(waypoints, waypoints[1:]):
+            a = ay * width + ax
+            b = by * width + bx
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                # Inter-cluster edge: a single step across the border
+                yield bx, by
+                continue
+            _, came_from = self._local_search(a, cluster, targets=(b,))
+            segment = []
+            cell = b
+            while cell != a:
+                segment.append((cell % width, cell // width))
+                cell = came_from[cell]
+            yield from reversed(segment)
+
+    def find_path(self, start: Tuple[int, int], target: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Plan a cell-by-cell path.
+
+        Args:
+            start: Starting cell (x, y)
+            target: Target cell (x, y)
+
+        Returns:
+            List[Tuple[int, int]]: Cells from start to target inclusive, or an
+            empty list if the target cannot be reached
+        """
+        return list(self.refine(self.abstract_path(start, target)))
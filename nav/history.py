@@ -0,0 +1,113 @@
+from array import array
+from typing import Optional, Tuple
+
+from nav.pathfinding import MAX_DENSE_CELLS, SparseCells
+
+
+class PositionHistory:
+    """
+    Where a boat has been: lifetime visit counts and a window of recent moves.
+
+    Visit counts live in one flat array indexed like the grid buffer. The
+    last capacity positions are kept in a ring buffer together with per-cell
+    counts for that window, so recording a position, counting revisits and
+    checking for loops or back-and-forth oscillation are all constant time.
+
+    Attributes:
+        width (int): Number of grid columns
+        height (int): Number of grid rows
+        capacity (int): Number of recent positions kept in the window
+        visits (array): Flat lifetime visit count per cell, a SparseCells dict on huge maps
+    """
+
+    def __init__(self, width: int, height: int, capacity: int = 10):
+        """
+        Initialize an empty history.
+
+        Args:
+            width: Number of grid columns
+            height: Number of grid rows
+            capacity: Number of recent positions kept for loop detection
+        """
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        if width * height <= MAX_DENSE_CELLS:
+            self.visits = array('I', [0]) * (width * height)
+            self._recent_visits = array('I', [0]) * (width * height)
+        else:
+            self.visits = SparseCells()
+            self._recent_visits = SparseCells()
+        self._ring = array('q', [-1]) * capacity
+        self._head = 0  # Slot the next position is written to
+        self._length = 0
+        self._moves = 0
+
+    def __len__(self) -> int:
+        """Number of positions recorded since the history was created"""
+        return self._moves
+
+    def __contains__(self, position: Tuple[int, int]) -> bool:
+        return self.visits[position[1] * self.width + position[0]] > 0
+
+    def add(self, position: Tuple[int, int]) -> None:
+        """
+        Record the boat entering a cell.
+
+        Args:
+            position: Cell (x, y)
+        """
+        cell = position[1] * self.width + position[0]
+        if self._length == self.capacity:
+            # The oldest position leaves the window
+            self._recent_visits[self._ring[self._head]] -= 1
+        else:
+            self._length += 1
+        self._ring[self._head] = cell
+        self._head = (self._head + 1) % self.capacity
+        self.visits[cell] += 1
+        self._recent_visits[cell] += 1
+        self._moves += 1
+
+    def count(self, position: Tuple[int, int]) -> int:
+        """Number of times the boat entered a cell"""
+        return self.visits[position[1] * self.width + position[0]]
+
+    def recent_count(self, position: Tuple[int, int]) -> int:
+        """Number of times a cell occurs among the last capacity positions"""
+        return self._recent_visits[position[1] * self.width + position[0]]
+
+    def last(self, back: int = 0) -> Optional[Tuple[int, int]]:
+        """
+        Get a recent position.
+
+        Args:
+            back: 0 for the latest position, 1 for the one before, and so on
+
+        Returns:
+            Optional[Tuple[int, int]]: Cell (x, y), or None if the window is shorter
+        """
+        if back >= self._length:
+            return None
+        cell = self._ring[(self._head - 1 - back) % self.capacity]
+        return cell % self.width, cell // self.width
+
+    def is_looping(self, limit: int = 3) -> bool:
+        """Check whether the latest cell was entered more than limit times within the window"""
+        latest = self.last()
+        return latest is not None and self.recent_count(latest) > limit
+
+    def is_oscillating(self) -> bool:
+        """Check whether the last four positions bounce between two cells (A, B, A, B)"""
+        if self._length < 4:
+            return False
+        ring, capacity, head = self._ring, self.capacity, self._head
+        a, b, c, d = (ring[(head - i) % capacity] for i in range(1, 5))
+        return a == c and b == d and a != b
+
+    def clear_recent(self) -> None:
+        """Forget the recent window but keep the lifetime visit counts"""
+        ring, recent = self._ring, self._recent_visits
+        for i in range(self._length):
+            recent[ring[(self._head - 1 - i) % self.capacity]] -= 1
+        self._length = 0
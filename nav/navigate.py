@@ -2,9 +2,20 @@ import math
 import constants
 from typing import Optional, Tuple, Set
 import logging
+from collections import deque
+from concurrent.futures import CancelledError
+from functools import partial
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from grid.neighbor_mask import NEIGHBORS
+from nav.background import PlanningService
+from nav.flow_field import FlowFieldCache
+from nav.history import PositionHistory
+from nav.pathfinding import DIAGONAL_COST, any_angle_path, trace_waypoints
+from nav.planner import PathPlanner
+from nav.telemetry import (ARRIVED, BACKTRACK, FAILED, MOVE, STAY, UNREACHABLE, NavigationStats,
+                           SampledLogger, TrajectoryRecorder)
+
+# Handlers and levels are left to the application
 logger = logging.getLogger(__name__)
 
 
@@ -16,25 +27,38 @@ class GreedyNavigate:
     avoidance penalties to guide a boat towards a target position. It includes
     backtracking capabilities when stuck in local minima.
 
+    Steps are counted in stats rather than logged. Moves and backtracks are
+    logged only when sampling is asked for, and every step can be recorded
+    into a TrajectoryRecorder for exact replay.
+
     Attributes:
         boat: Reference to the boat being navigated
         target (tuple): Target coordinates (x, y)
         visited (set): Set of previously visited positions
         path_stack (list): Stack of positions for backtracking
+        stats (NavigationStats): Moves, backtracks and dead ends so far
+        recorder (TrajectoryRecorder): Where steps are recorded, or None
     """
 
-    def __init__(self, boat):
+    def __init__(self, boat, log_every: int = 0, recorder: Optional[TrajectoryRecorder] = None):
         """
         Initialize the navigator with a boat.
 
         Args:
             boat: The boat to navigate
+            log_every: Log one in this many moves and backtracks at INFO level; 0 logs none
+            recorder: Optional recorder started at the boat's position
         """
         self.boat = boat
         self.target = constants.BOAT_TARGET_POS
         self.visited: Set[Tuple[int, int]] = set()
         self.path_stack: list[Tuple[int, int]] = []
-        logger.info(f"Navigator initialized with target at {self.target}")
+        self.stats = NavigationStats()
+        self.recorder = recorder
+        self._sampled = SampledLogger(logger, log_every) if log_every else None
+        self._rejected_target = None
+        self._reached_target = None
+        self._stuck = False
 
     @staticmethod
     def calculate_distance(pos1: Tuple[int, int], pos2: Tuple[int, int]) -> float:
@@ -63,19 +87,8 @@ class GreedyNavigate:
         Returns:
             bool: True if position is near shore, False otherwise
         """
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-
-                nx, ny = x + dx, y + dy
-
-                if (0 <= nx < constants.ROWS and
-                        0 <= ny < constants.COLS and
-                        not self.boat.grid[nx, ny].get("navigable")):
-                    return True
-
-        return False
+        grid = self.boat.grid
+        return grid.neighbor_masks[2][y * grid.cols + x] != 0
 
     def get_best_move(self) -> Optional[Tuple[int, int]]:
         """
@@ -123,9 +136,24 @@ class GreedyNavigate:
         3. If no valid move is found, backtrack to the previous position
         """
         current_pos = (self.boat.x, self.boat.y)
+        stats = self.stats
 
         if current_pos == self.target:
-            logger.info("Target reached!")
+            stats.arrived += 1
+            if self._reached_target != self.target:
+                logger.debug("Target %s reached after %d moves", self.target, stats.moves)
+                self._reached_target = self.target
+            self._record(ARRIVED)
+            return
+
+        if not self.boat.grid.reachable(current_pos, self.target, corner_cutting=True):
+            # Another body of water, even cutting corners as the boat may:
+            # exploring and backtracking can never get there
+            stats.unreachable += 1
+            if self._rejected_target != self.target:
+                logger.warning("Target %s cannot be reached from %s", self.target, current_pos)
+                self._rejected_target = self.target
+            self._record(UNREACHABLE)
             return
 
         best_move = self.get_best_move()
@@ -139,14 +167,422 @@ class GreedyNavigate:
             if self.boat.move(dx, dy):
                 new_pos = (self.boat.x, self.boat.y)
                 self.visited.add(new_pos)
-                logger.info(f"Moved to {new_pos}")
+                stats.moves += 1
+                if self._sampled is not None:
+                    self._sampled.log("move", "Moved to %s", new_pos)
+                self._record(MOVE)
             else:
-                logger.warning(f"Failed to move {best_move}")
+                stats.failed_moves += 1
+                logger.warning("Failed to move %s", best_move)
+                self._record(FAILED)
+            self._stuck = False
         else:
             # Backtrack if possible
             if self.path_stack:
                 last_pos = self.path_stack.pop()
                 self.boat.x, self.boat.y = last_pos
-                logger.info(f"Backtracking to {last_pos}")
+                stats.backtracks += 1
+                if self._sampled is not None:
+                    self._sampled.log("backtrack", "Backtracking to %s", last_pos)
+                self._record(BACKTRACK)
             else:
-                logger.warning("No moves available and no positions to backtrack to")
\ No newline at end of file
+                stats.dead_ends += 1
+                if not self._stuck:
+                    logger.warning("No moves available and no positions to backtrack to")
+                    self._stuck = True
+                self._record(STAY)
+
+    def _record(self, kind: int) -> None:
+        """Record the step just taken as one of the nav.telemetry step kinds, if a recorder is attached"""
+        if self.recorder is not None:
+            self.recorder.record(self.boat.x, self.boat.y, kind)
+
+
+class FlowFieldNavigate:
+    """
+    Steers a boat by reading a flow field shared by every boat with the same target.
+
+    The first boat to ask for a target pays for one reverse Dijkstra over the
+    grid. After that, every step of every boat is a single lookup in the
+    cached field.
+
+    Attributes:
+        boat: Reference to the boat being navigated
+        target (tuple): Target coordinates (x, y)
+        fields (FlowFieldCache): Cache shared between navigators
+    """
+
+    # Used by navigators that are not given their own cache
+    shared_fields = FlowFieldCache()
+
+    def __init__(self, boat, fields: Optional[FlowFieldCache] = None):
+        """
+        Initialize the navigator with a boat.
+
+        Args:
+            boat: The boat to navigate
+            fields: Flow field cache to use; defaults to one shared by all navigators
+        """
+        self.boat = boat
+        self.target = constants.BOAT_TARGET_POS
+        self.fields = fields if fields is not None else self.shared_fields
+
+    def get_best_move(self) -> Optional[Tuple[int, int]]:
+        """
+        Look up the first step of the cheapest route to the target.
+
+        Returns:
+            Optional[Tuple[int, int]]: Movement vector (dx, dy) or None if the
+            boat is at the target or cannot reach it
+        """
+        grid = self.boat.grid
+        if not grid.reachable((self.boat.x, self.boat.y), self.target):
+            # Don't build a field that cannot lead here
+            return None
+        field = self.fields.get(grid, self.target)
+        return field.next_move(self.boat.x, self.boat.y)
+
+    def navigate(self) -> None:
+        """Perform one step of navigation towards the target."""
+        best_move = self.get_best_move()
+        if best_move:
+            self.boat.move(*best_move)
+
+
+class PlannerNavigate:
+    """
+    Follows an optimal plan kept by an incremental D* Lite planner.
+
+    When no route to the target exists, the boat drifts to the least visited
+    neighboring cell with the lowest shore penalty instead of standing still.
+
+    Given a PlanningService, the full search for a new target or a changed
+    grid runs on its thread and the boat holds its position until it is
+    done; repairs after the boat leaves the plan stay incremental and run
+    in navigate() as before.
+
+    Given a profiler, every full plan is timed as a "find_path" phase and
+    every repair as a "repair" phase, with the cells each one expanded
+    counted as "expanded/plan" and "expanded/repair".
+
+    With any_angle the boat sails the plan pulled straight by
+    nav.pathfinding.any_angle_path instead of its 8-direction staircase.
+    The line is traced again whenever the target or the grid changes or
+    the boat is not where the line expects it.
+
+    Attributes:
+        boat: Reference to the boat being navigated
+        target (tuple): Target coordinates (x, y)
+        shore_penalty (float): Multiplier for the grid's shore cost raster
+        history (PositionHistory): Visit counts and recent positions of the boat
+        stuck_count (int): Number of times the boat was caught looping or oscillating
+        replans (int): Full plans and repairs made by planners so far
+        service (PlanningService): Where full plans are made, or None to make them in navigate()
+        pending (Future): Full plan in flight, or None
+        any_angle (bool): Follow straight lines through the plan rather than the plan itself
+        profiler: Where plans and repairs are timed and counted, or None; anything with
+            phase(name) and count(name, value) such as display_main.profiler.Profiler
+    """
+
+    MAX_STUCK_TIME = 10
+    # Profiler phase of each kind of PathPlanner.work
+    PHASES = {"plan": "find_path", "repair": "repair"}
+
+    def __init__(self, boat, shore_penalty: Optional[float] = None, diagonal_cost: float = DIAGONAL_COST,
+                 service: Optional[PlanningService] = None, any_angle: bool = False, profiler=None):
+        """
+        Initialize the navigator with a boat.
+
+        Args:
+            boat: The boat to navigate
+            shore_penalty: Shore penalty multiplier, defaults to constants.SHORE_PENALTY
+            diagonal_cost: Cost of one diagonal step
+            service: Optional planning service for full plans
+            any_angle: Follow any-angle lines through the plan
+            profiler: Optional profiler for plans and repairs
+        """
+        self.boat = boat
+        self.target = constants.BOAT_TARGET_POS
+        self.shore_penalty = shore_penalty
+        self.diagonal_cost = diagonal_cost
+        self.history = PositionHistory(boat.grid.cols, boat.grid.rows, self.MAX_STUCK_TIME)
+        self.stuck_count = 0
+        self.service = service
+        self.pending = None
+        self.any_angle = any_angle
+        self.profiler = profiler
+        self._line = deque()  # Cells of the any-angle line, starting with the boat's
+        self._line_key = None  # (target, grid, version) the line was traced for
+        self._planner = None
+        self._planner_version = None
+        self._replans = 0
+
+    @property
+    def planner(self) -> PathPlanner:
+        """
+        Planner for the boat's grid.
+
+        When cells change, the planner is told which ones so that it repairs
+        its plan incrementally; it is only rebuilt for a different grid or
+        when the grid no longer remembers what changed.
+        """
+        grid = self.boat.grid
+        planner = self._planner
+        if planner is not None and self._planner_version != grid.version:
+            changed = grid.changed_cells(self._planner_version) if planner.passable is grid.cells else None
+            if changed is None:
+                self._drop_planner()
+            else:
+                planner.penalty = grid.shore_costs(self.shore_penalty)
+                planner.update_cells(changed)
+                self._planner_version = grid.version
+        if self._planner is None:
+            self._planner = PathPlanner(grid.cells, grid.cols, grid.rows,
+                                        grid.shore_costs(self.shore_penalty), self.diagonal_cost)
+            self._planner_version = grid.version
+        return self._planner
+
+    @property
+    def replans(self) -> int:
+        planner = self._planner
+        return self._replans + (planner.replans + planner.repairs if planner is not None else 0)
+
+    @property
+    def waiting(self) -> bool:
+        """True while a full plan is being made on the service"""
+        return self.pending is not None
+
+    def cancel(self) -> None:
+        """Drop the full plan in flight, if any"""
+        if self.pending is None:
+            return
+        self.service.cancel(self)
+        self.pending = None
+        self._drop_planner()
+
+    def _drop_planner(self) -> None:
+        """Start over with a new planner, keeping the count of the old one's plans"""
+        # A D* Lite search cannot be stopped part way, so a cancelled one may
+        # still be running on the service thread: leave it to finish there
+        if self._planner is not None:
+            self._replans += self._planner.replans + self._planner.repairs
+        self._planner = None
+
+    def _next_step(self, planner: PathPlanner, position, target) -> Optional[Tuple[int, int]]:
+        """planner.next_step, timed and counted on the profiler when it plans or repairs"""
+        profiler = self.profiler
+        work = planner.work(position, target) if profiler is not None else None
+        if work is None:
+            return planner.next_step(position, target)
+        stats = {}
+        with profiler.phase(self.PHASES[work]):
+            next_pos = planner.next_step(position, target, stats)
+        profiler.count(f"expanded/{work}", stats["expanded"])
+        return next_pos
+
+    def _full_plan(self, planner: PathPlanner, grid, start, target, cancel=None):
+        """Run on the service thread: plan from start to target from scratch"""
+        self._next_step(planner, start, target)
+        return planner.path()
+
+    def _plan_ready(self) -> bool:
+        """
+        With a service, make sure a full plan is never made in navigate().
+
+        Returns:
+            bool: False while the boat has to wait for a plan from the service
+        """
+        if self.pending is not None:
+            if not self.pending.done():
+                return False
+            future, self.pending = self.pending, None
+            try:
+                future.result()
+            except CancelledError:
+                self._drop_planner()
+        boat = self.boat
+        grid = boat.grid
+        position = (boat.x, boat.y)
+        target = tuple(self.target)
+        if not grid.reachable(position, target):
+            # No plan to make; get_best_move drifts instead
+            return True
+        planner = self.planner
+        if planner.target == target:
+            return True
+        plan = partial(self._full_plan, planner)
+        self.pending = self.service.submit(grid, position, target, key=self, plan=plan)
+        return False
+
+    def get_best_move(self) -> Optional[Tuple[int, int]]:
+        """
+        Get the next step of the plan, or the unstuck move if there is no plan.
+
+        Returns:
+            Optional[Tuple[int, int]]: Movement vector (dx, dy) or None if no valid moves
+        """
+        boat = self.boat
+        grid = boat.grid
+        # Only plan when the target is in the boat's body of water
+        if grid.reachable((boat.x, boat.y), self.target):
+            if self.any_angle:
+                next_pos = self._next_on_line()
+            else:
+                next_pos = self._next_step(self.planner, (boat.x, boat.y), self.target)
+            if next_pos:
+                return next_pos[0] - boat.x, next_pos[1] - boat.y
+
+        # If stuck, try to move to least visited water away from shore
+        shore_cost = grid.shore_costs(self.shore_penalty)
+        neighbors = [(boat.x + dx, boat.y + dy)
+                     for dx, dy in NEIGHBORS[grid.neighbor_masks[1][boat.y * grid.cols + boat.x]]]
+        if neighbors:
+            visits = self.history.visits
+            best_pos = min(neighbors, key=lambda n: (
+                    visits[n[1] * grid.cols + n[0]] +
+                    shore_cost[n[1] * grid.cols + n[0]]
+            ))
+            return best_pos[0] - boat.x, best_pos[1] - boat.y
+
+        return None
+
+    def _next_on_line(self) -> Optional[Tuple[int, int]]:
+        """Next cell of the any-angle line through the plan, traced again when it no longer applies"""
+        boat = self.boat
+        grid = boat.grid
+        position = (boat.x, boat.y)
+        key = (tuple(self.target), grid, grid.version)
+        line = self._line
+        if key == self._line_key and len(line) > 1 and line[0] == position:
+            line.popleft()
+            return line[0]
+
+        planner = self.planner
+        next_pos = self._next_step(planner, position, self.target)
+        if next_pos is None:
+            self._line.clear()
+            return None
+        waypoints = any_angle_path(planner.path(), grid.cells, grid.cols, planner.penalty)
+        self._line = deque(trace_waypoints(waypoints))
+        self._line_key = key
+        self._line.popleft()
+        return self._line[0]
+
+    def navigate(self) -> None:
+        """Perform one step of navigation towards the target, or wait for the service to plan it."""
+        if (self.boat.x, self.boat.y) == tuple(self.target):
+            return
+        if self.service is not None and not self._plan_ready():
+            return
+
+        move = self.get_best_move()
+        if move and self.boat.move(*move):
+            self.history.add((self.boat.x, self.boat.y))
+
+            # Check if stuck: the same spot more than 3 times in the last
+            # MAX_STUCK_TIME moves, or bouncing between two cells
+            if self.history.is_looping(3) or self.history.is_oscillating():
+                # Clear recent history; the lifetime visit counts keep steering
+                # the drift towards cells it has not tried yet
+                self.history.clear_recent()
+                self.stuck_count += 1
+
+
+class BackgroundNavigate:
+    """
+    Follows paths planned on a PlanningService thread without ever waiting for one.
+
+    When the boat has no path, navigate() submits a request and returns at
+    once; the boat holds its position until the plan arrives on a later call
+    and then sails along it one cell per step. A new plan is requested when
+    the target or the grid changes, or when a step along the path fails.
+    Plans may be waypoints (see nav.pathfinding.any_angle_path); they are
+    traced back into cells.
+
+    Attributes:
+        boat: Reference to the boat being navigated
+        target (tuple): Target coordinates (x, y)
+        service (PlanningService): Where plans are requested
+        pending (Future): Request in flight, or None
+        replans (int): Plans requested so far
+    """
+
+    # Used by navigators that are not given their own service, started by the first of them
+    _shared_service = None
+
+    def __init__(self, boat, service: Optional[PlanningService] = None):
+        """
+        Initialize the navigator with a boat.
+
+        Args:
+            boat: The boat to navigate
+            service: Planning service to use; defaults to one shared by all navigators
+        """
+        self.boat = boat
+        self.target = constants.BOAT_TARGET_POS
+        self.service = service if service is not None else self.shared_service()
+        self.pending = None
+        self.replans = 0
+        self._path = deque()
+        self._key = None  # (target, grid, version) the path or request was made for
+        self._failed = None  # Key whose plan came back empty
+
+    @classmethod
+    def shared_service(cls) -> PlanningService:
+        """The PlanningService of navigators created without one"""
+        if cls._shared_service is None:
+            cls._shared_service = PlanningService()
+        return cls._shared_service
+
+    @property
+    def waiting(self) -> bool:
+        """True while a requested plan has not arrived yet"""
+        return self.pending is not None
+
+    def cancel(self) -> None:
+        """Drop the pending request and the current path"""
+        self.service.cancel(self)
+        self.pending = None
+        self._path.clear()
+        self._key = None
+
+    def _collect(self) -> None:
+        """Take over the pending plan if it has arrived"""
+        if not self.pending.done():
+            return
+        future, self.pending = self.pending, None
+        try:
+            path = future.result()
+        except CancelledError:
+            return
+        if not path:
+            self._failed = self._key
+            return
+        cells = trace_waypoints(path)
+        next(cells)  # The cell the boat was in when it asked
+        self._path = deque(cells)
+
+    def navigate(self) -> None:
+        """Perform one step of navigation towards the target, or ask for a plan."""
+        boat = self.boat
+        position = (boat.x, boat.y)
+        target = tuple(self.target)
+        if position == target:
+            return
+
+        key = (target, boat.grid, boat.grid.version)
+        if key != self._key:
+            # Whatever was planned or asked for no longer applies
+            self.cancel()
+            self._key = key
+        if self.pending is not None:
+            self._collect()
+        if not self._path:
+            if self.pending is None and self._failed != key:
+                self.pending = self.service.submit(boat.grid, position, target, key=self)
+                self.replans += 1
+            return
+
+        x, y = self._path.popleft()
+        if not boat.move(x - boat.x, y - boat.y):
+            self._path.clear()
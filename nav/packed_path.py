@@ -0,0 +1,439 @@
+import struct
+from array import array
+from bisect import bisect_left
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+import constants
+from grid.path_cost import STEP_BLOCK, step_penalties
+from nav.pathfinding import DIRECTIONS, trace_waypoints
+
+# A run is one byte: direction index in DIRECTIONS in the top 3 bits, length - 1 below
+MAX_RUN = 32
+_DIRECTION_CODES = {direction: index for index, direction in enumerate(DIRECTIONS)}
+# Record of one path: start x, start y, steps, bytes of runs
+_RECORD = struct.Struct("<IIII")
+_NO_START = 0xFFFFFFFF
+_ARCHIVE_HEADER = struct.Struct("<4sHQ")  # magic, version, number of paths
+_ARCHIVE_MAGIC = b"PTHS"
+_ARCHIVE_VERSION = 1
+_DX = np.array([dx for dx, _ in DIRECTIONS], dtype=np.int64)
+_DY = np.array([dy for _, dy in DIRECTIONS], dtype=np.int64)
+
+
+def _encode_runs(runs: Iterable[Tuple[int, int]]) -> bytes:
+    """Pack (direction, length) runs into bytes, merging neighbors and splitting long runs"""
+    encoded = bytearray()
+    direction, length = None, 0
+    for run_direction, run_length in runs:
+        if run_direction == direction:
+            length += run_length
+            continue
+        while length > 0:
+            encoded.append(direction << 5 | min(length, MAX_RUN) - 1)
+            length -= MAX_RUN
+        direction, length = run_direction, run_length
+    while length > 0:
+        encoded.append(direction << 5 | min(length, MAX_RUN) - 1)
+        length -= MAX_RUN
+    return bytes(encoded)
+
+
+class PackedPath:
+    """
+    A path of neighboring cells stored as its start cell and run-length coded directions.
+
+    Each run of steps in one direction takes a byte: the direction's index in
+    DIRECTIONS in 3 bits and the run length in 5, longer runs taking several
+    bytes. A path costs one byte per turn instead of a tuple per cell, and
+    straight stretches are almost free. The encoding is canonical, so equal
+    paths have equal bytes.
+
+    A PackedPath behaves like the read-only list of cells it stands for: len()
+    is O(1), iteration decodes lazily, and indexing or slicing finds its run
+    by bisection in an index built on first use.
+
+    Attributes:
+        start (tuple): First cell (x, y), None for the empty path
+        runs (bytes): The encoded runs
+    """
+    __slots__ = ("start", "runs", "_steps", "_index")
+
+    def __init__(self, start: Optional[Tuple[int, int]], runs: bytes = b"", steps: Optional[int] = None):
+        """
+        Wrap already encoded runs; use from_cells to encode a path.
+
+        Args:
+            start: First cell (x, y), None for the empty path
+            runs: Runs as encoded by from_cells
+            steps: Number of steps in runs, counted if not given
+        """
+        self.start = tuple(start) if start is not None else None
+        self.runs = bytes(runs)
+        self._steps = steps if steps is not None else sum((run & 31) + 1 for run in self.runs)
+        self._index = None
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[Tuple[int, int]]) -> "PackedPath":
+        """
+        Encode a sequence of cells in which each cell neighbors the one before.
+
+        Raises:
+            ValueError: If two consecutive cells are not neighbors
+        """
+        cells = iter(cells)
+        start = next(cells, None)
+        if start is None:
+            return cls(None)
+
+        def runs():
+            px, py = start
+            for x, y in cells:
+                direction = _DIRECTION_CODES.get((x - px, y - py))
+                if direction is None:
+                    raise ValueError(f"Cells {(px, py)} and {(x, y)} are not neighbors")
+                yield direction, 1
+                px, py = x, y
+
+        return cls(start, _encode_runs(runs()))
+
+    @classmethod
+    def from_waypoints(cls, waypoints: Sequence[Tuple[int, int]]) -> "PackedPath":
+        """Encode the cells along waypoints, as nav.pathfinding.any_angle_path returns them"""
+        return cls.from_cells(trace_waypoints(waypoints))
+
+    def __len__(self) -> int:
+        return 0 if self.start is None else self._steps + 1
+
+    def __bool__(self) -> bool:
+        return self.start is not None
+
+    @property
+    def steps(self) -> int:
+        """Number of moves, one less than the number of cells"""
+        return self._steps
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded path as written by to_bytes"""
+        return _RECORD.size + len(self.runs)
+
+    def run_lengths(self) -> Iterator[Tuple[Tuple[int, int], int]]:
+        """Yield ((dx, dy), length) for every run"""
+        for run in self.runs:
+            yield DIRECTIONS[run >> 5], (run & 31) + 1
+
+    def directions(self) -> Iterator[Tuple[int, int]]:
+        """Yield the move (dx, dy) of every step"""
+        for direction, length in self.run_lengths():
+            for _ in range(length):
+                yield direction
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        if self.start is None:
+            return
+        x, y = self.start
+        yield x, y
+        for (dx, dy), length in self.run_lengths():
+            for _ in range(length):
+                x += dx
+                y += dy
+                yield x, y
+
+    def _build_index(self):
+        """Steps taken and position reached before every run"""
+        first = array("I")
+        xs = array("i")
+        ys = array("i")
+        x, y = self.start
+        taken = 0
+        for (dx, dy), length in self.run_lengths():
+            first.append(taken)
+            xs.append(x)
+            ys.append(y)
+            taken += length
+            x += dx * length
+            y += dy * length
+        self._index = (first, xs, ys)
+        return self._index
+
+    def _cell(self, i: int) -> Tuple[int, int]:
+        """Cell i for 0 <= i < len(self)"""
+        if i == 0:
+            return self.start
+        first, xs, ys = self._index or self._build_index()
+        # Run holding step i, the one that ends in cell i
+        r = bisect_left(first, i) - 1
+        dx, dy = DIRECTIONS[self.runs[r] >> 5]
+        k = i - first[r]
+        return xs[r] + dx * k, ys[r] + dy * k
+
+    def __getitem__(self, item: Union[int, slice]):
+        """
+        Cell at an index, or the cells of a slice.
+
+        Slices with a step of 1 give a PackedPath; other steps give a list of cells.
+        """
+        size = len(self)
+        if isinstance(item, slice):
+            start, stop, stride = item.indices(size)
+            if stride != 1:
+                return [self._cell(i) for i in range(start, stop, stride)]
+            if stop <= start:
+                return PackedPath(None)
+            return self._slice(start, stop)
+        if item < 0:
+            item += size
+        if not 0 <= item < size:
+            raise IndexError("PackedPath index out of range")
+        return self._cell(item)
+
+    def _slice(self, start: int, stop: int) -> "PackedPath":
+        """Cells start to stop - 1, with 0 <= start < stop <= len(self)"""
+        if stop - start == 1:
+            return PackedPath(self._cell(start))
+        first, _, _ = self._index or self._build_index()
+        runs = self.runs
+        # Steps start + 1 to stop - 1 end in the cells kept after the first
+        low, high = start + 1, stop - 1
+        r = bisect_left(first, low) - 1
+        pieces = []
+        while r < len(runs) and first[r] < high:
+            length = (runs[r] & 31) + 1
+            begin = max(first[r] + 1, low)
+            end = min(first[r] + length, high)
+            pieces.append((runs[r] >> 5, end - begin + 1))
+            r += 1
+        return PackedPath(self._cell(start), _encode_runs(pieces), high - low + 1)
+
+    @property
+    def end(self) -> Optional[Tuple[int, int]]:
+        """Last cell, None for the empty path"""
+        return self._cell(len(self) - 1) if self.start is not None else None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedPath):
+            return self.start == other.start and self.runs == other.runs
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.start, self.runs))
+
+    def __repr__(self) -> str:
+        return f"PackedPath(start={self.start}, cells={len(self)}, runs={len(self.runs)})"
+
+    def to_list(self) -> List[Tuple[int, int]]:
+        return list(self)
+
+    def cost(self, grid, shore_penalty: Optional[float] = None) -> float:
+        """
+        Cost of the path exactly as grid.get_path_cost computes it for the cells.
+
+        Every step costs 1, plus the shore penalty when the cell it enters is
+        not open water (Grid.check_for_water): off the map, land, or next to
+        land. The neighbor masks answer that in one lookup per step.
+
+        Args:
+            grid: Grid the path lies on
+            shore_penalty: Penalty per step, constants.SHORE_PENALTY by default,
+                which is what get_path_cost uses
+
+        Returns:
+            float: The cost; infinite for the empty path
+
+        See packed_path_costs to score many paths at once.
+        """
+        if self.start is None:
+            return float('inf')
+        if shore_penalty is None:
+            shore_penalty = constants.SHORE_PENALTY
+        cells = grid.cells
+        shore = grid.neighbor_masks[2]
+        cols, rows = grid.cols, grid.rows
+        x, y = self.start
+        penalized = 0
+        for (dx, dy), length in self.run_lengths():
+            for _ in range(length):
+                x += dx
+                y += dy
+                if not (0 <= x < cols and 0 <= y < rows):
+                    penalized += 1
+                else:
+                    index = y * cols + x
+                    if not cells[index] or shore[index]:
+                        penalized += 1
+        return self._steps + penalized * shore_penalty
+
+    def to_bytes(self) -> bytes:
+        """Serialize as a self-delimiting record, read back by from_bytes"""
+        x, y = self.start if self.start is not None else (_NO_START, _NO_START)
+        return _RECORD.pack(x, y, self._steps, len(self.runs)) + self.runs
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "PackedPath":
+        """
+        Read a path written by to_bytes.
+
+        Args:
+            data: Buffer holding the record
+            offset: Position of the record in data
+
+        Raises:
+            ValueError: If the record is cut short
+        """
+        x, y, steps, size = _RECORD.unpack_from(data, offset)
+        begin = offset + _RECORD.size
+        runs = bytes(data[begin:begin + size])
+        if len(runs) != size:
+            raise ValueError("Path record is cut short")
+        if x == _NO_START:
+            return cls(None)
+        return cls((x, y), runs, steps)
+
+
+def packed_path_costs(grid, paths: Sequence[PackedPath], shore_penalty: Optional[float] = None) -> np.ndarray:
+    """
+    Cost of many packed paths at once, each exactly as PackedPath.cost computes it.
+
+    The runs of a block of paths are joined into one array and expanded into
+    steps, a cumulative sum gives the cell every step enters, and one lookup
+    in grid.clear_water() decides the shore penalty of all of them. Steps
+    and penalized steps are counted as integers per path, so the costs equal
+    Grid.get_path_cost's for an integer penalty.
+
+    Args:
+        grid: Grid the paths lie on
+        paths: PackedPaths to score
+        shore_penalty: Penalty per step, constants.SHORE_PENALTY by default
+
+    Returns:
+        numpy.ndarray: float64 cost of every path, infinite for empty ones
+    """
+    if shore_penalty is None:
+        shore_penalty = constants.SHORE_PENALTY
+    clear = grid.clear_water()
+    count = len(paths)
+    # One pass over the paths for everything the blocks need
+    fields = np.array([(*(path.start or (0, 0)), path._steps, len(path.runs), path.start is None) for path in paths],
+                      dtype=np.int64).reshape(count, 5)
+    runs = np.frombuffer(b"".join(path.runs for path in paths), dtype=np.uint8)
+    starts, steps, run_counts, empty = fields[:, :2], fields[:, 2], fields[:, 3], fields[:, 4].astype(bool)
+    step_ends = np.cumsum(steps)
+    run_ends = np.cumsum(run_counts)
+    costs = np.empty(count)
+    first = 0
+    while first < count:
+        # Take paths until the block holds STEP_BLOCK steps, at least one path
+        begin = step_ends[first] - steps[first]
+        last = max(int(np.searchsorted(step_ends, begin + STEP_BLOCK, side="right")), first + 1)
+        block_runs = runs[run_ends[first] - run_counts[first]:run_ends[last - 1]]
+        costs[first:last] = _block_costs(clear, block_runs, starts[first:last], steps[first:last], shore_penalty)
+        first = last
+    costs[empty] = float('inf')
+    return costs
+
+
+def _block_costs(clear, runs, starts, steps, shore_penalty):
+    """Costs of consecutive paths given their joined runs, start cells and step counts"""
+    count = len(steps)
+    lengths = (runs & 31).astype(np.int64) + 1
+    codes = runs >> 5
+    owner = np.repeat(np.arange(count), steps)
+    # Position after every step as if all paths were one, then moved to each path's start
+    x = np.cumsum(np.repeat(_DX[codes], lengths))
+    y = np.cumsum(np.repeat(_DY[codes], lengths))
+    first_step = np.cumsum(steps) - steps
+    x += (starts[:, 0] - np.concatenate(([0], x))[first_step])[owner]
+    y += (starts[:, 1] - np.concatenate(([0], y))[first_step])[owner]
+    penalized = np.bincount(owner, weights=step_penalties(clear, x, y), minlength=count).astype(np.int64)
+    return (steps + penalized * shore_penalty).astype(np.float64)
+
+
+class PathArchive:
+    """
+    Many packed paths in one growing buffer, for scenario archives.
+
+    Paths are stored back to back as PackedPath.to_bytes records with an
+    array of offsets, about 16 bytes per path plus one byte per run, and are
+    decoded only when taken out again.
+
+    Attributes:
+        nbytes (int): Size of the stored records
+    """
+
+    def __init__(self, paths: Iterable = ()):
+        """
+        Args:
+            paths: Optional PackedPaths or cell sequences to start with
+        """
+        self._data = bytearray()
+        self._offsets = array("Q")
+        self.extend(paths)
+
+    def append(self, path) -> None:
+        """Add a PackedPath or a sequence of neighboring cells"""
+        if not isinstance(path, PackedPath):
+            path = PackedPath.from_cells(path)
+        self._offsets.append(len(self._data))
+        self._data += path.to_bytes()
+
+    def extend(self, paths: Iterable) -> None:
+        for path in paths:
+            self.append(path)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, index: int) -> PackedPath:
+        return PackedPath.from_bytes(self._data, self._offsets[index])
+
+    def __iter__(self) -> Iterator[PackedPath]:
+        for offset in self._offsets:
+            yield PackedPath.from_bytes(self._data, offset)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data)
+
+    def costs(self, grid, shore_penalty: Optional[float] = None) -> np.ndarray:
+        """Cost of every stored path, see packed_path_costs"""
+        return packed_path_costs(grid, list(self), shore_penalty)
+
+    def save(self, file: Union[str, BinaryIO]) -> None:
+        """Write the archive to a file name or binary file object"""
+        if isinstance(file, str):
+            with open(file, "wb") as handle:
+                self.save(handle)
+            return
+        file.write(_ARCHIVE_HEADER.pack(_ARCHIVE_MAGIC, _ARCHIVE_VERSION, len(self)))
+        file.write(self._data)
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> "PathArchive":
+        """
+        Read an archive written by save.
+
+        Raises:
+            ValueError: If the data is not an archive or is cut short
+        """
+        if isinstance(file, str):
+            with open(file, "rb") as handle:
+                return cls.load(handle)
+        header = file.read(_ARCHIVE_HEADER.size)
+        if len(header) < _ARCHIVE_HEADER.size:
+            raise ValueError("Path archive is too short")
+        magic, version, count = _ARCHIVE_HEADER.unpack(header)
+        if magic != _ARCHIVE_MAGIC or version != _ARCHIVE_VERSION:
+            raise ValueError(f"Not a version {_ARCHIVE_VERSION} path archive")
+        archive = cls()
+        archive._data = bytearray(file.read())
+        offset = 0
+        for _ in range(count):
+            if offset + _RECORD.size > len(archive._data):
+                raise ValueError("Path archive is cut short")
+            archive._offsets.append(offset)
+            offset += _RECORD.size + _RECORD.unpack_from(archive._data, offset)[3]
+        if offset != len(archive._data):
+            raise ValueError("Path archive is cut short")
+        return archive
@@ -0,0 +1,589 @@
+import heapq
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DIAGONAL_COST = 1.4
+
+# Movement vectors (dx, dy) in the order the planners have always tried them
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+# Larger maps (see grid.chunked) get sparse per-cell scratch instead of flat buffers
+MAX_DENSE_CELLS = 1 << 24
+
+
+class SparseCells(dict):
+    """Per-cell counters for maps too large to allocate flat: missing cells read as 0"""
+
+    def __missing__(self, cell):
+        return 0
+
+
+# Expansions between two looks at a search's cancel event
+CANCEL_CHECK_INTERVAL = 1024
+
+
+def cell_flags(size: int):
+    """Zeroed per-cell scratch, a bytearray unless size exceeds MAX_DENSE_CELLS"""
+    return bytearray(size) if size <= MAX_DENSE_CELLS else SparseCells()
+
+
+def _next_checkpoint(expanded: int, limit: Optional[int], cancel) -> float:
+    """Expansion count at which a search next has to look at its limit and cancel event"""
+    checkpoint = limit if limit is not None else math.inf
+    if cancel is not None:
+        checkpoint = min(checkpoint, expanded + CANCEL_CHECK_INTERVAL)
+    return checkpoint
+
+
+def octile_distance(x1: int, y1: int, x2: int, y2: int, diagonal_cost: float = DIAGONAL_COST) -> float:
+    """
+    Cheapest obstacle-free distance between two cells with 8-directional moves.
+
+    Args:
+        x1, y1: First cell
+        x2, y2: Second cell
+        diagonal_cost: Cost of one diagonal step
+
+    Returns:
+        float: Straight steps plus diagonal_cost per diagonal step
+    """
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    if dx > dy:
+        return dx - dy + diagonal_cost * dy
+    return dy - dx + diagonal_cost * dx
+
+
+def passable_neighbors(passable: Sequence[int], width: int, height: int,
+                       x: int, y: int) -> List[Tuple[int, int]]:
+    """
+    Get the cells a boat at (x, y) can move to in one step.
+
+    Args:
+        passable: width * height values, truthy where a boat can sail
+        width: Number of columns
+        height: Number of rows
+        x, y: Current cell
+
+    Returns:
+        List[Tuple[int, int]]: Reachable neighbor cells in DIRECTIONS order,
+        skipping diagonals that would cut past land
+    """
+    neighbors = []
+    for dx, dy in DIRECTIONS:
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < width and 0 <= ny < height) or not passable[ny * width + nx]:
+            continue
+        if dx and dy and not (passable[y * width + nx] and passable[ny * width + x]):
+            continue
+        neighbors.append((nx, ny))
+    return neighbors
+
+
+def astar(passable: Sequence[int],
+          width: int,
+          height: int,
+          start: Tuple[int, int],
+          target: Tuple[int, int],
+          penalty: Optional[Sequence[float]] = None,
+          diagonal_cost: float = DIAGONAL_COST,
+          limit: Optional[int] = None,
+          stats: Optional[Dict[str, int]] = None,
+          masks: Optional[Sequence[int]] = None,
+          cancel: Optional[threading.Event] = None) -> List[Tuple[int, int]]:
+    """
+    A* search over a flat, row-major grid.
+
+    Cells are addressed by their flat index y * width + x. The open list is a
+    binary heap with lazy deletion: outdated entries stay in the heap and are
+    skipped when popped because their cell is already in the closed set.
+    Diagonal moves are refused when either orthogonal cell they cut past is
+    not passable. Given per-cell move masks (Grid.neighbor_masks[1]), the
+    bounds and corner checks collapse into one lookup per expanded cell.
+
+    Args:
+        passable: width * height values, truthy where a boat can sail
+        width: Number of columns
+        height: Number of rows
+        start: Starting cell (x, y)
+        target: Target cell (x, y)
+        penalty: Optional width * height extra costs for entering each cell
+        diagonal_cost: Cost of one diagonal step (straight steps cost 1)
+        limit: Optional maximum number of expanded cells
+        stats: Optional dict that receives the number of "expanded" cells
+        masks: Optional width * height move masks as built by grid.neighbor_mask,
+            which must agree with passable
+        cancel: Optional event that makes the search give up once set; it is
+            looked at every CANCEL_CHECK_INTERVAL expanded cells
+
+    Returns:
+        List[Tuple[int, int]]: Cells from start to target inclusive, or an
+        empty list if the target cannot be reached
+    """
+    sx, sy = start
+    tx, ty = target
+    source = sy * width + sx
+    goal = ty * width + tx
+    expanded = 0
+
+    if source == goal:
+        path = [(sx, sy)]
+    elif not passable[goal]:
+        path = []
+    else:
+        moves = [(dx, dy, dy * width + dx, diagonal_cost if dx and dy else 1)
+                 for dx, dy in DIRECTIONS]
+        if masks is not None:
+            # Moves left in each mask, in DIRECTIONS order like the unmasked loop
+            mask_moves = [tuple(move for bit, move in enumerate(moves) if mask >> bit & 1)
+                          for mask in range(256)]
+        closed = cell_flags(width * height)
+        checkpoint = _next_checkpoint(0, limit, cancel)
+        cost = {source: 0}
+        came_from = {source: None}
+        frontier = [(octile_distance(sx, sy, tx, ty, diagonal_cost), 0, source)]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        found = False
+
+        while frontier:
+            _, current_cost, current = heappop(frontier)
+            if closed[current]:
+                continue
+            if current == goal:
+                found = True
+                break
+            if expanded >= checkpoint:
+                if limit is not None and expanded >= limit or cancel.is_set():
+                    break
+                checkpoint = _next_checkpoint(expanded, limit, cancel)
+            closed[current] = 1
+            expanded += 1
+
+            cy, cx = divmod(current, width)
+            for dx, dy, step, move_cost in (moves if masks is None else mask_moves[masks[current]]):
+                nx = cx + dx
+                ny = cy + dy
+                if masks is None:
+                    if not (0 <= nx < width and 0 <= ny < height):
+                        continue
+                    if not passable[current + step]:
+                        continue
+                    if dx and dy and not (passable[current + dx] and passable[current + dy * width]):
+                        continue
+                neighbor = current + step
+                if closed[neighbor]:
+                    continue
+
+                new_cost = current_cost + move_cost
+                if penalty is not None:
+                    new_cost += penalty[neighbor]
+
+                if new_cost < cost.get(neighbor, float('inf')):
+                    cost[neighbor] = new_cost
+                    came_from[neighbor] = current
+                    hx = abs(tx - nx)
+                    hy = abs(ty - ny)
+                    if hx > hy:
+                        priority = new_cost + hx - hy + diagonal_cost * hy
+                    else:
+                        priority = new_cost + hy - hx + diagonal_cost * hx
+                    heappush(frontier, (priority, new_cost, neighbor))
+
+        path = []
+        if found:
+            node = goal
+            while node is not None:
+                y, x = divmod(node, width)
+                path.append((x, y))
+                node = came_from[node]
+            path.reverse()
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    return path
+
+
+def jump_point_search(masks: Sequence[int],
+                      uniform: Sequence[int],
+                      runs: Sequence[Sequence[int]],
+                      width: int,
+                      height: int,
+                      start: Tuple[int, int],
+                      target: Tuple[int, int],
+                      penalty: Optional[Sequence[float]] = None,
+                      diagonal_cost: float = DIAGONAL_COST,
+                      limit: Optional[int] = None,
+                      stats: Optional[Dict[str, int]] = None,
+                      cancel: Optional[threading.Event] = None) -> List[Tuple[int, int]]:
+    """
+    A* that jumps across uniform-cost water instead of expanding it cell by cell.
+
+    Finds paths of the same cost as astar under the same rules. Only cells
+    that are not uniform (see grid.jump_runs.uniform_cells), the start and the
+    target are ever expanded; those are all cells next to land or paying
+    shore penalty, where every cell still matters. A move into uniform water
+    keeps going: straight moves run to the first non-uniform cell, and
+    diagonal moves walk on, sending out both straight runs from every cell
+    they pass. Each run's end point is queued directly, as in jump point
+    search with the diagonal cells collapsed into the edges, so the open list
+    only ever holds cells where the cost picture changes. Between two queued
+    cells the path always goes diagonally first, then straight.
+
+    Args:
+        masks: width * height move masks, Grid.neighbor_masks[1]
+        uniform: width * height values, truthy for uniform-cost cells
+        runs: Straight run lengths per grid.jump_runs.RUN_DIRECTIONS entry,
+            built from uniform; Grid.jump_runs returns both
+        width: Number of columns
+        height: Number of rows
+        start: Starting cell (x, y)
+        target: Target cell (x, y)
+        penalty: Optional width * height extra costs for entering each cell,
+            zero wherever uniform is set
+        diagonal_cost: Cost of one diagonal step (straight steps cost 1)
+        limit: Optional maximum number of expanded cells
+        stats: Optional dict that receives the number of "expanded" cells
+        cancel: Optional event that makes the search give up, as in astar
+
+    Returns:
+        List[Tuple[int, int]]: Cells from start to target inclusive, or an
+        empty list if the target cannot be reached
+    """
+    sx, sy = start
+    tx, ty = target
+    source = sy * width + sx
+    goal = ty * width + tx
+    expanded = 0
+
+    if source == goal:
+        path = [(sx, sy)]
+    else:
+        # Straight moves carry the index of their run table, diagonals those of their two halves
+        run_index = {direction: index for index, direction in enumerate(DIRECTIONS[:4])}
+        moves = [(dx, dy, dy * width + dx, diagonal_cost if dx and dy else 1,
+                  (run_index[dx, 0], run_index[0, dy]) if dx and dy else run_index[dx, dy])
+                 for dx, dy in DIRECTIONS]
+        mask_moves = [tuple(move for bit, move in enumerate(moves) if mask >> bit & 1)
+                      for mask in range(256)]
+        closed = cell_flags(width * height)
+        checkpoint = _next_checkpoint(0, limit, cancel)
+        cost = {source: 0}
+        came_from = {source: None}
+        # Cheapest cost at which each uniform cell was walked through, per diagonal
+        diagonal_costs = {dy * width + dx: {} for dx, dy in DIRECTIONS[4:]}
+        frontier = [(octile_distance(sx, sy, tx, ty, diagonal_cost), 0, source)]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        found = False
+
+        def reach(cell, new_cost, parent):
+            if closed[cell] or new_cost >= cost.get(cell, float('inf')):
+                return
+            cost[cell] = new_cost
+            came_from[cell] = parent
+            y, x = divmod(cell, width)
+            hx = abs(tx - x)
+            hy = abs(ty - y)
+            if hx > hy:
+                priority = new_cost + hx - hy + diagonal_cost * hy
+            else:
+                priority = new_cost + hy - hx + diagonal_cost * hx
+            heappush(frontier, (priority, new_cost, cell))
+
+        def run(cell, x, y, dx, dy, index):
+            """End point of a straight run from a uniform cell, and its length"""
+            steps = runs[index][cell]
+            # Stop early on the target
+            if dx and y == ty and 0 < (tx - x) * dx <= steps:
+                steps = (tx - x) * dx
+            elif dy and x == tx and 0 < (ty - y) * dy <= steps:
+                steps = (ty - y) * dy
+            return cell + steps * (dy * width + dx), steps
+
+        while frontier:
+            _, current_cost, current = heappop(frontier)
+            if closed[current]:
+                continue
+            if current == goal:
+                found = True
+                break
+            if expanded >= checkpoint:
+                if limit is not None and expanded >= limit or cancel.is_set():
+                    break
+                checkpoint = _next_checkpoint(expanded, limit, cancel)
+            closed[current] = 1
+            expanded += 1
+
+            cy, cx = divmod(current, width)
+            for dx, dy, step, move_cost, index in mask_moves[masks[current]]:
+                cell = current + step
+                new_cost = current_cost + move_cost
+                if cell == goal or not uniform[cell]:
+                    reach(cell, new_cost + (penalty[cell] if penalty is not None else 0), current)
+                    continue
+
+                x = cx + dx
+                y = cy + dy
+                if not (dx and dy):
+                    end, steps = run(cell, x, y, dx, dy, index)
+                    reach(end, new_cost + steps + (penalty[end] if penalty is not None else 0), current)
+                    continue
+
+                # Walk the diagonal, sending out both straight runs from every cell on it
+                across, down = runs[index[0]], runs[index[1]]
+                walked = diagonal_costs[step]
+                while True:
+                    # An earlier walk along this diagonal got here at least as cheaply
+                    if new_cost >= walked.get(cell, float('inf')):
+                        break
+                    walked[cell] = new_cost
+                    steps = across[cell]
+                    if y == ty and 0 < (tx - x) * dx <= steps:
+                        steps = (tx - x) * dx
+                    end = cell + steps * dx
+                    end_cost = new_cost + steps + (penalty[end] if penalty is not None else 0)
+                    if end_cost < cost.get(end, float('inf')):
+                        reach(end, end_cost, current)
+                    steps = down[cell]
+                    if x == tx and 0 < (ty - y) * dy <= steps:
+                        steps = (ty - y) * dy
+                    end = cell + steps * dy * width
+                    end_cost = new_cost + steps + (penalty[end] if penalty is not None else 0)
+                    if end_cost < cost.get(end, float('inf')):
+                        reach(end, end_cost, current)
+                    cell += step
+                    x += dx
+                    y += dy
+                    new_cost += move_cost
+                    if cell == goal or not uniform[cell]:
+                        reach(cell, new_cost + (penalty[cell] if penalty is not None else 0), current)
+                        break
+
+        path = []
+        if found:
+            node = goal
+            y, x = divmod(node, width)
+            path.append((x, y))
+            while came_from[node] is not None:
+                node = came_from[node]
+                py, px = divmod(node, width)
+                # Walk back over the straight part first, then the diagonal
+                while (x, y) != (px, py):
+                    if abs(x - px) != abs(y - py):
+                        if abs(x - px) > abs(y - py):
+                            x -= 1 if x > px else -1
+                        else:
+                            y -= 1 if y > py else -1
+                    else:
+                        x -= 1 if x > px else -1
+                        y -= 1 if y > py else -1
+                    path.append((x, y))
+            path.reverse()
+
+    if stats is not None:
+        stats["expanded"] = expanded
+    return path
+
+
+def path_cost(path: Sequence[Tuple[int, int]],
+              width: int,
+              penalty: Optional[Sequence[float]] = None,
+              diagonal_cost: float = DIAGONAL_COST) -> float:
+    """
+    Cost of a cell-by-cell path under the same model that astar minimises.
+
+    Args:
+        path: Consecutive cells (x, y), each one step from the previous
+        width: Number of grid columns
+        penalty: Optional flat extra costs for entering each cell
+        diagonal_cost: Cost of one diagonal step
+
+    Returns:
+        float: Total cost, 0 for paths shorter than two cells
+    """
+    total = 0
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        total += diagonal_cost if x1 != x2 and y1 != y2 else 1
+        if penalty is not None:
+            total += penalty[y2 * width + x2]
+    return total
+
+
+def smooth_path(path: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Drop the intermediate cells of straight runs, keeping only turning points.
+
+    Args:
+        path: Cell-by-cell path
+
+    Returns:
+        List[Tuple[int, int]]: Start, every cell where the direction changes, and end
+    """
+    if len(path) <= 2:
+        return path
+
+    smoothed_path = [path[0]]
+    for i in range(1, len(path) - 1):
+        prev = smoothed_path[-1]
+        current = path[i]
+        next_pos = path[i + 1]
+
+        # Only keep points that represent significant direction changes
+        dx1 = current[0] - prev[0]
+        dy1 = current[1] - prev[1]
+        dx2 = next_pos[0] - current[0]
+        dy2 = next_pos[1] - current[1]
+
+        if dx1 != dx2 or dy1 != dy2:
+            smoothed_path.append(current)
+
+    smoothed_path.append(path[-1])
+    return smoothed_path
+
+
+def line_cells(x1: int, y1: int, x2: int, y2: int) -> Iterator[Tuple[int, int]]:
+    """
+    Walk the cells a boat sails through on a straight line between two cell centers.
+
+    Integer Bresenham traversal with diagonal steps, so the line takes
+    max(|dx|, |dy|) moves, as many as the shortest grid path between its
+    ends. Each cell is the one whose center lies nearest the line; a diagonal
+    step still needs both cells beside the corner (see line_of_sight).
+
+    Args:
+        x1, y1: First cell
+        x2, y2: Last cell
+
+    Yields:
+        Tuple[int, int]: Cells from first to last inclusive, each one straight
+        or diagonal step from the previous
+    """
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = 1 if x2 > x1 else -1
+    sy = 1 if y2 > y1 else -1
+    error = dx - dy
+    x, y = x1, y1
+    yield x, y
+    while (x, y) != (x2, y2):
+        doubled = 2 * error
+        if doubled > -dy:
+            x += sx
+            error -= dy
+        if doubled < dx:
+            y += sy
+            error += dx
+        yield x, y
+
+
+def line_of_sight(passable: Sequence[int],
+                  width: int,
+                  start: Tuple[int, int],
+                  end: Tuple[int, int],
+                  penalty: Optional[Sequence[float]] = None,
+                  max_penalty: float = 0) -> bool:
+    """
+    Check whether a boat can sail straight from one cell to another.
+
+    Every cell of line_cells must be passable, and a diagonal step needs both
+    cells beside the corner passable too, the same rule that forbids cutting
+    diagonal corners past land.
+
+    Args:
+        passable: Flat row-major values, truthy where a boat can sail
+        width: Number of grid columns
+        start: First cell (x, y)
+        end: Last cell (x, y)
+        penalty: Optional flat shore penalty; when given, the cells entered
+            after start may not add up to more than max_penalty
+        max_penalty: Highest total shore penalty allowed on the line
+
+    Returns:
+        bool: True if the straight line is clear
+    """
+    px, py = start
+    total = 0
+    for x, y in line_cells(px, py, *end):
+        if (x, y) == (px, py):
+            continue
+        index = y * width + x
+        if not passable[index]:
+            return False
+        if x != px and y != py and not (passable[py * width + x] and passable[y * width + px]):
+            return False
+        if penalty is not None:
+            total += penalty[index]
+            if total > max_penalty:
+                return False
+        px, py = x, y
+    return True
+
+
+def any_angle_path(path: Sequence[Tuple[int, int]],
+                   passable: Sequence[int],
+                   width: int,
+                   penalty: Optional[Sequence[float]] = None) -> List[Tuple[int, int]]:
+    """
+    Pull a cell-by-cell path straight into as few waypoints as line of sight allows.
+
+    Walks the path keeping the last waypoint as an anchor and moves on while
+    the anchor can still see the next cell. When it cannot, the previous cell
+    becomes a waypoint. The traced line never takes more steps than the path
+    it replaces, and with a penalty its cells may not add up to more shore
+    penalty than the path's cells, so straightening never makes a path cost
+    more under the penalty the search used.
+
+    Args:
+        path: Consecutive cells (x, y), each one legal step from the previous
+        passable: Flat row-major values, truthy where a boat can sail
+        width: Number of grid columns
+        penalty: Optional flat shore penalty used for the clearance rule
+
+    Returns:
+        List[Tuple[int, int]]: Start, turning waypoints and end; consecutive
+        waypoints are joined by clear straight lines (see trace_waypoints)
+    """
+    if len(path) <= 2:
+        return list(path)
+
+    def shore(cell):
+        return penalty[cell[1] * width + cell[0]] if penalty is not None else 0
+
+    waypoints = [tuple(path[0])]
+    anchor = 0
+    # Shore penalty of the path cells after the anchor, which a shortcut may not exceed
+    replaced = shore(path[1])
+    for i in range(2, len(path)):
+        replaced += shore(path[i])
+        if not line_of_sight(passable, width, path[anchor], path[i], penalty, replaced):
+            anchor = i - 1
+            waypoints.append(tuple(path[anchor]))
+            replaced = shore(path[i])
+    waypoints.append(tuple(path[-1]))
+    return waypoints
+
+
+def trace_waypoints(waypoints: Sequence[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+    """
+    Expand waypoints back into the cells a boat sails through, one step at a time.
+
+    Args:
+        waypoints: Cells joined by clear straight lines, as any_angle_path returns
+
+    Yields:
+        Tuple[int, int]: Every cell along the lines, each waypoint once
+    """
+    if not waypoints:
+        return
+    yield tuple(waypoints[0])
+    for (x1, y1), (x2, y2) in zip(waypoints, waypoints[1:]):
+        cells = line_cells(x1, y1, x2, y2)
+        next(cells)
+        yield from cells
+
+
+def path_length(waypoints: Sequence[Tuple[int, int]]) -> float:
+    """Euclidean length of a polyline through cell centers"""
+    return sum(math.hypot(x2 - x1, y2 - y1) for (x1, y1), (x2, y2) in zip(waypoints, waypoints[1:]))
@@ -0,0 +1,296 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from nav.pathfinding import DIAGONAL_COST, DIRECTIONS, octile_distance
+
+INF = float('inf')
+KEY_DIGITS = 9
+
+
+class PathPlanner:
+    """
+    Keeps a plan to one target and repairs it incrementally with D* Lite.
+
+    The search runs backwards from the target, so every expanded cell knows
+    its cost-to-go. As the boat moves along the plan, next_step only advances
+    a cursor. When the boat leaves the plan or cells change, the search is
+    repaired from where it left off rather than started again. Only a new
+    target triggers a full replan.
+
+    Movement follows the same rules and costs as nav.pathfinding.astar.
+
+    Attributes:
+        passable: Flat row-major navigability buffer, shared with the caller
+        penalty: Optional flat extra cost for entering each cell, shared with the caller
+        target (tuple): Current target (x, y), or None before the first request
+        replans (int): Number of full searches started for a new target
+        repairs (int): Number of incremental repairs after the boat left the plan or cells changed
+        expansions (int): Total number of cells expanded by the search
+    """
+
+    def __init__(self,
+                 passable: Sequence[int],
+                 width: int,
+                 height: int,
+                 penalty: Optional[Sequence[float]] = None,
+                 diagonal_cost: float = DIAGONAL_COST):
+        """
+        Initialize a planner over a flat grid.
+
+        Args:
+            passable: width * height values, truthy where a boat can sail
+            width: Number of columns
+            height: Number of rows
+            penalty: Optional width * height extra costs for entering each cell
+            diagonal_cost: Cost of one diagonal step
+        """
+        self.passable = passable
+        self.width = width
+        self.height = height
+        self.penalty = penalty
+        self.diagonal_cost = diagonal_cost
+        self.moves = [(dx, dy, dy * width + dx, diagonal_cost if dx and dy else 1) for dx, dy in DIRECTIONS]
+
+        self.target: Optional[Tuple[int, int]] = None
+        self.replans = 0
+        self.repairs = 0
+        self.expansions = 0
+
+        self._goal = None
+        self._start = None
+        self._last_start = None
+        self._km = 0.0
+        self._g = {}
+        self._rhs = {}
+        self._queue = []
+        self._queued = {}
+        self._changed = set()
+        self._path: List[int] = []
+        self._cursor = 0
+
+    def _heuristic(self, a: int, b: int) -> float:
+        ay, ax = divmod(a, self.width)
+        by, bx = divmod(b, self.width)
+        return octile_distance(ax, ay, bx, by, self.diagonal_cost)
+
+    def _successors(self, cell: int):
+        """Yield (neighbor, cost) for every legal move out of cell"""
+        passable = self.passable
+        if not passable[cell]:
+            return
+        width = self.width
+        cy, cx = divmod(cell, width)
+        penalty = self.penalty
+        for dx, dy, step, move_cost in self.moves:
+            nx = cx + dx
+            ny = cy + dy
+            if not (0 <= nx < width and 0 <= ny < self.height):
+                continue
+            neighbor = cell + step
+            if not passable[neighbor]:
+                continue
+            if dx and dy and not (passable[cell + dx] and passable[cell + dy * width]):
+                continue
+            yield neighbor, move_cost + penalty[neighbor] if penalty is not None else move_cost
+
+    def _key(self, cell: int) -> Tuple[float, float]:
+        best = min(self._g.get(cell, INF), self._rhs.get(cell, INF))
+        # Round so that keys which are equal on paper but differ by float noise
+        # still tie, otherwise an inconsistent cell can be left behind the start
+        return round(best + self._heuristic(self._start, cell) + self._km, KEY_DIGITS), round(best, KEY_DIGITS)
+
+    def _update_vertex(self, cell: int) -> None:
+        if cell != self._goal:
+            g = self._g
+            self._rhs[cell] = min((cost + g.get(neighbor, INF) for neighbor, cost in self._successors(cell)),
+                                  default=INF)
+        if self._g.get(cell, INF) != self._rhs.get(cell, INF):
+            key = self._key(cell)
+            self._queued[cell] = key
+            heapq.heappush(self._queue, (key, cell))
+        else:
+            self._queued.pop(cell, None)
+
+    def _top(self):
+        """Drop outdated queue entries and return the smallest live (key, cell), or None"""
+        queue = self._queue
+        while queue:
+            key, cell = queue[0]
+            if self._queued.get(cell) == key:
+                return queue[0]
+            heapq.heappop(queue)
+        return None
+
+    def _compute_shortest_path(self) -> None:
+        g = self._g
+        rhs = self._rhs
+        start = self._start
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            key, cell = top
+            start_key = self._key(start)
+            if key >= start_key and rhs.get(start, INF) <= g.get(start, INF):
+                break
+
+            heapq.heappop(self._queue)
+            del self._queued[cell]
+            self.expansions += 1
+            new_key = self._key(cell)
+            if key < new_key:
+                self._queued[cell] = new_key
+                heapq.heappush(self._queue, (new_key, cell))
+            elif g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+                for neighbor, _ in self._successors(cell):
+                    self._update_vertex(neighbor)
+            else:
+                g[cell] = INF
+                self._update_vertex(cell)
+                for neighbor, _ in self._successors(cell):
+                    self._update_vertex(neighbor)
+
+    def _reset(self, target: Tuple[int, int], start: int) -> None:
+        """Start a fresh search towards target"""
+        self.target = target
+        self._goal = target[1] * self.width + target[0]
+        self._start = self._last_start = start
+        self._km = 0.0
+        self._g = {}
+        self._rhs = {self._goal: 0}
+        self._queue = []
+        self._queued = {}
+        self._changed.clear()
+        if self.passable[self._goal]:
+            key = self._key(self._goal)
+            self._queued[self._goal] = key
+            self._queue.append((key, self._goal))
+        self._compute_shortest_path()
+        self._path = self._extract_path()
+        self._cursor = 0
+        self.replans += 1
+
+    def _repair(self, start: int) -> None:
+        """Move the search start and fix up any cells whose costs changed"""
+        self._start = start
+        self._km += self._heuristic(self._last_start, start)
+        self._last_start = start
+        changed, self._changed = self._changed, set()
+        for cell in changed:
+            self._update_vertex(cell)
+        self._compute_shortest_path()
+        self._path = self._extract_path()
+        self._cursor = 0
+        self.repairs += 1
+
+    def _extract_path(self) -> List[int]:
+        """Follow the cheapest successors from start to goal"""
+        cell = self._start
+        if self._rhs.get(cell, INF) == INF:
+            return []
+        path = [cell]
+        seen = {cell}
+        g = self._g
+        while cell != self._goal:
+            best = None
+            best_cost = INF
+            for neighbor, cost in self._successors(cell):
+                total = cost + g.get(neighbor, INF)
+                if total < best_cost:
+                    best, best_cost = neighbor, total
+            if best is None or best in seen:
+                return []
+            path.append(best)
+            seen.add(best)
+            cell = best
+        return path
+
+    def update_cells(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """
+        Tell the planner that the navigability or penalty of some cells changed.
+
+        The caller updates the shared passable and penalty buffers first. The
+        plan is repaired on the next call to next_step.
+
+        Args:
+            cells: Changed cells (x, y)
+        """
+        # A changed cell alters the penalty within 2 cells and the moves into those cells
+        reach = 3
+        for x, y in cells:
+            for ny in range(max(y - reach, 0), min(y + reach + 1, self.height)):
+                for nx in range(max(x - reach, 0), min(x + reach + 1, self.width)):
+                    self._changed.add(ny * self.width + nx)
+        if self._goal is not None and not self.passable[self._goal]:
+            # The target itself became land: nothing can be salvaged
+            self.target = None
+
+    def path(self) -> List[Tuple[int, int]]:
+        """
+        Get the remaining plan from the boat's last known position.
+
+        Returns:
+            List[Tuple[int, int]]: Cells (x, y) to the target, empty if unreachable
+        """
+        return [(cell % self.width, cell // self.width) for cell in self._path[self._cursor:]]
+
+    def work(self, position: Tuple[int, int], target: Tuple[int, int]) -> Optional[str]:
+        """
+        Tell what next_step(position, target) has to do before it can answer.
+
+        Returns:
+            Optional[str]: "plan" for a full search, "repair" for an incremental
+            one, or None when the boat is on the plan and nothing has changed
+        """
+        if tuple(target) != self.target:
+            return "plan"
+        if self._changed:
+            return "repair"
+        cell = position[1] * self.width + position[0]
+        path = self._path
+        cursor = self._cursor
+        if cursor + 1 < len(path) and path[cursor + 1] == cell:
+            # The boat followed the plan
+            return None
+        if cursor < len(path) and path[cursor] == cell:
+            return None
+        # The boat left the plan
+        return "repair"
+
+    def next_step(self, position: Tuple[int, int], target: Tuple[int, int],
+                  stats: Optional[Dict[str, int]] = None) -> Optional[Tuple[int, int]]:
+        """
+        Get the next cell to move to on the way from position to target.
+
+        Args:
+            position: Boat's current cell (x, y)
+            target: Target cell (x, y)
+            stats: Optional dict that receives the number of "expanded" cells,
+                0 when the plan was followed without a search
+
+        Returns:
+            Optional[Tuple[int, int]]: Adjacent cell to move to, or None if the
+            boat is at the target or the target cannot be reached
+        """
+        target = tuple(target)
+        cell = position[1] * self.width + position[0]
+        expansions = self.expansions
+
+        work = self.work(position, target)
+        if work == "plan":
+            self._reset(target, cell)
+        elif work == "repair":
+            self._repair(cell)
+        elif self._cursor + 1 < len(self._path) and self._path[self._cursor + 1] == cell:
+            # The boat followed the plan
+            self._cursor += 1
+        if stats is not None:
+            stats["expanded"] = self.expansions - expansions
+
+        path = self._path
+        cursor = self._cursor
+        if cursor + 1 >= len(path):
+            return None
+        nxt = path[cursor + 1]
+        return nxt % self.width, nxt // self.width
@@ -0,0 +1,252 @@
+import logging
+import struct
+from typing import BinaryIO, Iterator, List, Tuple, Union
+
+from nav.pathfinding import DIRECTIONS
+
+# Kinds of trajectory steps, one per navigator step and each counted by one NavigationStats field
+MOVE = 0  # The boat moved to a new cell (moves)
+BACKTRACK = 1  # The boat went back to a cell visited before (backtracks)
+STAY = 2  # No move left and nowhere to backtrack to (dead_ends)
+JUMP = 3  # The position was set from outside the navigator (not counted)
+UNREACHABLE = 4  # The target is in another body of water (unreachable)
+FAILED = 5  # The boat refused the chosen move (failed_moves)
+ARRIVED = 6  # The boat was already at the target (arrived)
+_KINDS = 7
+
+_MAGIC = b"TRAJ"
+_VERSION = 2
+_HEADER = struct.Struct("<4sHII")  # magic, version, start x, start y
+_POSITION = struct.Struct("<II")
+# One byte per step: kind * 8 + direction for moves and backtracks to a neighboring cell,
+# _IN_PLACE + kind for steps that stay put and _JUMPED + kind, then the position, for any other
+_DIRECTION_CODES = {direction: index for index, direction in enumerate(DIRECTIONS)}
+_IN_PLACE = 16
+_JUMPED = _IN_PLACE + _KINDS
+_STAT_NAMES = {MOVE: "moves", BACKTRACK: "backtracks", STAY: "dead_ends", UNREACHABLE: "unreachable",
+               FAILED: "failed_moves", ARRIVED: "arrived"}
+
+
+class NavigationStats:
+    """
+    Counters of what a navigator did, cheap enough to update on every step.
+
+    Attributes:
+        moves (int): Steps to a new cell
+        backtracks (int): Steps back along the way the boat came
+        dead_ends (int): Steps with no move left and nowhere to backtrack to
+        failed_moves (int): Chosen moves the boat refused
+        unreachable (int): Steps asked for a target in another body of water
+        arrived (int): Steps asked for while already at the target
+    """
+    __slots__ = ("moves", "backtracks", "dead_ends", "failed_moves", "unreachable", "arrived")
+
+    def __init__(self):
+        self.moves = 0
+        self.backtracks = 0
+        self.dead_ends = 0
+        self.failed_moves = 0
+        self.unreachable = 0
+        self.arrived = 0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "NavigationStats(" + ", ".join(f"{name}={value}" for name, value in self.as_dict().items()) + ")"
+
+
+class SampledLogger:
+    """
+    Passes one in every `every` messages of each kind on to a logger.
+
+    Messages are only formatted when they are actually emitted, so logging a
+    sampled event costs a counter increment. The running count of the kind
+    is appended to every message.
+
+    Attributes:
+        logger (logging.Logger): Where sampled messages go
+        every (int): Sampling interval; 0 emits nothing
+        level (int): Level the messages are logged at
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = 1000, level: int = logging.INFO):
+        self.logger = logger
+        self.every = every
+        self.level = level
+        self._counts = {}
+
+    def log(self, kind: str, message: str, *args) -> None:
+        """
+        Count one event of a kind and log it if its turn has come.
+
+        Args:
+            kind: Sampling is kept separately per kind, such as "move"
+            message: %-style format string
+            args: Arguments for message
+        """
+        count = self._counts.get(kind, 0) + 1
+        self._counts[kind] = count
+        if self.every and count % self.every == 0 and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, message + " (%d %s events)", *args, count, kind)
+
+
+class TrajectoryRecorder:
+    """
+    Every step of a boat in a compact binary log that can be replayed exactly.
+
+    Every step is stored with its kind, so the counts of a replayed
+    trajectory equal the navigator's NavigationStats. A move or backtrack to
+    a neighboring cell takes one byte, the kind and its direction index in
+    DIRECTIONS; a step that stays in place takes one byte; anything else
+    takes nine bytes with the absolute position. The file starts with a
+    header holding the starting cell.
+
+    Attributes:
+        start (tuple): Cell (x, y) the trajectory starts in
+        position (tuple): Cell after the last recorded step
+        steps (int): Number of recorded steps
+    """
+
+    def __init__(self, start: Tuple[int, int]):
+        self.start = tuple(start)
+        self.position = self.start
+        self.steps = 0
+        self._data = bytearray(_HEADER.pack(_MAGIC, _VERSION, *self.start))
+
+    def record(self, x: int, y: int, kind: int = MOVE) -> None:
+        """
+        Record one step that ended in cell (x, y).
+
+        Args:
+            x, y: Position after the step
+            kind: What the step was, MOVE, BACKTRACK, STAY, JUMP, UNREACHABLE,
+                FAILED or ARRIVED
+
+        Raises:
+            ValueError: If kind is not a step kind
+        """
+        if not 0 <= kind < _KINDS:
+            raise ValueError(f"Unknown trajectory step kind {kind}")
+        px, py = self.position
+        direction = _DIRECTION_CODES.get((x - px, y - py))
+        if (x, y) == (px, py):
+            self._data.append(_IN_PLACE + kind)
+        elif direction is not None and kind in (MOVE, BACKTRACK):
+            self._data.append(kind * 8 + direction)
+        else:
+            self._data.append(_JUMPED + kind)
+            self._data += _POSITION.pack(x, y)
+        self.position = (x, y)
+        self.steps += 1
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._data)
+
+    def save(self, file: Union[str, BinaryIO]) -> None:
+        """Write the trajectory to a file name or binary file object"""
+        if isinstance(file, str):
+            with open(file, "wb") as handle:
+                handle.write(self._data)
+        else:
+            file.write(self._data)
+
+
+class Trajectory:
+    """
+    A recorded trajectory, read back for replay.
+
+    Attributes:
+        start (tuple): Cell (x, y) the trajectory starts in
+    """
+
+    def __init__(self, data: bytes):
+        """
+        Args:
+            data: Bytes written by TrajectoryRecorder
+
+        Raises:
+            ValueError: If data is not a trajectory of a known version
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Trajectory data is too short")
+        magic, version, x, y = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a version {_VERSION} trajectory")
+        self.start = (x, y)
+        self._data = memoryview(data)[_HEADER.size:]
+
+    @classmethod
+    def load(cls, file: Union[str, BinaryIO]) -> "Trajectory":
+        """Read a trajectory from a file name or binary file object"""
+        if isinstance(file, str):
+            with open(file, "rb") as handle:
+                return cls(handle.read())
+        return cls(file.read())
+
+    def steps(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield every step in order.
+
+        Yields:
+            Tuple[int, int, int]: (kind, x, y), the kind of step and the cell it ended in
+        """
+        data = self._data
+        x, y = self.start
+        i = 0
+        while i < len(data):
+            code = data[i]
+            i += 1
+            if code < _IN_PLACE:
+                dx, dy = DIRECTIONS[code & 7]
+                x += dx
+                y += dy
+                yield code >> 3, x, y
+            elif code < _JUMPED:
+                yield code - _IN_PLACE, x, y
+            elif code < _JUMPED + _KINDS:
+                x, y = _POSITION.unpack_from(data, i)
+                i += _POSITION.size
+                yield code - _JUMPED, x, y
+            else:
+                raise ValueError(f"Unknown trajectory step code {code}")
+
+    def positions(self) -> List[Tuple[int, int]]:
+        """The start cell followed by the cell after every step"""
+        return [self.start] + [(x, y) for _, x, y in self.steps()]
+
+    def stats(self) -> NavigationStats:
+        """The NavigationStats of the navigator that recorded the trajectory"""
+        stats = NavigationStats()
+        for kind, _, _ in self.steps():
+            name = _STAT_NAMES.get(kind)
+            if name is not None:
+                setattr(stats, name, getattr(stats, name) + 1)
+        return stats
+
+    def replay(self, boat) -> Iterator[Tuple[int, int]]:
+        """
+        Drive a boat through the trajectory, one step per item.
+
+        Moves go through boat.move so that the grid rules are checked again;
+        backtracks and jumps set the position, as GreedyNavigate does, and
+        every other step leaves the boat where it is.
+
+        Args:
+            boat: Boat placed at the start cell
+
+        Yields:
+            Tuple[int, int]: The boat's position after each step
+
+        Raises:
+            ValueError: If the boat is not at the start or refuses a recorded move
+        """
+        if (boat.x, boat.y) != self.start:
+            raise ValueError(f"Boat is at {(boat.x, boat.y)}, the trajectory starts at {self.start}")
+        for kind, x, y in self.steps():
+            if kind == MOVE:
+                if not boat.move(x - boat.x, y - boat.y):
+                    raise ValueError(f"Recorded move to {(x, y)} is not possible")
+            elif (x, y) != (boat.x, boat.y):
+                boat.x, boat.y = x, y
+            yield boat.x, boat.y
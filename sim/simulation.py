@@ -0,0 +1,303 @@
+"""
+Headless navigation simulation.
+
+A Simulation owns a grid, the boats on it and one navigator per boat, and
+advances them without any display. Both pygame frontends drive one, and it
+can also be run in bulk:
+    python -m sim.simulation --episodes 200 --size 100 --navigator planner
+"""
+import argparse
+import random
+import time
+from concurrent.futures import wait
+from functools import partial
+
+import constants
+from grid.grid import Grid
+from grid.terrain import generate_landmass
+from nav.boat import Boat
+from nav.background import PlanningService, plan_path
+from nav.flow_field import FlowFieldCache
+from nav.navigate import BackgroundNavigate, FlowFieldNavigate, GreedyNavigate, PlannerNavigate
+
+NAVIGATORS = {
+    "planner": PlannerNavigate,
+    "greedy": GreedyNavigate,
+    "flow": FlowFieldNavigate,
+    "background": BackgroundNavigate,
+}
+
+
+class Simulation:
+    """
+    Boats on a grid, each steered towards its own target by a navigator.
+
+    Attributes:
+        grid: The navigation grid
+        navigator (str): Navigator strategy, one of NAVIGATORS
+        navigators (list): One navigator per boat, in the order boats were added
+        trajectories (list): Cells visited by each boat, starting with its start cell
+        steps (int): Number of completed simulation steps, not counting those
+            in which every boat under way was waiting for a plan
+        rng (random.Random): Random source used for spawn points
+        planning (PlanningService): Where background and planner navigators have
+            their plans made, or None
+        any_angle (bool): Whether planner and background navigators sail any-angle lines
+        jump_points (bool): Whether background navigators plan with jump point search
+        profiler: Where planner navigators time and count their plans and repairs, or None
+    """
+
+    def __init__(self, grid, navigator="planner", seed=None, shore_penalty=None, planning=None, any_angle=False,
+                 jump_points=False, profiler=None):
+        """
+        Initialize a simulation without boats.
+
+        Args:
+            grid: Grid to sail on
+            navigator: Navigator strategy, one of NAVIGATORS
+            seed: Optional seed for spawn points
+            shore_penalty: Shore penalty multiplier for the planner and background
+                navigators, defaults to constants.SHORE_PENALTY
+            planning: PlanningService for the background navigator, which
+                otherwise gets one the simulation starts and close() shuts
+                down; the planner navigator makes its full plans on it if given
+            any_angle: Have the planner and background navigators sail
+                any-angle lines through their plans
+            jump_points: Plan with jump point search in the planning service
+                the simulation starts for background navigators; the planner
+                navigator's D* Lite search has no jump point variant
+            profiler: Optional profiler for the planner navigator's plans and
+                repairs, see PlannerNavigate
+        """
+        if navigator not in NAVIGATORS:
+            raise ValueError(f"Unknown navigator {navigator!r}, expected one of {sorted(NAVIGATORS)}")
+        self.grid = grid
+        self.navigator = navigator
+        self.shore_penalty = shore_penalty
+        self.any_angle = any_angle
+        self.jump_points = jump_points
+        self.profiler = profiler
+        self.rng = random.Random(seed)
+        # Flow fields for the "flow" navigator, sized to hold every target in use
+        self.flow_fields = FlowFieldCache()
+        self.planning = planning
+        self._own_planning = False
+        self.navigators = []
+        self.trajectories = []
+        self.steps = 0
+
+    @classmethod
+    def generate(cls, rows, cols, seed=None, land_probability=constants.LAND_PROBABILITY,
+                 passes=constants.SMOOTHING_ITERATIONS, **kwargs):
+        """Create a simulation on a freshly generated, optionally seeded map"""
+        landmass = generate_landmass(rows, cols, land_probability, passes, seed)
+        return cls(Grid.from_landmass(landmass), seed=seed, **kwargs)
+
+    @property
+    def boats(self):
+        return [navigator.boat for navigator in self.navigators]
+
+    @property
+    def done(self):
+        """True once every boat has reached its target"""
+        return all(self.reached(i) for i in range(len(self.navigators)))
+
+    def reached(self, index):
+        """Check whether boat number index is at its target"""
+        navigator = self.navigators[index]
+        return (navigator.boat.x, navigator.boat.y) == tuple(navigator.target)
+
+    def random_water_cell(self, component=None):
+        """Pick a random open-water cell with the simulation's random source, optionally in one body of water"""
+        return self.grid.find_random_location(self.rng, component)
+
+    def add_boat(self, start=None, target=None):
+        """
+        Place a boat and give it a navigator.
+
+        Args:
+            start: Starting cell (x, y); a random open-water cell of the largest
+                body of water if "random", the Boat default if None
+            target: Target cell (x, y); a random open-water cell the boat can
+                reach if "random", the navigator default if None
+
+        Returns:
+            The boat's navigator
+        """
+        components = self.grid.components
+        if start == "random":
+            start = self.random_water_cell(components.largest())
+        boat = Boat(self.grid, start)
+        if target == "random":
+            component = components.component(boat.x, boat.y)
+            if components.sizes[component] < 2:
+                # Nothing else to reach in a one-cell pond
+                component = None
+            target = self.random_water_cell(component)
+            while tuple(target) == (boat.x, boat.y):
+                target = self.random_water_cell(component)
+
+        if self.navigator == "planner":
+            navigator = PlannerNavigate(boat, self.shore_penalty, service=self.planning, any_angle=self.any_angle,
+                                        profiler=self.profiler)
+        elif self.navigator == "flow":
+            navigator = FlowFieldNavigate(boat, self.flow_fields)
+        elif self.navigator == "background":
+            if self.planning is None:
+                self.planning = PlanningService(partial(plan_path, shore_penalty=self.shore_penalty,
+                                                        any_angle=self.any_angle, jump_points=self.jump_points))
+                self._own_planning = True
+            navigator = BackgroundNavigate(boat, self.planning)
+        else:
+            navigator = NAVIGATORS[self.navigator](boat)
+        if target is not None:
+            navigator.target = tuple(target)
+        if self.navigator == "flow":
+            targets = {tuple(other.target) for other in self.navigators} | {tuple(navigator.target)}
+            self.flow_fields.capacity = max(self.flow_fields.capacity, len(targets))
+
+        self.navigators.append(navigator)
+        self.trajectories.append([(boat.x, boat.y)])
+        return navigator
+
+    def step(self):
+        """
+        Advance every boat that has not reached its target by one navigation step.
+
+        Returns:
+            bool: True while at least one boat is still under way
+        """
+        under_way = False
+        acted = False
+        for i, navigator in enumerate(self.navigators):
+            if self.reached(i):
+                continue
+            navigator.navigate()
+            acted = acted or not getattr(navigator, "waiting", False)
+            position = (navigator.boat.x, navigator.boat.y)
+            if position != self.trajectories[i][-1]:
+                self.trajectories[i].append(position)
+            under_way = under_way or not self.reached(i)
+        if acted:
+            self.steps += 1
+        return under_way
+
+    def wait(self):
+        """Block until no navigator is waiting for a plan"""
+        wait([navigator.pending for navigator in self.navigators if getattr(navigator, "pending", None)])
+
+    def cancel(self):
+        """Cancel the plans any navigator is still waiting for"""
+        for navigator in self.navigators:
+            if isinstance(navigator, (BackgroundNavigate, PlannerNavigate)):
+                navigator.cancel()
+
+    def close(self):
+        """Cancel pending plans and shut down the planning service if the simulation started it"""
+        self.cancel()
+        if self._own_planning:
+            self.planning.close()
+            self.planning = None
+            self._own_planning = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, max_steps=10000):
+        """
+        Step until every boat has arrived or max_steps is reached.
+
+        Nothing else needs the time, so plans being made in the background
+        are waited for instead of stepped past.
+
+        Args:
+            max_steps: Upper bound on simulation steps
+
+        Returns:
+            dict: Metrics of the run
+        """
+        began = time.perf_counter()
+        while self.steps < max_steps and self.step():
+            self.wait()
+        return self.metrics(time.perf_counter() - began)
+
+    def metrics(self, wall_time=0.0):
+        """
+        Summarise the run so far.
+
+        Args:
+            wall_time: Seconds spent running, reported as is
+
+        Returns:
+            dict: steps, boats, reached, moves, path_cost, replans, backtracks,
+            dead_ends and wall_time
+        """
+        stats = [navigator.stats for navigator in self.navigators if hasattr(navigator, "stats")]
+        return {
+            "steps": self.steps,
+            "boats": len(self.navigators),
+            "reached": sum(1 for i in range(len(self.navigators)) if self.reached(i)),
+            "moves": sum(len(trajectory) - 1 for trajectory in self.trajectories),
+            "path_cost": sum(self.grid.get_path_cost(trajectory) for trajectory in self.trajectories),
+            "replans": sum(getattr(navigator, "replans", 0) for navigator in self.navigators),
+            "backtracks": sum(s.backtracks for s in stats),
+            "dead_ends": sum(s.dead_ends for s in stats),
+            "wall_time": wall_time,
+        }
+
+
+def run_episodes(episodes, rows, cols, seed=0, navigator="planner", boats=1, max_steps=10000, any_angle=False,
+                 jump_points=False):
+    """
+    Run seeded single-map episodes back to back.
+
+    Episode i uses seed + i for both the map and the spawn points, so any
+    episode can be replayed on its own.
+
+    Returns:
+        list: Metrics dict of every episode, with its "seed" added
+    """
+    results = []
+    for episode in range(episodes):
+        episode_seed = seed + episode
+        with Simulation.generate(rows, cols, seed=episode_seed, navigator=navigator,
+                                 any_angle=any_angle, jump_points=jump_points) as simulation:
+            for _ in range(boats):
+                simulation.add_boat("random", "random")
+            metrics = simulation.run(max_steps)
+        metrics["seed"] = episode_seed
+        results.append(metrics)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless navigation episodes")
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--size", type=int, default=100, help="map rows and columns")
+    parser.add_argument("--boats", type=int, default=1, help="boats per episode")
+    parser.add_argument("--navigator", choices=sorted(NAVIGATORS), default="planner")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--any-angle", action="store_true", help="sail any-angle lines through the plans")
+    parser.add_argument("--jump-points", action="store_true",
+                        help="plan with jump point search (background navigator only)")
+    args = parser.parse_args()
+
+    began = time.perf_counter()
+    results = run_episodes(args.episodes, args.size, args.size, args.seed,
+                           args.navigator, args.boats, args.max_steps, args.any_angle, args.jump_points)
+    elapsed = time.perf_counter() - began
+
+    boats = sum(r["boats"] for r in results)
+    print(f"{args.episodes} episodes in {elapsed:.2f}s ({args.episodes * 60 / elapsed:,.0f} per minute)")
+    print(f"reached {sum(r['reached'] for r in results)}/{boats} targets, "
+          f"{sum(r['steps'] for r in results) / len(results):.1f} steps, "
+          f"{sum(r['path_cost'] for r in results) / len(results):.1f} path cost, "
+          f"{sum(r['replans'] for r in results) / len(results):.1f} replans per episode")
+
+
+if __name__ == "__main__":
+    main()